@@ -1,13 +1,34 @@
 from django.contrib import admin
 from django import forms
 from .forms import PairApplicationForm
+from .callback_views import callback_search
+from .download_views import pair_pdf_bundle, resume_pdf
+from .downloads import pairs_zip_entries, zip_response
+from .profile_views import request_profile_download, request_profiles
 from .models import Pair, Profile, Employer, PairApplication, normalize_employer_name, CallbackLog
 from django.utils.timezone import localtime
-from django.http import HttpResponse, JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils.html import format_html
 from django.urls import reverse, path
+from django.db.models import Prefetch
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_protect
+from asgiref.sync import sync_to_async
+from functools import wraps
+
+
+def async_admin_view(view):
+    """AdminSite.admin_view for coroutine views (whose wrapper is sync-only): staff check, never_cache, csrf_protect."""
+    @wraps(view)
+    async def inner(request, *args, **kwargs):
+        # The staff check loaded the user via auser(); hand the same object to
+        # the admin templates, which read request.user synchronously
+        request.user = await request.auser()
+        return await view(request, *args, **kwargs)
+    return csrf_protect(never_cache(staff_member_required(inner)))
 
 
 class ProfileInline(admin.TabularInline):
@@ -24,7 +45,7 @@ class ProfileInline(admin.TabularInline):
         if obj.resume_pdf and obj.resume_pdf.name:
             return format_html(
                 '<a href="{}" target="_blank" class="button">Download PDF</a>',
-                obj.resume_pdf.url
+                reverse("admin:audit_profile_pdf", args=[obj.pk])
             )
         return "No PDF available"
     resume_pdf_download.short_description = "Resume PDF"
@@ -37,14 +58,11 @@ class PairAdmin(admin.ModelAdmin):
     search_fields = ("pair_id", "occupation")
     readonly_fields = ("pair_id", "occupation", "good_fit_occupations", "location", "archetype", "sublocation")
     fieldsets = ()
+    actions = ["download_resume_pdfs"]
 
     # use our custom template for the bottom area
     change_form_template = "admin/pair_change_form.html"
 
-    def changelist_view(self, request, extra_context=None):
-        """Show generation form as default view instead of pair list."""
-        return self.generate_pair_view(request)
-
     def render_change_form(self, request, context, add=False, change=False, form_url="", obj=None):
         # Hide save buttons — Pair is read-only
         context.update({
@@ -102,42 +120,112 @@ class PairAdmin(admin.ModelAdmin):
 
         return super().render_change_form(request, context, add, change, form_url, obj)
 
+    def get_queryset(self, request):
+        # Pre-generated pairs are listed once the generation form hands them out
+        return super().get_queryset(request).filter(in_inventory=False)
+
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
+            # The generation form replaces the pair list as the default view
+            path("", async_admin_view(self.generate_pair_view), name="audit_pair_changelist"),
+            path("generate/", async_admin_view(self.generate_start_view), name="audit_pair_generate"),
+            path("generate/<uuid:token>/events/", async_admin_view(self.generation_events_view),
+                 name="audit_pair_generation_events"),
             path("list/", self.admin_site.admin_view(self.pairs_list_view), name="audit_pair_list"),
+            path("<int:pair_id>/pdfs/", self.admin_site.admin_view(pair_pdf_bundle), name="audit_pair_pdfs"),
+            path("profile/<int:profile_id>/pdf/", self.admin_site.admin_view(resume_pdf), name="audit_profile_pdf"),
         ]
         return custom_urls + urls
 
-    def generate_pair_view(self, request):
-        """Primary admin view for generating new pairs."""
+    async def generate_pair_view(self, request):
+        """Primary admin view for generating new pairs; rendering awaits on the event loop."""
         from .forms import PairGenerationForm
+        from .generation import job_result
+        from .models import GenerationJob
+        from .pipeline import active_stages
         from django.contrib import messages
 
         result = None
+        form = PairGenerationForm()
 
         if request.method == 'POST':
+            # Without JavaScript: generate inline (or wait for this form's earlier submit)
             form = PairGenerationForm(request.POST)
             if form.is_valid():
                 try:
-                    result = form.generate_pair()
+                    result = await form.agenerate_pair()
                     messages.success(request, f'Successfully generated pair {result["pair_id"]} with PDFs!')
+                    # Same choices for the next pair, under a new token
+                    form = PairGenerationForm(initial={
+                        name: form.cleaned_data[name] for name in ('location', 'occupation', 'archetype', 'sublocation')
+                    })
                 except Exception as e:
                     messages.error(request, f'Error generating pair: {str(e)}')
-        else:
-            form = PairGenerationForm()
+        elif request.GET.get('job'):
+            # The progress stream sends the page here once its job is done
+            job = await GenerationJob.objects.filter(token=request.GET['job'], status='done').afirst()
+            if job is not None:
+                result = await job_result(job)
 
         context = dict(
-            self.admin_site.each_context(request),
+            await sync_to_async(self.admin_site.each_context)(request),
             title='Generate New Resume Pair',
             form=form,
             result=result,
             opts=self.model._meta,
             app_label=self.model._meta.app_label,
             show_pairs_list_button=True,
+            generation_stages=[(stage, label) for stage, label in GenerationJob.STAGE_CHOICES
+                               if stage in active_stages()],
         )
 
-        return render(request, 'admin/audit/generate_pair.html', context)
+        # Admin templates read the user, session and permissions synchronously
+        return await sync_to_async(render)(request, 'admin/audit/generate_pair.html', context)
+
+    async def generate_start_view(self, request):
+        """Start (or rejoin) the generation job of a form token; the page then follows its events."""
+        from .forms import PairGenerationForm
+        from .generation import launch, start_job
+
+        if request.method != 'POST':
+            return JsonResponse({"ok": False, "error": "POST required"}, status=405)
+        form = PairGenerationForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({"ok": False, "errors": form.errors.get_json_data()}, status=400)
+
+        job, started = await start_job(form.cleaned_data['token'], **form.job_params())
+        if started:
+            launch(job, on_event_loop=isinstance(request, ASGIRequest))
+        return JsonResponse({
+            "ok": True,
+            "token": str(job.token),
+            "started": started,
+            "events_url": reverse("admin:audit_pair_generation_events", args=[job.token]),
+        })
+
+    async def generation_events_view(self, request, token):
+        """Server-sent progress events of one generation job (see audit.generation)."""
+        from .generation import job_events, job_events_sync
+        from .models import GenerationJob
+
+        job = await GenerationJob.objects.filter(token=token).afirst()
+        if job is None:
+            raise Http404("No such generation job")
+        result_url = reverse("admin:audit_pair_changelist") + f"?job={job.token}"
+        if isinstance(request, ASGIRequest):
+            events = job_events(job, result_url)
+        else:
+            events = job_events_sync(job, result_url)
+        response = StreamingHttpResponse(events, content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"  # nginx: pass events on as they are written
+        return response
+
+    def download_resume_pdfs(self, request, queryset):
+        """Stream one ZIP of the pairs' PDFs; "Select all" makes it every pair matching the filters."""
+        return zip_response(request, pairs_zip_entries(queryset), f"resumes_{localtime():%Y%m%d_%H%M}.zip")
+    download_resume_pdfs.short_description = "Download resume PDFs of selected pairs (ZIP)"
 
     def pairs_list_view(self, request):
         """Secondary view to show existing pairs list."""
@@ -164,7 +252,7 @@ class EmployerAdmin(admin.ModelAdmin):
     def get_urls(self):
         urls = super().get_urls()
         custom_urls = [
-            path("check/", self.admin_site.admin_view(check_employer), name="employer-check"),
+            path("check/", async_admin_view(check_employer), name="employer-check"),
         ]
         return custom_urls + urls
 
@@ -173,7 +261,7 @@ class EmployerAdmin(admin.ModelAdmin):
 
 
 @staff_member_required
-def check_employer(request):
+async def check_employer(request):
     employer_name = request.GET.get("employer")
     occupation = request.GET.get("occupation")
 
@@ -183,10 +271,10 @@ def check_employer(request):
     normalized = normalize_employer_name(employer_name)
     normalized_occupation = occupation.strip().capitalize()
     
-    exists = PairApplication.objects.filter(
+    exists = await PairApplication.objects.filter(
         employer__normalized_name=normalized,
         occupation=normalized_occupation
-    ).exists()
+    ).aexists()
 
     if exists:
         return JsonResponse({
@@ -214,7 +302,8 @@ class CallbackLogInline(admin.TabularInline):
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('profile').order_by('profile__full_name')
+        # application__employer: each row's __str__ names the employer
+        return qs.select_related('profile', 'application__employer').order_by('profile__full_name')
     
     def has_add_permission(self, request, obj=None):
         # Don't allow manual adding
@@ -242,10 +331,17 @@ class PairApplicationAdmin(admin.ModelAdmin):
 
     inlines = [CallbackLogInline]
 
+    def get_queryset(self, request):
+        # __str__ names the pair and employer; callback_summary reads every
+        # row's callbacks and their profiles
+        return super().get_queryset(request).select_related('pair', 'employer').prefetch_related(
+            Prefetch('callbacks', queryset=CallbackLog.objects.select_related('profile'))
+        )
+
     def callback_summary(self, obj):
         """Show summary of callback statuses"""
         callbacks = obj.callbacks.all()
-        if callbacks.count() == 0:
+        if len(callbacks) == 0:
             return "Not initialized"
         
         statuses = []
@@ -272,12 +368,19 @@ class PairApplicationAdmin(admin.ModelAdmin):
     def _ensure_callback_logs(self, application):
         """Ensure exactly 2 callback logs exist for this application"""
         if application.pair:
-            for profile in application.pair.profiles.all():
-                CallbackLog.objects.get_or_create(
-                    profile=profile,
-                    application=application,
-                    defaults={'callback_status': 'no_info'}
-                )
+            # One read and at most one batched insert instead of a
+            # get_or_create (and savepoint) per profile
+            existing = set(application.callbacks.values_list('profile_id', flat=True))
+            missing = application.pair.profiles.exclude(pk__in=existing).values_list('pk', flat=True)
+            # Audit rows for the new logs are built by the application's
+            # post_save refresh, which runs after this transaction commits
+            CallbackLog.objects.bulk_create(
+                [
+                    CallbackLog(profile_id=profile_id, application=application, callback_status='no_info')
+                    for profile_id in missing
+                ],
+                ignore_conflicts=True,
+            )
     
     fieldsets = (
         ("Pair Info", {"fields": ("pair_id_display", "occupation_display")}),
@@ -309,7 +412,17 @@ class PairApplicationAdmin(admin.ModelAdmin):
 
         return super().render_change_form(request, context, add, change, form_url, obj)
 
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        # pair isn't in the fieldsets; the add form posts back to its ?pair= URL and the form checks it
+        form.requested_pair = request.GET.get('pair')
+        return form
+
     def save_model(self, request, obj, form, change):
+        # occupation isn't a form field; store it the way check_employer looks it up
+        if obj.pair_id and not obj.occupation:
+            obj.occupation = obj.pair.occupation.strip().capitalize()
+
         # Detect which button was clicked and set status accordingly
         if "_save" in request.POST:  # SUBMIT button
             obj.status = "submitted"
@@ -348,12 +461,91 @@ class PairApplicationAdmin(admin.ModelAdmin):
 
         return initial
 
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path("dashboard/", self.admin_site.admin_view(self.callback_dashboard_view), name="audit_callback_dashboard"),
+            path("survival/", self.admin_site.admin_view(self.survival_chart_view), name="audit_survival_chart"),
+            path("callback-search/", async_admin_view(callback_search), name="audit_callback_search"),
+            path("profiles/", self.admin_site.admin_view(request_profiles), name="audit_request_profiles"),
+            path("profiles/<str:profile_id>/<str:kind>/", self.admin_site.admin_view(request_profile_download),
+                 name="audit_request_profile_download"),
+        ]
+        return custom_urls + urls
+
+    def callback_dashboard_view(self, request):
+        """Callback and rejection rates from the precomputed summary table."""
+        from .analytics import dashboard_breakdowns, refresh_callback_summary
+        from django.contrib import messages
+        from django.shortcuts import redirect
+
+        if request.method == 'POST':
+            cells = refresh_callback_summary()
+            messages.success(request, f'Rebuilt {cells} summary cells.')
+            return redirect('admin:audit_callback_dashboard')
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Callback Rate Dashboard',
+            breakdowns=dashboard_breakdowns(),
+            opts=self.model._meta,
+            app_label=self.model._meta.app_label,
+        )
+        return render(request, 'admin/audit/callback_dashboard.html', context)
+
+    def survival_chart_view(self, request):
+        """Kaplan-Meier time-to-response curves of the SMO and the for-profit resumes, drawn as SVG."""
+        from .survival import ARM_LABELS, compare_profiles, load_durations
+
+        event = request.GET.get('event', 'callback')
+        if event not in ('callback', 'response'):
+            event = 'callback'
+        df, dropped = load_durations(event)
+
+        width, height = 600, 300
+        series = []
+        test = None
+        if not df.empty:
+            curves, test = compare_profiles(df)
+            max_day = max(int(df['duration'].max()), 1)
+            # Every kept application has one resume in each arm, so both curves exist
+            for arm, color in (('treated', '#417690'), ('control', '#ba2121')):
+                curve = curves[arm]
+                # Step function: horizontal to each event time, then drop
+                points = [(0, 1.0)]
+                for time, survival in zip(curve['time'], curve['survival']):
+                    points.append((time, points[-1][1]))
+                    points.append((time, survival))
+                points.append((max_day, points[-1][1]))
+                series.append({
+                    'label': f'{ARM_LABELS[arm]} resume',
+                    'color': color,
+                    'points': ' '.join(f'{t / max_day * width:.1f},{(1 - s) * height:.1f}' for t, s in points),
+                })
+
+        context = dict(
+            self.admin_site.each_context(request),
+            title='Time to Response',
+            event=event,
+            series=series,
+            test=test,
+            observations=len(df),
+            undated=int(df['undated'].sum()) if not df.empty else 0,
+            dropped=dropped,
+            width=width,
+            height=height,
+            opts=self.model._meta,
+            app_label=self.model._meta.app_label,
+        )
+        return render(request, 'admin/audit/survival_chart.html', context)
+
     def changelist_view(self, request, extra_context=None):
         # Custom grouped view by status
         if 'status' not in request.GET:
             # Group applications by status for display
-            draft_apps = PairApplication.objects.filter(status='draft').order_by('-updated_at')
-            submitted_apps = PairApplication.objects.filter(status='submitted').order_by('-submitted_at', '-created_at')
+            applications = PairApplication.objects.select_related('pair', 'employer')
+            draft_apps = applications.filter(status='draft').order_by('-updated_at')
+            submitted_apps = applications.filter(status='submitted').order_by('-submitted_at', '-created_at')
 
             context = {
                 'draft_applications': draft_apps,
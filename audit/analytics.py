@@ -0,0 +1,165 @@
+"""
+Callback-rate breakdowns for the admin dashboard.
+
+Counts are aggregated in the database with values().annotate() over the
+flat AuditRow table and cached in CallbackRateSummary, one row per
+(dimension, value). A full rebuild is one GROUP BY per dimension. When audit
+rows change, the cells they leave and enter are adjusted in place by the
+difference between the old and the new rows (apply_summary_deltas), with
+F() expressions, so concurrent writers never overwrite each other's counts.
+"""
+
+from django.db import transaction
+from django.db.models import CharField, Count, F, Q
+from django.db.models.functions import Cast, Greatest
+from django.utils import timezone
+
+from .models import AuditRow, CallbackRateSummary
+
+# (key, label, AuditRow column)
+SUMMARY_DIMENSIONS = [
+    ("occupation", "Occupation", "pair_occupation"),
+    ("location", "Location", "pair_location"),
+    ("archetype", "Archetype", "pair_archetype"),
+    ("work_mode", "Work mode", "work_mode"),
+    ("job_board", "Job board", "job_board"),
+    ("employer_industry", "Employer industry", "employer_industry"),
+    ("employer_location", "Employer location", "employer_location"),
+    ("employer_size", "Employer size", "employer_size"),
+    ("race_signal", "Race signal", "race_signal"),
+    ("gender_signal", "Gender signal", "gender_signal"),
+    ("current_employer_type", "Current employer type", "current_employer_type"),
+    ("college_activity_type", "College activity", "college_activity_type"),
+]
+
+_COUNTS = dict(
+    total=Count("id"),
+    callbacks=Count("id", filter=Q(callback_status="callback")),
+    rejections=Count("id", filter=Q(callback_status="rejection")),
+    pending=Count("id", filter=Q(callback_status="no_info")),
+)
+
+
+def _aggregate(column):
+    qs = AuditRow.objects.annotate(cell=Cast(column, output_field=CharField()))
+    return qs.values("cell").annotate(**_COUNTS).order_by()
+
+
+def refresh_callback_summary():
+    """Rebuild every summary cell from scratch."""
+    rows = []
+    for key, _label, column in SUMMARY_DIMENSIONS:
+        cells = {}
+        for row in _aggregate(column):
+            value = row.pop("cell") or ""
+            cell = cells.setdefault(value, dict.fromkeys(_COUNTS, 0))
+            for name, count in row.items():
+                cell[name] += count
+        rows.extend(CallbackRateSummary(dimension=key, value=value, **counts) for value, counts in cells.items())
+
+    with transaction.atomic():
+        CallbackRateSummary.objects.all().delete()
+        CallbackRateSummary.objects.bulk_create(rows)
+    return len(rows)
+
+
+def summary_cells(audit_rows):
+    """Set of (dimension, value) cells the given AuditRow objects fall into."""
+    cells = set()
+    for row in audit_rows:
+        for key, _label, column in SUMMARY_DIMENSIONS:
+            value = getattr(row, column)
+            cells.add((key, "" if value is None else str(value)))
+    return cells
+
+
+def summary_state(row):
+    """What an AuditRow contributes to the summary: its cells and its callback status."""
+    return (frozenset(summary_cells([row])), row.callback_status)
+
+
+def _row_counts(row):
+    """What one AuditRow adds to each count (in _COUNTS order) of the cells it falls into."""
+    status = row.callback_status
+    return (1, int(status == "callback"), int(status == "rejection"), int(status == "no_info"))
+
+
+def summary_deltas(removed=(), added=()):
+    """
+    {(dimension, value): count deltas in _COUNTS order} of replacing the
+    `removed` AuditRow objects by the `added` ones; cells left unchanged
+    are omitted.
+    """
+    deltas = {}
+    for rows, sign in ((removed, -1), (added, 1)):
+        for row in rows:
+            counts = _row_counts(row)
+            for cell in summary_cells([row]):
+                delta = deltas.setdefault(cell, [0] * len(_COUNTS))
+                for i, count in enumerate(counts):
+                    delta[i] += sign * count
+    return {cell: tuple(delta) for cell, delta in deltas.items() if any(delta)}
+
+
+def merge_summary_deltas(deltas, more):
+    """Add the deltas of `more` into `deltas` (in place)."""
+    for cell, delta in more.items():
+        deltas[cell] = tuple(a + b for a, b in zip(deltas.get(cell, (0,) * len(_COUNTS)), delta))
+    return deltas
+
+
+def _cells_filter(cells):
+    by_dimension = {}
+    for key, value in cells:
+        by_dimension.setdefault(key, []).append(value)
+    condition = Q()
+    for key, values in by_dimension.items():
+        condition |= Q(dimension=key, value__in=values)
+    return condition
+
+
+def apply_summary_deltas(deltas):
+    """
+    Add count deltas (see summary_deltas) to their summary cells.
+
+    Missing cells are created empty first with ignore_conflicts, so two
+    writers creating the same cell don't collide; cells sharing a delta
+    (typically every cell of one row) then take a single UPDATE, and cells
+    left empty are deleted. Counts are clamped at zero rather than
+    failing a save on a summary that was never built (the dashboard's
+    rebuild repairs it).
+    """
+    deltas = {cell: delta for cell, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    by_delta = {}
+    for cell, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(cell)
+
+    with transaction.atomic():
+        CallbackRateSummary.objects.bulk_create(
+            [CallbackRateSummary(dimension=key, value=value) for key, value in sorted(deltas)],
+            ignore_conflicts=True,
+        )
+        now = timezone.now()
+        for delta, cells in by_delta.items():
+            CallbackRateSummary.objects.filter(_cells_filter(cells)).update(
+                updated_at=now,
+                **{name: F(name) + d if d >= 0 else Greatest(F(name) + d, 0) for name, d in zip(_COUNTS, delta) if d},
+            )
+        emptied = [cell for cell, delta in deltas.items() if delta[0] < 0]
+        if emptied:
+            CallbackRateSummary.objects.filter(_cells_filter(emptied), total=0).delete()
+
+
+def dashboard_breakdowns():
+    """Summary rows grouped per dimension, in SUMMARY_DIMENSIONS order."""
+    by_dimension = {key: [] for key, _label, _column in SUMMARY_DIMENSIONS}
+    for row in CallbackRateSummary.objects.all():
+        by_dimension.setdefault(row.dimension, []).append(row)
+
+    labels = {key: label for key, label, _column in SUMMARY_DIMENSIONS}
+    return [
+        {"key": key, "label": labels.get(key, key), "rows": sorted(rows, key=lambda r: -r.total)}
+        for key, rows in by_dimension.items()
+    ]
@@ -0,0 +1,212 @@
+"""
+Materialised merged-audit table.
+
+AuditRow holds one flat row per CallbackLog with the pair, profile,
+application and employer fields it would otherwise be joined to. Rows are
+rebuilt from a single joined values() query and written with an upsert on
+callback_log, so the export, dashboard and statistics read one table.
+
+Signal handlers (audit.signals) queue the instances a save touched; the
+queue is flushed with a single refresh once the transaction commits.
+rebuild_audit_rows refreshes the whole table.
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models import Q
+
+from .analytics import apply_summary_deltas, merge_summary_deltas, summary_deltas, summary_state
+from .models import PROFILE_ATTRIBUTE_FIELDS, AuditRow, CallbackLog
+
+DEFAULT_BATCH_SIZE = 500
+
+# AuditRow field -> lookup path from CallbackLog
+AUDIT_ROW_SOURCES = {
+    "application_id": "application_id",
+    "profile_id": "profile_id",
+    "pair_id": "application__pair__pair_id",
+    "pair_occupation": "application__pair__occupation",
+    "pair_location": "application__pair__location",
+    "pair_archetype": "application__pair__archetype",
+    "pair_sublocation": "application__pair__sublocation",
+    "good_fit_occupations": "application__pair__good_fit_occupations",
+    "resume_idx": "profile__resume_idx",
+    "template_name": "profile__template_name",
+    "full_name": "profile__full_name",
+    "phone": "profile__phone",
+    "address": "profile__address",
+    "email": "profile__email",
+    "expertise": "profile__expertise",
+    **{name: f"profile__{name}" for name in PROFILE_ATTRIBUTE_FIELDS},
+    "application_occupation": "application__occupation",
+    "job_title": "application__job_title",
+    "job_text": "application__job_text",
+    "job_location": "application__job_location",
+    "work_mode": "application__work_mode",
+    "job_link": "application__job_link",
+    "job_board": "application__job_board",
+    "job_board_other": "application__job_board_other",
+    "days_open": "application__days_open",
+    "application_status": "application__status",
+    "submitted_at": "application__submitted_at",
+    "application_created": "application__created_at",
+    "application_updated": "application__updated_at",
+    "employer_id": "application__employer_id",
+    "employer_name": "application__employer__display_name",
+    "employer_normalized_name": "application__employer__normalized_name",
+    "employer_location": "application__employer__employer_location",
+    "employer_industry": "application__employer__industry",
+    "employer_employees": "application__employer__number_employees",
+    "employer_glassdoor_score": "application__employer__glassdoor_score",
+    "employer_diversity_score": "application__employer__diversity_score",
+    "employer_openings": "application__employer__openings_number",
+    "employer_mission": "application__employer__mission_statement",
+    "callback_status": "callback_status",
+    "callback_date": "callback_date",
+    "callback_medium": "callback_medium",
+    "callback_notes": "callback_notes",
+    "days_to_response": "days_to_response",
+    "response_censored": "response_censored",
+    "callback_created": "created_at",
+    "callback_updated": "updated_at",
+}
+
+UPDATE_FIELDS = list(AUDIT_ROW_SOURCES) + ["employer_size"]
+
+# Lookup from CallbackLog to each model whose saves change audit rows
+SYNC_LOOKUPS = {
+    "CallbackLog": "pk",
+    "Profile": "profile",
+    "Pair": "application__pair",
+    "PairApplication": "application",
+    "Employer": "application__employer",
+}
+
+
+def employer_size_bucket(number_employees):
+    """Headcount band used by the dashboard ("" when unknown)."""
+    if number_employees is None:
+        return ""
+    if number_employees < 50:
+        return "1-49"
+    if number_employees < 250:
+        return "50-249"
+    if number_employees < 1000:
+        return "250-999"
+    return "1000+"
+
+
+def build_audit_rows(callback_logs):
+    """Unsaved AuditRow objects for a CallbackLog queryset, from one joined query."""
+    rows = []
+    for values in callback_logs.order_by().values("pk", *AUDIT_ROW_SOURCES.values()):
+        row = AuditRow(callback_log_id=values["pk"])
+        for field, path in AUDIT_ROW_SOURCES.items():
+            setattr(row, field, values[path])
+        row.employer_size = employer_size_bucket(row.employer_employees)
+        rows.append(row)
+    return rows
+
+
+def refresh_audit_rows(callback_logs=None, batch_size=DEFAULT_BATCH_SIZE, update_summary=True):
+    """
+    Upsert the audit rows of `callback_logs` (default: every log).
+
+    With update_summary the dashboard cells take the difference between the
+    old and the new rows, so moving a row between cells (e.g. an employer's
+    industry changing) keeps both cells right.
+
+    Returns:
+        int: number of rows written
+    """
+    if callback_logs is None:
+        callback_logs = CallbackLog.objects.all()
+    log_ids = list(callback_logs.order_by("pk").values_list("pk", flat=True))
+
+    written = 0
+    removed, added = [], []
+    with transaction.atomic():
+        for start in range(0, len(log_ids), batch_size):
+            batch = log_ids[start:start + batch_size]
+            old_rows = {}
+            if update_summary:
+                old_rows = {row.callback_log_id: row for row in AuditRow.objects.filter(callback_log_id__in=batch)}
+            rows = build_audit_rows(CallbackLog.objects.filter(pk__in=batch))
+            AuditRow.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=["callback_log"],
+                update_fields=UPDATE_FIELDS,
+            )
+            if update_summary:
+                for row in rows:
+                    old = old_rows.get(row.callback_log_id)
+                    # Edits that leave the cells and status alone don't change any count
+                    if old is None or summary_state(old) != summary_state(row):
+                        added.append(row)
+                        if old is not None:
+                            removed.append(old)
+            written += len(rows)
+
+        if added:
+            apply_summary_deltas(summary_deltas(removed, added))
+    return written
+
+
+_pending = threading.local()
+
+
+def schedule_refresh(model, pk):
+    """
+    Queue a refresh of the audit rows built from this instance.
+
+    Every save in a transaction lands in the same per-thread queue, which
+    the first on-commit flush drains in one refresh; later flushes of the
+    same commit find it empty. Entries left over by a rollback are simply
+    refreshed with the next commit.
+    """
+    pending = getattr(_pending, "items", None)
+    if pending is None:
+        pending = _pending.items = {}
+    pending.setdefault(model.__name__, set()).add(pk)
+    transaction.on_commit(flush_pending_refreshes)
+
+
+def flush_pending_refreshes():
+    """Refresh every audit row queued by schedule_refresh."""
+    pending = getattr(_pending, "items", None)
+    if not pending:
+        return 0
+    _pending.items = {}
+    condition = Q()
+    for name, pks in pending.items():
+        condition |= Q(**{f"{SYNC_LOOKUPS[name]}__in": pks})
+    return refresh_audit_rows(CallbackLog.objects.filter(condition))
+
+
+def schedule_summary_deltas(deltas):
+    """Queue dashboard count deltas to apply on commit, summed per thread like schedule_refresh."""
+    pending = getattr(_pending, "deltas", None)
+    if pending is None:
+        pending = _pending.deltas = {}
+    merge_summary_deltas(pending, deltas)
+    transaction.on_commit(flush_pending_summary_deltas)
+
+
+def flush_pending_summary_deltas():
+    """Apply every dashboard delta queued by schedule_summary_deltas."""
+    deltas = getattr(_pending, "deltas", None)
+    if not deltas:
+        return
+    _pending.deltas = {}
+    apply_summary_deltas(deltas)
+
+
+def refresh_audit_rows_for(model, pks):
+    """Refresh the audit rows linked to the given instances of a synced model."""
+    pks = list(pks)
+    if not pks:
+        return 0
+    lookup = SYNC_LOOKUPS[model.__name__]
+    return refresh_audit_rows(CallbackLog.objects.filter(**{f"{lookup}__in": pks}))
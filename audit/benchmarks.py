@@ -0,0 +1,97 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Timings are collected in milliseconds and summarised with numpy
+percentiles; reports carry enough metadata (backend, row counts, git
+revision) to compare runs taken on different machines or commits.
+"""
+
+import subprocess
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import AuditRow, CallbackLog, Employer, Pair, PairApplication, Profile
+
+REPORT_MODELS = (Pair, Profile, Employer, PairApplication, CallbackLog, AuditRow)
+
+
+def summarize(samples_ms):
+    """p50/p95/p99/mean/max of a list of millisecond timings; an empty list gives zeros."""
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if not samples.size:
+        return {"count": 0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(samples.size),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "mean_ms": round(float(samples.mean()), 2),
+        "max_ms": round(float(samples.max()), 2),
+    }
+
+
+def time_call(func, repeat=5, warmup=1):
+    """
+    Run `func` `warmup` + `repeat` times and summarise the timed runs.
+
+    The query count is that of the last run; `func` may return an HTTP
+    response, whose status code is reported too.
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    result = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = func()
+            samples.append((time.perf_counter() - started) * 1000)
+    summary = summarize(samples)
+    summary["queries"] = len(queries.captured_queries)
+    status = getattr(result, "status_code", None)
+    if status is not None:
+        summary["status"] = status
+    return summary
+
+
+def git_revision():
+    """Short commit hash of the checkout, or "" outside a git work tree."""
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return output.stdout.strip() if output.returncode == 0 else ""
+
+
+def report_metadata():
+    """Backend, row counts and revision recorded at the top of every report."""
+    return {
+        "generated_at": timezone.now().isoformat(),
+        "git_revision": git_revision(),
+        "backend": connection.vendor,
+        "rows": {model._meta.model_name: model.objects.count() for model in REPORT_MODELS},
+    }
+
+
+@contextmanager
+def benchmark_user(username):
+    """A superuser for the test client, deleted afterwards unless it already existed."""
+    user, created = User.objects.get_or_create(
+        username=username, defaults={"is_staff": True, "is_superuser": True}
+    )
+    try:
+        yield user
+    finally:
+        if created:
+            user.delete()
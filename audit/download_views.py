@@ -0,0 +1,29 @@
+# download_views.py
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from .downloads import pdf_filename, resume_zip_entries, serve_stored_file, zip_response
+from .models import Pair, Profile
+from .pipeline import ensure_pdfs
+
+
+@staff_member_required
+def resume_pdf(request, profile_id):
+    """One profile's resume PDF, opened in the browser; printed now if it was generated lazily."""
+    profile = get_object_or_404(Profile.objects.select_related('pair'), pk=profile_id)
+    ensure_pdfs([profile])
+    if not profile.resume_pdf or not profile.resume_pdf.storage.exists(profile.resume_pdf.name):
+        raise Http404('No PDF stored for this profile')
+    return serve_stored_file(request, profile.resume_pdf.storage, profile.resume_pdf.name, pdf_filename(profile))
+
+
+@staff_member_required
+def pair_pdf_bundle(request, pair_id):
+    """Both resume PDFs of a pair as one ZIP, streamed as it is built."""
+    pair = get_object_or_404(Pair, pk=pair_id)
+    profiles = list(pair.profiles.select_related('pair').order_by('resume_idx'))
+    ensure_pdfs(profiles)
+    profiles = [profile for profile in profiles if profile.resume_pdf]
+    if not profiles:
+        raise Http404('No PDFs stored for this pair')
+    return zip_response(request, resume_zip_entries(profiles), f'{pair.pair_id}_resumes.zip')
@@ -0,0 +1,306 @@
+"""
+Delivery of stored resume PDFs.
+
+serve_stored_file() hands the transfer to the front web server when
+RESUME_SENDFILE is set: an X-Accel-Redirect (nginx) or X-Sendfile (Apache
+mod_xsendfile, lighttpd) header names the file and the worker is free at
+once. Otherwise Django streams the file itself, with ETag/Last-Modified
+revalidation and single byte-range requests (PDF viewers fetch by range).
+Gzipped objects of the resume store are always streamed by Django, which
+decompresses them on the way out.
+
+stream_zip() builds a ZIP archive on the fly: every entry is read and
+compressed in chunks and each chunk is yielded as soon as it is written,
+so memory stays flat and nothing touches disk whatever the archive size.
+
+Under ASGI both are handed to the server as async iterators that pull one
+chunk at a time from a worker thread (async_chunks): the server would
+otherwise consume a sync iterator with sync_to_async(list), building the
+whole file or archive in memory before sending a byte.
+
+Settings (all optional):
+    RESUME_SENDFILE         "" (serve from Django, default), "nginx" or "xsendfile"
+    RESUME_SENDFILE_PREFIX  internal nginx location aliased to MEDIA_ROOT (default "/protected/")
+"""
+
+import csv
+import io
+import re
+import time
+import zipfile
+from pathlib import PurePosixPath
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date
+
+from .storage import GZIP_SUFFIX, is_blob_name
+
+CHUNK_SIZE = 64 * 1024
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def pdf_filename(profile):
+    """Download name of a profile's PDF, as the generator names it ("Full_Name_<pair_id>.pdf")."""
+    return f"{profile.full_name.replace(' ', '_')}_{profile.pair.pair_id}.pdf"
+
+
+def file_etag(name, size, modified):
+    # Store objects are named by the SHA-256 of their content, which makes a strong validator
+    if is_blob_name(name):
+        return f'"{PurePosixPath(name).name.split(".")[0]}"'
+    return f'"{int(modified):x}-{size:x}"'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive of a single "bytes=" range, None to send everything, or False if unsatisfiable."""
+    match = BYTE_RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None  # absent, malformed or multi-range: the whole file is a valid answer
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:  # suffix range: the final N bytes
+        length = int(last)
+        return (max(size - length, 0), size - 1) if length and size else False
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _read_chunks(f, start, length):
+    with f:
+        if start:
+            f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+async def async_chunks(chunks, thread_sensitive=True):
+    """
+    Async iterator over a blocking iterator of bytes chunks, each step run
+    by sync_to_async. Keep thread_sensitive when producing a chunk touches
+    the database (its connection belongs to one thread).
+    """
+    chunks = iter(chunks)
+    step = sync_to_async(next, thread_sensitive=thread_sensitive)
+    try:
+        while (chunk := await step(chunks, None)) is not None:
+            yield chunk
+    finally:
+        # Client gone or stream done: release the open files of a generator
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=thread_sensitive)()
+
+
+def streaming_response(request, chunks, thread_sensitive=True, **kwargs):
+    """StreamingHttpResponse over `chunks`, as an async iterator when served over ASGI."""
+    if isinstance(request, ASGIRequest):
+        chunks = async_chunks(chunks, thread_sensitive)
+    return StreamingHttpResponse(chunks, **kwargs)
+
+
+def serve_stored_file(request, storage, name, filename, content_type="application/pdf", as_attachment=False):
+    """Response delivering one stored file, via the web server when configured."""
+    size = storage.size(name)
+    modified = storage.get_modified_time(name).timestamp()
+    etag = file_etag(name, size, modified)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(modified))
+    if response is None:
+        response = _file_response(request, storage, name, size, etag, content_type)
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(modified)
+    if response.status_code in (200, 206):
+        response.headers["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    # Revalidated on each view; an unchanged PDF then costs a 304
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _file_response(request, storage, name, size, etag, content_type):
+    backend = getattr(settings, "RESUME_SENDFILE", "")
+    compressed = name.endswith(GZIP_SUFFIX)
+    if backend and not compressed:
+        # The web server handles ranges and the transfer itself
+        response = HttpResponse(content_type=content_type)
+        if backend == "nginx":
+            prefix = getattr(settings, "RESUME_SENDFILE_PREFIX", "/protected/")
+            response.headers["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + quote(name)
+        else:
+            response.headers["X-Sendfile"] = storage.path(name)
+        return response
+
+    # A Range only applies while If-Range (if sent) still matches this version
+    byte_range = None
+    if request.headers.get("If-Range", etag) == etag:
+        byte_range = parse_range(request.headers.get("Range"), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response.headers["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if byte_range is None and not compressed and not isinstance(request, ASGIRequest):
+        # FileResponse lets the WSGI server use its file wrapper (sendfile) where it has one
+        response = FileResponse(storage.open(name), content_type=content_type)
+    elif byte_range is None:
+        # File reads need no database connection, so they may run on any thread
+        response = streaming_response(
+            request, _read_chunks(storage.open(name), 0, size), thread_sensitive=False, content_type=content_type
+        )
+        response.headers["Content-Length"] = size
+    else:
+        start, end = byte_range
+        response = streaming_response(
+            request, _read_chunks(storage.open(name), start, end - start + 1), thread_sensitive=False,
+            status=206, content_type=content_type,
+        )
+        response.headers["Content-Length"] = end - start + 1
+        response.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response.headers["Accept-Ranges"] = "bytes"
+    return response
+
+
+class _ZipSink:
+    """Write-only file object holding what zipfile writes until the next drain()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of `entries`, (name, source) pairs where source is
+    bytes, a callable returning an open binary file, or an iterable of
+    bytes chunks.
+
+    The sink can't seek, so zipfile writes each entry's sizes and CRC in a
+    data descriptor after its data instead of going back to the header.
+    """
+    sink = _ZipSink()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for arcname, source in entries:
+            info = zipfile.ZipInfo(arcname, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            if isinstance(source, bytes):
+                archive.writestr(info, source)
+            elif callable(source):
+                with source() as f, archive.open(info, "w") as out:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        out.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            else:
+                with archive.open(info, "w") as out:
+                    for chunk in source:
+                        out.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()  # central directory
+
+
+def resume_zip_entries(profiles, folders=False):
+    """ZIP entries for the profiles' stored PDFs (under a <pair_id>/ folder each if `folders`), skipping missing files."""
+    for profile in profiles:
+        field_file = profile.resume_pdf
+        if not field_file or not field_file.storage.exists(field_file.name):
+            continue
+        arcname = pdf_filename(profile)
+        if folders:
+            arcname = f"{profile.pair.pair_id}/{arcname}"
+        yield arcname, lambda f=field_file: f.storage.open(f.name)
+
+
+def _manifest_status(profile):
+    """
+    (file, status) of a profile in the bulk export manifest: "ok" when its
+    PDF is in the archive, "not_printed" when it has none yet but can be
+    printed on download (HTML or a seed), "missing" otherwise.
+    """
+    field_file = profile.resume_pdf
+    if field_file and field_file.storage.exists(field_file.name):
+        return f"{profile.pair.pair_id}/{pdf_filename(profile)}", "ok"
+    if not field_file and (profile.has_html or profile.pair.rng_seed is not None):
+        return "", "not_printed"
+    return "", "missing"
+
+
+def _manifest_rows(profiles):
+    """manifest.csv of a bulk export, one encoded line at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["pair_id", "resume_idx", "full_name", "file", "status"])
+    for profile in profiles:
+        writer.writerow([profile.pair.pair_id, profile.resume_idx, profile.full_name, *_manifest_status(profile)])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+def pairs_zip_entries(pairs, chunk_size=500):
+    """
+    ZIP entries for every resume PDF of `pairs` (a Pair queryset): a
+    manifest.csv first, then one <pair_id>/ folder per pair. Profiles are
+    read with iterator() in both passes, so no list of them is ever held.
+    PDFs not printed yet are not printed for the export; the manifest
+    lists them with their status.
+    """
+    from .models import Profile
+
+    def profiles(*fields, **annotations):
+        return (
+            Profile.objects.filter(pair__in=pairs.values("pk"))
+            .select_related("pair")
+            .only("pair__pair_id", "full_name", "resume_idx", "resume_pdf", *fields)
+            .annotate(**annotations)
+            .order_by("pair__pair_id", "resume_idx")
+            .iterator(chunk_size=chunk_size)
+        )
+
+    # Whether there is HTML, without reading every resume's HTML
+    has_html = ExpressionWrapper(~Q(resume_html=""), output_field=BooleanField())
+    yield "manifest.csv", _manifest_rows(profiles("pair__rng_seed", has_html=has_html))
+    yield from resume_zip_entries(profiles(), folders=True)
+
+
+def zip_response(request, entries, filename):
+    # Entries may read profiles from the database while the archive streams
+    response = streaming_response(request, stream_zip(entries), content_type="application/zip")
+    response.headers["Content-Disposition"] = content_disposition_header(True, filename)
+    return response
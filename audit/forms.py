@@ -1,5 +1,6 @@
 # forms.py
 from django import forms
+import uuid
 from .models import PairApplication, Pair
 
 class SimplePairGenerationForm(forms.Form):
@@ -60,127 +61,20 @@ class SimplePairGenerationForm(forms.Form):
         return archetype
 
     def generate_pair_with_pdfs(self):
-        """Generate pair with PDFs using thread pool to isolate pyppeteer."""
+        """Generate and store a pair with PDFs through the shared pipeline (audit.pipeline); returns the display dict."""
         if not self.is_valid():
             raise ValueError("Form is not valid")
 
-        location = self.cleaned_data['location']
-        occupation = self.cleaned_data['occupation']
-        archetype_string = self.cleaned_data['archetype']
-
-        # Convert archetype string to numeric index for the backend
+        from asgiref.sync import async_to_sync
+        from .pipeline import generate, pair_display
         from .services import get_archetype_index
-        archetype = get_archetype_index(occupation, archetype_string)
-
-        # Import required modules
-        import sys
-        import asyncio
-        from pathlib import Path
-        from concurrent.futures import ThreadPoolExecutor
-
-        sys.path.insert(0, str(Path(__file__).parent.parent.parent / "experiment-design" / "cv-generator" / "code"))
-
-        def run_pyppeteer_in_thread():
-            """Run pyppeteer in isolated thread with signal handling patch."""
-            import signal
-
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            # Store original signal function
-            original_signal = signal.signal
-
-            # Create dummy signal function to bypass pyppeteer's signal setup
-            def dummy_signal(*args, **kwargs):
-                pass
-
-            try:
-                # Temporarily replace signal handler during pyppeteer operations
-                signal.signal = dummy_signal
-
-                # Import inside thread to avoid module conflicts
-                from resume_randomization import generate_pair, generate_render_and_log_pair_async
-
-                # First get the pair data for display
-                pair_data = generate_pair(occupation, location, archetype)
-
-                # Then generate the PDFs using the same pair_id (this returns folder path)
-                folder_path = loop.run_until_complete(
-                    generate_render_and_log_pair_async(occupation, location, archetype, pair_id=pair_data['pair_id'])
-                )
 
-                # Add form parameters to result for display
-                pair_data['occupation'] = occupation
-                pair_data['location'] = location
-
-                # Convert archetype number to descriptive name
-                from .services import ARCHETYPE_NAMES
-                archetype_name = next((name for num, name in ARCHETYPE_NAMES.get(occupation, []) if num == archetype), f"Archetype {archetype}")
-                pair_data['archetype'] = archetype_name
-
-                pair_data['good_fit_occupations'] = pair_data.get('good_fit_occupations', '')
-                pair_data['pair_id'] = pair_data.get('pair_id', '')
-
-                # Convert skills lists to joined strings for display
-                if 'resume1' in pair_data and 'skills' in pair_data['resume1']:
-                    if isinstance(pair_data['resume1']['skills'], list):
-                        pair_data['resume1']['skills'] = '; '.join(pair_data['resume1']['skills'])
-                if 'resume2' in pair_data and 'skills' in pair_data['resume2']:
-                    if isinstance(pair_data['resume2']['skills'], list):
-                        pair_data['resume2']['skills'] = '; '.join(pair_data['resume2']['skills'])
-
-                # Convert good_fit_occupations list to joined string for display
-                if 'good_fit_occupations' in pair_data and isinstance(pair_data['good_fit_occupations'], list):
-                    pair_data['good_fit_occupations'] = '; '.join(pair_data['good_fit_occupations'])
-
-                # Return both the pair data and folder info
-                pair_data['folder_path'] = str(folder_path)
-                return pair_data
-            finally:
-                # Always restore original signal handling
-                signal.signal = original_signal
-                loop.close()
-
-        # Execute in thread pool to avoid Django's threading issues
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(run_pyppeteer_in_thread)
-            result = future.result()
-
-        # Create minimal pair record for job application workflow
-        from .models import Pair, Profile
-        pair_obj = Pair.objects.create(
-            pair_id=result['pair_id'],
-            occupation=occupation,
-            good_fit_occupations=result['good_fit_occupations'],
-            location=location,
-            archetype=archetype,  # Already converted to int
-            sublocation=None  # SimplePairGenerationForm doesn't have sublocation
+        occupation = self.cleaned_data['occupation']
+        archetype_string = self.cleaned_data['archetype']
+        pair = async_to_sync(generate)(
+            self.cleaned_data['location'], occupation, get_archetype_index(occupation, archetype_string)
         )
-
-        # Create Profile records for both resumes
-        for resume_key, resume_idx in [('resume1', 1), ('resume2', 2)]:
-            resume_data = result[resume_key]
-
-            # Convert skills list to string if needed
-            skills = resume_data.get('skills', '')
-            if isinstance(skills, list):
-                skills = '; '.join(skills)
-
-            Profile.objects.create(
-                pair=pair_obj,
-                full_name=resume_data.get('full_name', ''),
-                phone=resume_data.get('phone', ''),
-                address=resume_data.get('address', ''),
-                email=resume_data.get('email', ''),
-                expertise=skills,
-                resume_idx=resume_idx
-            )
-
-        # Add the database ID to result for template
-        result['pair_db_id'] = pair_obj.pk
-
-        return result
+        return pair_display(pair, archetype_string)
 
     def generate_pair(self):
         """Synchronous fallback - calls basic generate_pair without PDFs."""
@@ -275,6 +169,8 @@ class PairGenerationForm(forms.Form):
         help_text="Select specific area within location (optional)",
         widget=forms.Select(choices=[("", "Select sublocation (optional)")])
     )
+    # Minted per rendered form: a repeated submit of one form joins its first job (see audit.generation)
+    token = forms.UUIDField(widget=forms.HiddenInput, initial=uuid.uuid4, required=False)
 
     def clean_archetype(self):
         """Custom validation for dynamic archetype values."""
@@ -297,6 +193,10 @@ class PairGenerationForm(forms.Form):
 
         return archetype
 
+    def clean_token(self):
+        # Posts without a token (older pages) still work, just without the double-submit guard
+        return self.cleaned_data.get('token') or uuid.uuid4()
+
     def clean_sublocation(self):
         """Custom validation for dynamic sublocation values."""
         sublocation = self.cleaned_data.get('sublocation')
@@ -327,20 +227,11 @@ class PairGenerationForm(forms.Form):
 
         return sublocation
 
-    def generate_pair(self):
-        """Generate and store a new pair with PDFs using thread pool to avoid signal issues."""
-        if not self.is_valid():
-            raise ValueError("Form is not valid")
-
+    def job_params(self):
+        """GenerationJob fields for the cleaned form, with the sublocation filled in where there is only one."""
         location = self.cleaned_data['location']
-        occupation = self.cleaned_data['occupation']
-        archetype_string = self.cleaned_data['archetype']
         sublocation = int(self.cleaned_data['sublocation']) if self.cleaned_data['sublocation'] else None
 
-        # Convert archetype string to numeric index for the backend
-        from .services import get_archetype_index
-        archetype = get_archetype_index(occupation, archetype_string)
-
         # Auto-select sublocation for single-sublocation locations
         if sublocation is None:
             from .services import get_available_sublocations
@@ -348,121 +239,37 @@ class PairGenerationForm(forms.Form):
             if len(sublocations) == 1:
                 sublocation = sublocations[0][0]  # Use the index of the single sublocation
 
-        # Import required modules
-        import sys
-        import asyncio
-        from pathlib import Path
-        from concurrent.futures import ThreadPoolExecutor
-
-        sys.path.insert(0, str(Path(__file__).parent.parent.parent / "experiment-design" / "cv-generator" / "code"))
-
-        def run_pyppeteer_in_thread():
-            """Run pyppeteer in isolated thread with signal handling patch."""
-            import signal
-
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            # Store original signal function
-            original_signal = signal.signal
-
-            # Create dummy signal function to bypass pyppeteer's signal setup
-            def dummy_signal(*args, **kwargs):
-                pass
-
-            try:
-                # Temporarily replace signal handler during pyppeteer operations
-                signal.signal = dummy_signal
-
-                # Import inside thread to avoid module conflicts
-                from resume_randomization import generate_pair, generate_render_and_log_pair_async
-
-                # First get the pair data for display
-                pair_data = generate_pair(occupation, location, archetype, sublocation)
-
-                # Then generate the PDFs using the same pair_id (this returns folder path)
-                folder_path = loop.run_until_complete(
-                    generate_render_and_log_pair_async(occupation, location, archetype, sublocation, pair_id=pair_data['pair_id'])
-                )
-
-                # Add form parameters to result for display
-                pair_data['occupation'] = occupation
-                pair_data['location'] = location
-
-                # Convert archetype string to descriptive name
-                from .services import get_archetype_display_name
-                pair_data['archetype'] = get_archetype_display_name(occupation, archetype_string)
-
-                # Convert sublocation number to descriptive name
-                if sublocation:
-                    from .services import HARDCODED_SUBLOCATIONS
-                    sublocation_name = next((name for num, name in HARDCODED_SUBLOCATIONS.get(location, []) if num == sublocation), f"Sublocation {sublocation}")
-                    pair_data['sublocation'] = sublocation_name
-                else:
-                    pair_data['sublocation'] = None  # Template will show "Not specified"
-                pair_data['good_fit_occupations'] = pair_data.get('good_fit_occupations', '')
-                pair_data['pair_id'] = pair_data.get('pair_id', '')
-
-                # Convert skills lists to joined strings for display
-                if 'resume1' in pair_data and 'skills' in pair_data['resume1']:
-                    if isinstance(pair_data['resume1']['skills'], list):
-                        pair_data['resume1']['skills'] = '; '.join(pair_data['resume1']['skills'])
-                if 'resume2' in pair_data and 'skills' in pair_data['resume2']:
-                    if isinstance(pair_data['resume2']['skills'], list):
-                        pair_data['resume2']['skills'] = '; '.join(pair_data['resume2']['skills'])
-
-                # Convert good_fit_occupations list to joined string for display
-                if 'good_fit_occupations' in pair_data and isinstance(pair_data['good_fit_occupations'], list):
-                    pair_data['good_fit_occupations'] = '; '.join(pair_data['good_fit_occupations'])
-
-                # Return both the pair data and folder info
-                pair_data['folder_path'] = str(folder_path)
-                return pair_data
-            finally:
-                # Always restore original signal handling
-                signal.signal = original_signal
-                loop.close()
-
-        # Execute in thread pool to avoid Django's threading issues
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            future = executor.submit(run_pyppeteer_in_thread)
-            result = future.result()
-
-        # Create minimal pair record for job application workflow
-        from .models import Pair, Profile
-        pair_obj = Pair.objects.create(
-            pair_id=result['pair_id'],
-            occupation=occupation,
-            good_fit_occupations=result['good_fit_occupations'],
-            location=location,
-            archetype=archetype,  # Already converted to int
-            sublocation=sublocation  # PairGenerationForm has sublocation support
-        )
+        return {
+            'location': location,
+            'occupation': self.cleaned_data['occupation'],
+            'archetype': self.cleaned_data['archetype'],
+            'sublocation': sublocation,
+        }
 
-        # Create Profile records for both resumes
-        for resume_key, resume_idx in [('resume1', 1), ('resume2', 2)]:
-            resume_data = result[resume_key]
+    async def agenerate_pair(self):
+        """
+        Generate and store a new pair with PDFs on the running event loop; returns the display dict.
 
-            # Convert skills list to string if needed
-            skills = resume_data.get('skills', '')
-            if isinstance(skills, list):
-                skills = '; '.join(skills)
+        A pre-generated pair of the requested cell is claimed instead of
+        rendering one (see audit.inventory). A token that was already
+        submitted doesn't start another render: this waits for the first
+        submit's job and returns its pair.
+        """
+        if not self.is_valid():
+            raise ValueError("Form is not valid")
 
-            Profile.objects.create(
-                pair=pair_obj,
-                full_name=resume_data.get('full_name', ''),
-                phone=resume_data.get('phone', ''),
-                address=resume_data.get('address', ''),
-                email=resume_data.get('email', ''),
-                expertise=skills,
-                resume_idx=resume_idx
-            )
+        from .generation import job_result, run_job, start_job, wait_for_job
 
-        # Add the database ID to result for template
-        result['pair_db_id'] = pair_obj.pk
+        job, started = await start_job(self.cleaned_data['token'], **self.job_params())
+        job = await run_job(job) if started else await wait_for_job(job)
+        if job.status != 'done':
+            raise Exception(job.error or "Generation stopped before finishing")
+        return await job_result(job)
 
-        return result
+    def generate_pair(self):
+        """Synchronous wrapper for agenerate_pair (management commands, WSGI callers)."""
+        from asgiref.sync import async_to_sync
+        return async_to_sync(self.agenerate_pair)()
 
 class PairApplicationForm(forms.ModelForm):
     """Form for creating job applications with existing pairs."""
@@ -482,6 +289,9 @@ class PairApplicationForm(forms.ModelForm):
             'pair': forms.HiddenInput(),
         }
 
+    # The ?pair= the admin add form was opened with (set by PairApplicationAdmin.get_form)
+    requested_pair = None
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -498,7 +308,20 @@ class PairApplicationForm(forms.ModelForm):
             except Pair.DoesNotExist:
                 pass
 
-        # Employer field setup
-        self.fields['employer'].help_text = "Use the 'Add Employer' button to add an employer."
+        # Employer field setup (absent when the application is submitted and every field is readonly)
+        if 'employer' in self.fields:
+            self.fields['employer'].help_text = "Use the 'Add Employer' button to add an employer."
+
+    def clean(self):
+        cleaned_data = super().clean()
+        # pair isn't among the admin's fields: a new application takes the pair its add form was opened from
+        if "pair" not in self.fields and not self.instance.pair_id:
+            try:
+                self.instance.pair = Pair.objects.get(pk=self.requested_pair)
+            except (Pair.DoesNotExist, ValueError, TypeError):
+                raise forms.ValidationError(
+                    "This application has no pair: open the form from the pair's application link."
+                )
+        return cleaned_data
             
 
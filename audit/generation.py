@@ -0,0 +1,206 @@
+"""
+Pair generation jobs.
+
+The generation form carries a token minted when it is rendered, and each
+token gets one GenerationJob (the column is unique). Submitting the same
+form again (a double click, a browser retry, a second tab) attaches to
+the existing job instead of rendering another pair.
+
+A job runs the generation pipeline (audit.pipeline) and records each stage
+as it completes:
+
+    randomise  render_1  render_2  save_pdfs  db_write
+
+A job whose cell has pre-generated pairs (see audit.inventory) doesn't
+render at all: start_job claims one and the job is done at once.
+
+job_events() turns those rows into server-sent events. The generation
+page subscribes to them, ticks the stages off and opens the result when
+the job is done. Without JavaScript the form posts normally and the view
+waits for the job instead.
+"""
+
+import asyncio
+import contextvars
+import json
+import threading
+import time
+
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.db import connection
+from django.utils import timezone
+
+from .models import GenerationJob, Pair
+
+POLL_INTERVAL = 0.5     # seconds between job row reads while streaming or waiting
+HEARTBEAT_INTERVAL = 15  # seconds between SSE comments that keep proxies from closing the stream
+JOB_TIMEOUT = 10 * 60   # a job running longer than this is treated as lost (worker restarted)
+
+# Strong references to background tasks; the loop only keeps weak ones
+_tasks = set()
+
+
+async def start_job(token, location, occupation, archetype, sublocation=None):
+    """
+    (job, started) for this form token. `started` is False when the token's
+    job is already running or done; a failed or lost job made no pair, so
+    it is restarted under the same token, with the parameters of this
+    submit (the form may have been changed before resubmitting). A new or restarted job that can
+    take a pair from the inventory is done on return, also with `started` False.
+    """
+    # A concurrent submit losing the insert race gets the winner's row (get_or_create retries the get)
+    job, created = await GenerationJob.objects.aget_or_create(token=token, defaults=dict(
+        location=location, occupation=occupation, archetype=archetype, sublocation=sublocation,
+    ))
+    if created:
+        return await _claim_from_inventory(job)
+    if job.status == "failed" or is_lost(job):
+        # Conditional on the row being unchanged, so two retries restart it once
+        restarted = await GenerationJob.objects.filter(
+            pk=job.pk, status=job.status, updated_at=job.updated_at
+        ).aupdate(
+            status="running", stages_done=[], error="", updated_at=timezone.now(),
+            location=location, occupation=occupation, archetype=archetype, sublocation=sublocation,
+        )
+        if restarted:
+            return await _claim_from_inventory(await GenerationJob.objects.aget(pk=job.pk))
+    return job, False
+
+
+async def _claim_from_inventory(job):
+    from .inventory import Cell, aclaim_pair
+    from .services import get_archetype_index
+
+    pair = await aclaim_pair(Cell(
+        job.location, job.occupation, get_archetype_index(job.occupation, job.archetype), job.sublocation
+    ))
+    if pair is None:
+        return job, True
+    await GenerationJob.objects.filter(pk=job.pk).aupdate(status="done", pair=pair, updated_at=timezone.now())
+    return await GenerationJob.objects.aget(pk=job.pk), False
+
+
+async def run_job(job):
+    """Generate the job's pair, recording stages as they finish; returns the job in its final state."""
+    from .pipeline import generate
+    from .services import get_archetype_index
+
+    stages = []
+
+    async def progress(stage):
+        stages.append(stage)
+        await GenerationJob.objects.filter(pk=job.pk).aupdate(stages_done=list(stages), updated_at=timezone.now())
+
+    try:
+        pair = await generate(
+            job.location, job.occupation, get_archetype_index(job.occupation, job.archetype), job.sublocation,
+            progress=progress,
+        )
+    except Exception as e:
+        await GenerationJob.objects.filter(pk=job.pk).aupdate(status="failed", error=str(e), updated_at=timezone.now())
+    else:
+        await GenerationJob.objects.filter(pk=job.pk).aupdate(status="done", pair=pair, updated_at=timezone.now())
+    return await GenerationJob.objects.aget(pk=job.pk)
+
+
+async def _run_detached(job):
+    # Its own thread-sensitive context: the request's is torn down when the
+    # response is sent, and the ORM calls below outlive it
+    async with ThreadSensitiveContext():
+        try:
+            await run_job(job)
+        finally:
+            await sync_to_async(connection.close)()
+
+
+def launch(job, on_event_loop):
+    """
+    Run the job in the background, after the response that started it.
+
+    Under ASGI (`on_event_loop`) it becomes a task on the server's event
+    loop, so renders overlap with other requests; under WSGI the view's
+    loop ends with the request, so the job gets a thread and loop of its own.
+    """
+    if on_event_loop:
+        task = asyncio.get_running_loop().create_task(_run_detached(job), context=contextvars.Context())
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    else:
+        threading.Thread(target=asyncio.run, args=(_run_detached(job),), daemon=True).start()
+
+
+def is_lost(job):
+    return job.status == "running" and (timezone.now() - job.updated_at).total_seconds() > JOB_TIMEOUT
+
+
+async def wait_for_job(job, timeout=JOB_TIMEOUT):
+    """The job once it has finished (or been lost); polls its row."""
+    deadline = time.monotonic() + timeout
+    while job.status == "running" and not is_lost(job) and time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        job = await GenerationJob.objects.aget(pk=job.pk)
+    return job
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+def _events_since(job, sent, result_url):
+    """SSE chunks for the job's state after `sent` reported stages, and whether the stream ends here."""
+    labels = dict(GenerationJob.STAGE_CHOICES)
+    chunks = [_event("stage", {"stage": stage, "label": labels.get(stage, stage)}) for stage in job.stages_done[sent:]]
+    if job.status == "done":
+        chunks.append(_event("done", {"pair_id": job.pair_id, "result_url": result_url}))
+        return chunks, True
+    if job.status == "failed" or is_lost(job):
+        chunks.append(_event("failed", {"error": job.error or "Generation stopped before finishing"}))
+        return chunks, True
+    return chunks, False
+
+
+async def job_events(job, result_url):
+    """
+    Server-sent events for a job: one "stage" event per completed stage,
+    then "done" (with the result page URL) or "failed" (with the error).
+    A reconnecting client gets the stages again from the start.
+    """
+    sent, idle = 0, 0.0
+    while True:
+        chunks, finished = _events_since(job, sent, result_url)
+        sent = len(job.stages_done)
+        for chunk in chunks:
+            yield chunk
+        if finished:
+            return
+        idle = 0.0 if chunks else idle + POLL_INTERVAL
+        if idle >= HEARTBEAT_INTERVAL:
+            yield b": keep-alive\n\n"
+            idle = 0.0
+        await asyncio.sleep(POLL_INTERVAL)
+        job = await GenerationJob.objects.aget(pk=job.pk)
+
+
+def job_events_sync(job, result_url):
+    """job_events for WSGI servers, which would buffer an async stream until it ended."""
+    sent, idle = 0, 0.0
+    while True:
+        chunks, finished = _events_since(job, sent, result_url)
+        sent = len(job.stages_done)
+        yield from chunks
+        if finished:
+            return
+        idle = 0.0 if chunks else idle + POLL_INTERVAL
+        if idle >= HEARTBEAT_INTERVAL:
+            yield b": keep-alive\n\n"
+            idle = 0.0
+        time.sleep(POLL_INTERVAL)
+        job = GenerationJob.objects.get(pk=job.pk)
+
+
+async def job_result(job):
+    """The generation page's result panel for a finished job."""
+    from .pipeline import pair_display
+
+    pair = await Pair.objects.aget(pk=job.pair_id)
+    return await sync_to_async(pair_display)(pair, job.archetype)
@@ -0,0 +1,174 @@
+"""
+Bulk import helpers shared by the import management commands.
+
+The commands parse their source files into plain dicts and hand them to
+these helpers, which prefetch the existing rows once, diff them in Python
+and write only what changed with bulk_create / bulk_update. Profiles carry
+a hash of the source row they came from, so re-importing an unchanged row
+is a dictionary lookup rather than a write.
+"""
+
+import hashlib
+import json
+import time
+
+from django.db import transaction
+
+from .audit_rows import refresh_audit_rows_for
+from .models import PROFILE_ATTRIBUTE_FIELDS, Pair, Profile
+
+DEFAULT_BATCH_SIZE = 500
+
+PAIR_IMPORT_FIELDS = ["occupation", "good_fit_occupations"]
+PROFILE_IMPORT_FIELDS = ["phone", "address", "email", "expertise", "template_name", "resume_idx"] + PROFILE_ATTRIBUTE_FIELDS
+
+
+def source_row_hash(row):
+    """SHA-256 of a source row (dict), independent of column order."""
+    payload = json.dumps(row, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunked(items, size):
+    """Yield successive lists of at most `size` items."""
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class ImportStats:
+    """Counters reported at the end of an import run."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.pairs_created = 0
+        self.pairs_updated = 0
+        self._started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._started
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        return (
+            f"{self.rows} rows in {self.elapsed:.2f}s ({self.rows_per_sec:.0f} rows/sec) - "
+            f"profiles: {self.created} created, {self.updated} updated, {self.unchanged} unchanged; "
+            f"pairs: {self.pairs_created} created, {self.pairs_updated} updated"
+        )
+
+
+def _apply_changes(obj, values, fields):
+    """Copy `values` onto `obj`; return True if any of `fields` changed."""
+    changed = False
+    for name in fields:
+        if name in values and getattr(obj, name) != values[name]:
+            setattr(obj, name, values[name])
+            changed = True
+    return changed
+
+
+def upsert_pairs(pair_values, stats, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Create or update pairs keyed by pair_id.
+
+    Args:
+        pair_values (dict): pair_id -> dict of Pair field values
+        stats (ImportStats): counters to update
+        dry_run (bool): count changes without writing them
+
+    Returns:
+        dict: pair_id -> Pair for every requested pair_id
+    """
+    existing = Pair.objects.in_bulk(list(pair_values), field_name="pair_id")
+
+    to_create = []
+    to_update = []
+    for pair_id, values in pair_values.items():
+        pair = existing.get(pair_id)
+        if pair is None:
+            to_create.append(Pair(pair_id=pair_id, **values))
+        elif _apply_changes(pair, values, PAIR_IMPORT_FIELDS):
+            to_update.append(pair)
+
+    stats.pairs_created += len(to_create)
+    stats.pairs_updated += len(to_update)
+    if dry_run:
+        # Unsaved pairs stand in for the ones that would be created
+        existing.update({pair.pair_id: pair for pair in to_create})
+        return existing
+
+    Pair.objects.bulk_create(to_create, batch_size=batch_size)
+    Pair.objects.bulk_update(to_update, PAIR_IMPORT_FIELDS, batch_size=batch_size)
+    # bulk_update sends no signals, so refresh the affected audit rows here
+    refresh_audit_rows_for(Pair, [pair.pk for pair in to_update])
+
+    if to_create:
+        # Re-read so newly created pairs carry their primary keys on every backend
+        existing.update(Pair.objects.in_bulk([p.pair_id for p in to_create], field_name="pair_id"))
+    return existing
+
+
+def upsert_profiles(profile_values, pairs, stats, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Create or update profiles keyed by (pair_id, full_name).
+
+    Rows whose "source_hash" matches the stored hash are skipped without
+    comparing individual fields.
+
+    Args:
+        profile_values (list): dicts with "pair_id", "full_name", "source_hash"
+            and Profile field values
+        pairs (dict): pair_id -> Pair, as returned by upsert_pairs
+        stats (ImportStats): counters to update
+        dry_run (bool): count changes without writing them
+    """
+    update_fields = PROFILE_IMPORT_FIELDS + ["source_hash"]
+    pair_pks = [pair.pk for pair in pairs.values() if pair.pk is not None]
+    existing = {}
+    for pk_batch in chunked(pair_pks, batch_size):
+        for profile in Profile.objects.filter(pair_id__in=pk_batch).select_related("pair"):
+            existing[(profile.pair.pair_id, profile.full_name)] = profile
+
+    to_create = []
+    to_update = {}
+    for values in profile_values:
+        values = dict(values)
+        pair_id = values.pop("pair_id")
+        key = (pair_id, values["full_name"])
+        profile = existing.get(key)
+        if profile is None:
+            profile = Profile(pair=pairs[pair_id], **values)
+            existing[key] = profile
+            to_create.append(profile)
+        elif profile.source_hash and profile.source_hash == values.get("source_hash"):
+            stats.unchanged += 1
+        elif _apply_changes(profile, values, update_fields):
+            # Also reached when only the hash is new, so the next run can skip the row
+            if profile.pk is not None:
+                to_update[profile.pk] = profile
+        else:
+            stats.unchanged += 1
+
+    stats.created += len(to_create)
+    stats.updated += len(to_update)
+    if dry_run:
+        return
+
+    Profile.objects.bulk_create(to_create, batch_size=batch_size)
+    Profile.objects.bulk_update(to_update.values(), update_fields, batch_size=batch_size)
+    refresh_audit_rows_for(Profile, to_update)
+
+
+def import_pairs_and_profiles(pair_values, profile_values, stats, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Upsert pairs then their profiles inside a single transaction."""
+    with transaction.atomic():
+        pairs = upsert_pairs(pair_values, stats, batch_size=batch_size, dry_run=dry_run)
+        upsert_profiles(profile_values, pairs, stats, batch_size=batch_size, dry_run=dry_run)
+    return pairs
@@ -0,0 +1,116 @@
+"""
+Inventory of pre-generated pairs.
+
+A generated pair is fully determined by its cell (location, occupation,
+archetype, sublocation), and there are only a few hundred cells. The
+refill worker (`manage.py refill_pair_inventory`) keeps fully rendered
+pairs ready in each cell, flagged Pair.in_inventory, and the generation
+form claims one of them in milliseconds. Rendering on demand only happens
+when the requested cell is empty.
+
+A cell is refilled once it holds fewer than PAIR_INVENTORY_LOW_WATER
+pairs, back up to its depth, so the worker renders in batches rather
+than after every claim.
+
+Settings (all optional):
+    PAIR_INVENTORY_DEPTH      pairs kept ready per cell (default 2; 0 turns the inventory off)
+    PAIR_INVENTORY_LOW_WATER  refill a cell holding fewer pairs than this (default 1)
+    PAIR_INVENTORY_DEPTHS     depth overrides by location or "location:occupation",
+                              e.g. {"NY": 4, "TX:payroll": 0}; the more specific key wins
+"""
+
+import asyncio
+from collections import Counter, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Pair
+from .services import ARCHETYPE_MAPPINGS, HARDCODED_SUBLOCATIONS, get_archetype_index, get_available_locations
+
+Cell = namedtuple("Cell", "location occupation archetype sublocation")  # archetype as its numeric index
+
+CLAIM_ATTEMPTS = 3
+
+
+def inventory_cells():
+    """Every cell the generation form can ask for."""
+    for location in get_available_locations():
+        sublocations = [index for index, _ in HARDCODED_SUBLOCATIONS.get(location, [])]
+        # The form fills in a location's only sublocation (PairGenerationForm.job_params);
+        # elsewhere it may be left to the generator (None)
+        if len(sublocations) != 1:
+            sublocations = [None] + sublocations
+        for occupation, archetypes in ARCHETYPE_MAPPINGS.items():
+            for archetype, _ in archetypes:
+                for sublocation in sublocations:
+                    yield Cell(location, occupation, get_archetype_index(occupation, archetype), sublocation)
+
+
+def cell_depth(cell):
+    overrides = getattr(settings, "PAIR_INVENTORY_DEPTHS", {})
+    for key in (f"{cell.location}:{cell.occupation}", cell.location):
+        if key in overrides:
+            return overrides[key]
+    return getattr(settings, "PAIR_INVENTORY_DEPTH", 2)
+
+
+def inventory_levels():
+    """Counter of unclaimed inventory pairs per cell."""
+    rows = (
+        Pair.objects.filter(in_inventory=True)
+        .values_list(*Cell._fields).annotate(n=Count("pk")).order_by()
+    )
+    return Counter({Cell(*row[:-1]): row[-1] for row in rows})
+
+
+def refill_plan(levels=None):
+    """[(cell, pairs to generate)] for the cells below their low-water mark."""
+    levels = inventory_levels() if levels is None else levels
+    low_water = getattr(settings, "PAIR_INVENTORY_LOW_WATER", 1)
+    plan = []
+    for cell in inventory_cells():
+        depth = cell_depth(cell)
+        if levels[cell] < min(low_water, depth):
+            plan.append((cell, depth - levels[cell]))
+    return plan
+
+
+def claim_pair(cell):
+    """An inventory pair of `cell`, now taken out of the inventory, or None if the cell is empty."""
+    candidates = Pair.objects.filter(in_inventory=True, **cell._asdict()).order_by("pk")
+    for _ in range(CLAIM_ATTEMPTS):
+        with transaction.atomic():
+            # Rows locked by a concurrent claim are skipped rather than waited on
+            pair = candidates.select_for_update(skip_locked=True).first()
+            if pair is None:
+                return None
+            # Conditional as well: without row locks (SQLite) two claims can read the same row
+            if Pair.objects.filter(pk=pair.pk, in_inventory=True).update(in_inventory=False):
+                pair.in_inventory = False
+                return pair
+    return None
+
+
+aclaim_pair = sync_to_async(claim_pair)
+
+
+async def refill(plan, concurrency=2):
+    """
+    Generate the pairs `plan` asks for, `concurrency` at a time; returns
+    [(cell, Pair or the exception it failed with)].
+    """
+    from .pipeline import generate
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def stock(cell):
+        async with semaphore:
+            try:
+                return cell, await generate(*cell, inventory=True)
+            except Exception as e:
+                return cell, e
+
+    return await asyncio.gather(*(stock(cell) for cell, missing in plan for _ in range(missing)))
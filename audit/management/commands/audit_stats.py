@@ -0,0 +1,65 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from audit.stats import OUTCOMES, STRATA, load_paired_outcomes, stratified_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Paired callback-rate differences (SMO resume minus for-profit resume), McNemar tests and "
+        "bootstrap confidence intervals, overall and stratified by occupation and location"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--outcome',
+            choices=sorted(OUTCOMES),
+            default='callback',
+            help='callback: callback received; response: callback or rejection (default: callback)'
+        )
+        parser.add_argument('--replicates', type=int, default=10_000, help='Bootstrap replicates (default: 10000)')
+        parser.add_argument('--alpha', type=float, default=0.05, help='CI level is 1 - alpha (default: 0.05)')
+        parser.add_argument('--seed', type=int, default=None, help='Seed for reproducible bootstrap intervals')
+        parser.add_argument('--workers', type=int, default=None, help='Bootstrap processes (default: CPU count)')
+        parser.add_argument(
+            '--by',
+            nargs='*',
+            choices=STRATA,
+            default=STRATA,
+            help='Strata to break results down by (default: occupation location)'
+        )
+        parser.add_argument('--output_path', type=str, default=None, help='Optional CSV file for the results')
+
+    def handle(self, *args, **options):
+        df, dropped = load_paired_outcomes(options['outcome'])
+        if dropped:
+            self.stdout.write(self.style.WARNING(
+                f'Left out {dropped} applications whose resumes are not one SMO and one for-profit resume'
+            ))
+        if df.empty:
+            self.stdout.write(self.style.WARNING('No applications with callback logs for an SMO and a for-profit resume'))
+            return
+
+        results = stratified_summary(
+            df,
+            by=options['by'],
+            replicates=options['replicates'],
+            alpha=options['alpha'],
+            seed=options['seed'],
+            workers=options['workers'],
+        )
+
+        level = int(round((1 - options['alpha']) * 100))
+        for row in results.itertuples(index=False):
+            label = 'All applications' if row.stratum == 'all' else f'{row.stratum}={row.level}'
+            self.stdout.write(
+                f'{label:<30} n={row.n:<6} SMO={row.rate_treated:.3f} for-profit={row.rate_control:.3f} '
+                f'diff={row.diff:+.3f} [{level}% CI {row.ci_low:+.3f}, {row.ci_high:+.3f}] '
+                f'McNemar b={row.discordant_treated} c={row.discordant_control} p={row.p_value:.4f} ({row.test})'
+            )
+
+        if options['output_path']:
+            output_path = Path(options['output_path'])
+            results.to_csv(output_path, index=False)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {len(results)} rows to {output_path}'))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from audit.stats import OUTCOMES
+from audit.survival import ARM_LABELS, compare_profiles, load_durations, survival_at
+
+REPORT_DAYS = [7, 14, 30, 60, 90]
+
+
+class Command(BaseCommand):
+    help = "Kaplan-Meier time-to-response curves and log-rank hazard ratio of the SMO vs the for-profit resume"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            choices=sorted(OUTCOMES),
+            default='callback',
+            help='callback: time to callback (rejections censored); response: time to any response'
+        )
+
+    def handle(self, *args, **options):
+        df, dropped = load_durations(options['event'])
+        if dropped:
+            self.stdout.write(self.style.WARNING(
+                f'Left out {dropped} applications whose resumes are not one SMO and one for-profit resume'
+            ))
+        if df.empty:
+            self.stdout.write(self.style.WARNING('No submitted applications with callback logs'))
+            return
+
+        curves, test = compare_profiles(df)
+        self.stdout.write(
+            f"{len(df)} observations, {int(df['event'].sum())} events, "
+            f"{int(df['undated'].sum())} responses without a callback date (censored when logged)"
+        )
+        header = ' '.join(f'day {day:>3}' for day in REPORT_DAYS)
+        self.stdout.write(f"{'':<12}{header}")
+        for arm, label in ARM_LABELS.items():
+            values = ' '.join(f'{value:>7.3f}' for value in survival_at(curves[arm], REPORT_DAYS))
+            self.stdout.write(f'{label:<12}{values}')
+
+        self.stdout.write(
+            f"Log-rank chi2={test['statistic']:.3f} p={test['p_value']:.4f}; "
+            f"hazard ratio (SMO vs for-profit)={test['hazard_ratio']:.3f} "
+            f"[95% CI {test['ci_low']:.3f}, {test['ci_high']:.3f}]"
+        )
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+import csv
+from audit.audit_rows import refresh_audit_rows_for
+from audit.importers import DEFAULT_BATCH_SIZE, chunked
+from audit.models import PROFILE_ATTRIBUTE_FIELDS, Profile, profile_attributes
+from pathlib import Path
+
+
+class Command(BaseCommand):
+    help = 'One-shot backfill of resume attributes on existing profiles from resume_pairs_log.csv'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--csv_path',
+            type=str,
+            default='resume_pairs_log.csv',
+            help='Path to resume_pairs_log.csv (default: resume_pairs_log.csv)'
+        )
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per bulk update statement (default: {DEFAULT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        csv_path = Path(options['csv_path'])
+        batch_size = options['batch_size']
+
+        if not csv_path.exists():
+            self.stdout.write(self.style.ERROR(f'CSV file not found: {csv_path}'))
+            return
+
+        attributes = {}
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                attributes[(row['pair_id'], row['full_name'])] = profile_attributes(row)
+
+        pair_ids = sorted({pair_id for pair_id, _full_name in attributes})
+        to_update = []
+        for pair_id_batch in chunked(pair_ids, batch_size):
+            for profile in Profile.objects.filter(pair__pair_id__in=pair_id_batch).select_related('pair'):
+                values = attributes.get((profile.pair.pair_id, profile.full_name))
+                if values is None:
+                    continue
+                for name, value in values.items():
+                    setattr(profile, name, value)
+                to_update.append(profile)
+
+        with transaction.atomic():
+            Profile.objects.bulk_update(to_update, PROFILE_ATTRIBUTE_FIELDS, batch_size=batch_size)
+            refresh_audit_rows_for(Profile, [profile.pk for profile in to_update])
+
+        missing = len(attributes) - len(to_update)
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled attributes on {len(to_update)} profiles ({missing} CSV rows without a matching profile)'
+        ))
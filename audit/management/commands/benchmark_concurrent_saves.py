@@ -0,0 +1,159 @@
+"""
+Benchmark concurrent admin saves against the configured database.
+
+Each worker thread repeatedly performs the writes of a PairApplication
+change-form save with its callback inline: the application is saved, then
+both callback logs, in one transaction, followed by the on-commit audit row
+refresh. Workers edit their own applications, so any contention comes from
+the database's write locking rather than row conflicts.
+
+Run it once per backend with identical arguments and compare the reports:
+
+    python manage.py benchmark_concurrent_saves --threads 8 --saves 50
+
+    DB_ENGINE=postgresql DB_NAME=nonprofit_app DB_USER=... DB_PASSWORD=... \\
+        python manage.py benchmark_concurrent_saves --threads 8 --saves 50
+
+    DB_ENGINE=postgresql DB_POOL=1 ... python manage.py benchmark_concurrent_saves --threads 8 --saves 50
+
+Measured on SQLite with the default settings (WAL, IMMEDIATE transactions),
+Django 5.2.5, Python 3.11, one CPU core, a fresh migrated database:
+
+    --threads 8 --saves 50   400/400 saves, 0 lock errors, 63-75 saves/s,
+                             p50 14-15 ms, p95 29-152 ms, p99 1.7-3.0 s
+    --threads 1 --saves 200  200/200 saves, 88 saves/s, p50 10.6 ms, p99 19 ms
+
+Writers queue on SQLite's single write lock, hence the long tail. The
+PostgreSQL profiles have not been measured: neither a server nor psycopg
+was available where these numbers were taken.
+
+Run `migrate` against the target database first. The benchmark creates its
+own pairs, employers and applications (pair_id prefix "BENCH-") and deletes
+them afterwards unless --keep is given.
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.utils import timezone
+
+from audit.models import CallbackLog, Employer, Pair, PairApplication, Profile
+
+BENCH_PREFIX = "BENCH-"
+
+
+class Command(BaseCommand):
+    help = "Measure throughput and latency of concurrent PairApplication + callback saves"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent writers (default: 8)')
+        parser.add_argument('--saves', type=int, default=50, help='Saves per writer (default: 50)')
+        parser.add_argument('--output_path', type=str, default=None, help='Also write the report as JSON')
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows afterwards')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        saves = options['saves']
+
+        with transaction.atomic():
+            application_ids = self._create_fixtures(threads)
+        latencies = [[] for _ in range(threads)]
+        errors = [{'locked': 0, 'other': 0} for _ in range(threads)]
+        barrier = threading.Barrier(threads)
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for n in range(saves):
+                    started = time.perf_counter()
+                    try:
+                        self._admin_save(application_ids[index], n)
+                    except OperationalError as exc:
+                        key = 'locked' if 'locked' in str(exc).lower() else 'other'
+                        errors[index][key] += 1
+                        continue
+                    latencies[index].append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            if not options['keep']:
+                # Applications protect their pair and employer, so they go first
+                PairApplication.objects.filter(pair__pair_id__startswith=BENCH_PREFIX).delete()
+                Pair.objects.filter(pair_id__startswith=BENCH_PREFIX).delete()
+                Employer.objects.filter(display_name__startswith=BENCH_PREFIX).delete()
+
+        report = self._report(latencies, errors, elapsed, threads, saves)
+        for key, value in report.items():
+            self.stdout.write(f"{key:>16}: {value}")
+        if options['output_path']:
+            Path(options['output_path']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output_path']}"))
+
+    def _create_fixtures(self, threads):
+        """One employer, pair (with two profiles) and application (plus logs) per writer."""
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+        application_ids = []
+        for index in range(threads):
+            # Applications are unique per (occupation, employer)
+            employer = Employer.objects.create(
+                display_name=f'{BENCH_PREFIX}{stamp}-{index}', mission_statement='Benchmark'
+            )
+            pair = Pair.objects.create(
+                pair_id=f'{BENCH_PREFIX}{stamp}-{index}', occupation='Benchmark', good_fit_occupations=''
+            )
+            profiles = [
+                Profile.objects.create(pair=pair, full_name=f'Benchmark {idx}', resume_idx=idx) for idx in (1, 2)
+            ]
+            application = PairApplication.objects.create(
+                pair=pair, employer=employer, job_title='Benchmark', job_text='Benchmark'
+            )
+            CallbackLog.objects.bulk_create(
+                CallbackLog(application=application, profile=profile) for profile in profiles
+            )
+            application_ids.append(application.pk)
+        return application_ids
+
+    def _admin_save(self, application_id, n):
+        """The writes of one change-form save: the application, then its callback inline."""
+        with transaction.atomic():
+            application = PairApplication.objects.select_related('pair').get(pk=application_id)
+            application.job_text = f'Benchmark save {n}'
+            application.days_open = n
+            application.save()
+            for log in application.callbacks.all():
+                log.callback_notes = f'Benchmark save {n}'
+                log.save()
+
+    def _report(self, latencies, errors, elapsed, threads, saves):
+        samples = np.concatenate([np.asarray(l, dtype=np.float64) for l in latencies]) * 1000
+        completed = samples.size
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) if completed else (float('nan'),) * 3
+        return {
+            'backend': connection.vendor,
+            'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+            'pooled': 'pool' in connection.settings_dict.get('OPTIONS', {}),
+            'threads': threads,
+            'attempted': threads * saves,
+            'completed': int(completed),
+            'locked_errors': sum(e['locked'] for e in errors),
+            'other_errors': sum(e['other'] for e in errors),
+            'elapsed_s': round(elapsed, 3),
+            'saves_per_s': round(completed / elapsed, 1) if elapsed else 0.0,
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+        }
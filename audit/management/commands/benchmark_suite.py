@@ -0,0 +1,105 @@
+"""
+Time the study's hot paths against the current database and write a JSON report.
+
+Meant to run on a database filled by seed_synthetic, e.g.
+
+    python manage.py seed_synthetic --pairs 20000 --employers 50000 --applications 100000
+    python manage.py benchmark_suite --repeat 5 --output_path benchmark_report.json
+
+Admin pages are requested through the Django test client as a superuser
+(a "benchmark" user is created for the run and removed afterwards), so the
+numbers include middleware, queries and template rendering but no network
+or static files. The export is written to a temporary file and re-read by
+a dry-run import, so nothing in the database changes.
+"""
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from audit.benchmarks import benchmark_user, report_metadata, time_call
+from audit.models import AuditRow, Employer, Pair, PairApplication
+from io import StringIO
+from pathlib import Path
+import json
+import tempfile
+
+BENCHMARK_USER = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Time admin pages, callback search, import and export and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark (default: 5)')
+        parser.add_argument('--output_path', type=str, default='benchmark_report.json', help='JSON report path')
+        parser.add_argument('--only', type=str, default='',
+                            help='Comma-separated benchmark names to run (default: all)')
+
+    def handle(self, *args, **options):
+        application = PairApplication.objects.select_related('pair', 'employer').order_by('pk').first()
+        if application is None:
+            raise CommandError('No applications to benchmark; run seed_synthetic first')
+
+        only = {name.strip() for name in options['only'].split(',') if name.strip()}
+
+        results = {}
+        with benchmark_user(BENCHMARK_USER) as user, \
+                override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), \
+                tempfile.TemporaryDirectory() as tmp:
+            client = Client()
+            client.force_login(user)
+            for name, func in self._benchmarks(client, application, Path(tmp)):
+                if only and name not in only:
+                    continue
+                results[name] = time_call(func, repeat=options['repeat'])
+                self.stdout.write(
+                    f"{name:>32}: p50 {results[name]['p50_ms']:>9.1f} ms  "
+                    f"p95 {results[name]['p95_ms']:>9.1f} ms  {results[name]['queries']:>4} queries"
+                )
+
+        unknown = only - set(results)
+        if unknown:
+            self.stdout.write(self.style.WARNING(f"Unknown benchmarks skipped: {', '.join(sorted(unknown))}"))
+
+        report = {**report_metadata(), 'repeat': options['repeat'], 'benchmarks': results}
+        Path(options['output_path']).write_text(json.dumps(report, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output_path']}"))
+
+    def _benchmarks(self, client, application, tmp):
+        """(name, callable) pairs in run order; the dry-run import re-reads the export."""
+        search_term = AuditRow.objects.values_list('full_name', flat=True).first() or application.pair.pair_id
+        employer = Employer.objects.order_by('pk').first()
+        pair = Pair.objects.order_by('pk').first()
+        export_path = tmp / 'merged_export.csv'
+
+        def get(url, **params):
+            return lambda: client.get(url, params)
+
+        def export():
+            call_command('export_merged_data', output_path=str(export_path), stdout=StringIO())
+
+        def import_dry_run():
+            if not export_path.exists():
+                export()  # only on the warm-up run when the export benchmark was skipped
+            call_command('import_resume_data', csv_path=str(export_path), dry_run=True, stdout=StringIO())
+
+        return [
+            ('pairapplication_changelist', get(reverse('admin:audit_pairapplication_changelist'))),
+            ('pairapplication_changelist_filtered',
+             get(reverse('admin:audit_pairapplication_changelist'), status='submitted')),
+            ('pairapplication_change',
+             get(reverse('admin:audit_pairapplication_change', args=[application.pk]))),
+            ('pair_changelist', get(reverse('admin:audit_pair_changelist'))),
+            ('pair_change', get(reverse('admin:audit_pair_change', args=[pair.pk]))),
+            ('pair_list', get(reverse('admin:audit_pair_list'))),
+            ('employer_changelist', get(reverse('admin:audit_employer_changelist'))),
+            ('employer_check', get(reverse('admin:employer-check'),
+                                   employer=employer.display_name, occupation=application.occupation)),
+            ('callback_dashboard', get(reverse('admin:audit_callback_dashboard'))),
+            ('callback_search', get(reverse('admin:audit_callback_search'), q=search_term)),
+            ('export_merged_data', export),
+            ('import_resume_data_dry_run', import_dry_run),
+        ]
@@ -1,126 +1,132 @@
 from django.core.management.base import BaseCommand
-import csv
-from audit.models import PairApplication, CallbackLog
+from audit.audit_rows import AUDIT_ROW_SOURCES
+from audit.models import AuditRow, CallbackLog, PairApplication, PROFILE_ATTRIBUTE_FIELDS
 from pathlib import Path
 import pandas as pd
 
 class Command(BaseCommand):
-    help = 'Export merged data combining resume_pairs_log with job applications and callback data'
+    help = 'Export merged data (one row per application and profile) from the materialised AuditRow table'
 
     def add_arguments(self, parser):
         parser.add_argument(
-            '--resume_csv', 
-            type=str, 
-            required=True,
-            help='Path to original resume_pairs_log.csv'
+            '--resume_csv',
+            type=str,
+            default=None,
+            help='Deprecated and ignored: resume attributes are now read from the database'
         )
         parser.add_argument(
-            '--output_path', 
-            type=str, 
+            '--output_path',
+            type=str,
             default='merged_applications_export.csv',
             help='Output CSV file path'
         )
 
     def handle(self, *args, **options):
-        resume_csv_path = Path(options['resume_csv'])
         output_path = Path(options['output_path'])
-        
-        if not resume_csv_path.exists():
-            self.stdout.write(self.style.ERROR(f'Resume CSV not found: {resume_csv_path}'))
-            return
-        
-        # Read original resume data
-        resume_df = pd.read_csv(resume_csv_path)
-        
-        # Get all applications with related data
-        applications = PairApplication.objects.select_related(
-            'pair', 'employer'
-        ).prefetch_related('pair__profiles', 'callbacks__profile')
-        
-        # Create list to store merged records
+
+        if options['resume_csv']:
+            self.stdout.write(self.style.WARNING(
+                '--resume_csv is ignored; run backfill_profile_attributes once if profiles predate stored attributes'
+            ))
+
+        # One flat AuditRow per callback log; no joins needed. Profiles an application has no
+        # log for are still exported, with blank callback columns
+        unlogged = self._unlogged_rows()
+        rows = list(AuditRow.objects.values().iterator()) + unlogged
+        rows.sort(key=lambda row: (row['application_id'], row['resume_idx']))
+
         merged_records = []
-        
-        for app in applications:
-            # Get profiles for this pair
-            profiles = list(app.pair.profiles.all())
-            
-            for profile in profiles:
-                # Find matching resume record
-                resume_match = resume_df[
-                    (resume_df['pair_id'] == app.pair.pair_id) & 
-                    (resume_df['full_name'] == profile.full_name)
-                ]
-                
-                if not resume_match.empty:
-                    # Start with original resume data
-                    merged_record = resume_match.iloc[0].to_dict()
-                    
-                    # Add job application data (RA-logged information)
-                    merged_record.update({
-                        'job_title': app.job_title,
-                        'job_text': app.job_text,
-                        'job_location': app.job_location,
-                        'work_mode': app.work_mode,
-                        'job_link': app.job_link,
-                        'job_board': app.job_board,
-                        'job_board_other': app.job_board_other,
-                        'days_open': app.days_open,
-                        'application_occupation': app.occupation,
-                        'application_created': app.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                        'application_updated': app.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                        
-                        # Add employer data (RA-logged employer information)
-                        'applied_employer_name': app.employer.display_name,
-                        'applied_employer_location': app.employer.employer_location,
-                        'applied_employer_industry': app.employer.industry,
-                        'applied_employer_employees': app.employer.number_employees,
-                        'applied_employer_glassdoor_score': app.employer.glassdoor_score,
-                        'applied_employer_diversity_score': app.employer.diversity_score,
-                        'applied_employer_openings': app.employer.openings_number,
-                        'applied_employer_mission': app.employer.mission_statement,
-                    })
-                    
-                    # Add callback data for this specific profile
-                    try:
-                        callback_log = app.callbacks.get(profile=profile)
-                        callback_data = {
-                            'callback_status': callback_log.callback_status,
-                            'callback_received': callback_log.callback_status == 'callback',  # Boolean for easier analysis
-                            'callback_rejected': callback_log.callback_status == 'rejection',  # Boolean for easier analysis
-                            'callback_date': callback_log.callback_date.strftime('%Y-%m-%d') if callback_log.callback_date else '',
-                            'callback_medium': callback_log.callback_medium,
-                            'callback_notes': callback_log.callback_notes,
-                            'callback_created': callback_log.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                            'callback_updated': callback_log.updated_at.strftime('%Y-%m-%d %H:%M:%S'),
-                        }
-                    except CallbackLog.DoesNotExist:
-                        # No callback log exists for this profile-application combination
-                        callback_data = {
-                            'callback_status': '',
-                            'callback_received': False,
-                            'callback_rejected': False,
-                            'callback_date': '',
-                            'callback_medium': '',
-                            'callback_notes': '',
-                            'callback_created': '',
-                            'callback_updated': '',
-                        }
-                    
-                    # Add callback data to the merged record
-                    merged_record.update(callback_data)
-                    
-                    merged_records.append(merged_record)
-        
+        for row in rows:
+            # Resume data, in the column layout of resume_pairs_log.csv
+            merged_record = {
+                'pair_id': row['pair_id'],
+                'resume_idx': row['resume_idx'],
+                'template_name': row['template_name'],
+                'full_name': row['full_name'],
+                'phone': row['phone'],
+                'address': row['address'],
+                'email': row['email'],
+                'skills': row['expertise'],
+                'good_fit_occupations': row['good_fit_occupations'],
+                'occupation': row['pair_occupation'],
+            }
+            merged_record.update({name: row[name] for name in PROFILE_ATTRIBUTE_FIELDS})
+
+            # Add job application data (RA-logged information)
+            merged_record.update({
+                'job_title': row['job_title'],
+                'job_text': row['job_text'],
+                'job_location': row['job_location'],
+                'work_mode': row['work_mode'],
+                'job_link': row['job_link'],
+                'job_board': row['job_board'],
+                'job_board_other': row['job_board_other'],
+                'days_open': row['days_open'],
+                'application_occupation': row['application_occupation'],
+                'application_created': row['application_created'].strftime('%Y-%m-%d %H:%M:%S'),
+                'application_updated': row['application_updated'].strftime('%Y-%m-%d %H:%M:%S'),
+
+                # Add employer data (RA-logged employer information)
+                'applied_employer_name': row['employer_name'],
+                'applied_employer_location': row['employer_location'],
+                'applied_employer_industry': row['employer_industry'],
+                'applied_employer_employees': row['employer_employees'],
+                'applied_employer_glassdoor_score': row['employer_glassdoor_score'],
+                'applied_employer_diversity_score': row['employer_diversity_score'],
+                'applied_employer_openings': row['employer_openings'],
+                'applied_employer_mission': row['employer_mission'],
+
+                # Add callback data for this specific profile
+                'callback_status': row['callback_status'],
+                'callback_received': row['callback_status'] == 'callback',  # Boolean for easier analysis
+                'callback_rejected': row['callback_status'] == 'rejection',  # Boolean for easier analysis
+                'callback_date': row['callback_date'].strftime('%Y-%m-%d') if row['callback_date'] else '',
+                'callback_medium': row['callback_medium'],
+                'callback_notes': row['callback_notes'],
+                'callback_created': row['callback_created'].strftime('%Y-%m-%d %H:%M:%S') if row['callback_created'] else '',
+                'callback_updated': row['callback_updated'].strftime('%Y-%m-%d %H:%M:%S') if row['callback_updated'] else '',
+            })
+
+            merged_records.append(merged_record)
+
         if not merged_records:
             self.stdout.write(self.style.WARNING('No matching records found to merge'))
             return
-        
+
         # Convert to DataFrame and export
         merged_df = pd.DataFrame(merged_records)
         merged_df.to_csv(output_path, index=False)
-        
+
+        if unlogged:
+            self.stdout.write(self.style.WARNING(
+                f'{len(unlogged)} application/profile combinations have no callback log; '
+                f'exported with blank callback columns'
+            ))
         self.stdout.write(
             self.style.SUCCESS(
                 f'Exported {len(merged_records)} merged records to {output_path}'
             )
-        )
\ No newline at end of file
+        )
+
+    def _unlogged_rows(self):
+        """AuditRow-shaped values for each profile of an application that has no callback log for it."""
+        logged = set(CallbackLog.objects.values_list('application_id', 'profile_id'))
+        # The AuditRow sources, read from the application and its pair's profiles instead of a log
+        paths = {'application_id': 'pk', 'profile_id': 'pair__profiles__id'}
+        for field, path in AUDIT_ROW_SOURCES.items():
+            if path.startswith('application__'):
+                paths[field] = path.removeprefix('application__')
+            elif path.startswith('profile__'):
+                paths[field] = 'pair__profiles__' + path.removeprefix('profile__')
+        callback_columns = {
+            'callback_status': '', 'callback_date': None, 'callback_medium': '', 'callback_notes': '',
+            'callback_created': None, 'callback_updated': None,
+        }
+
+        rows = []
+        values = PairApplication.objects.filter(pair__profiles__isnull=False).values(*paths.values())
+        for application in values.iterator():
+            row = {field: application[path] for field, path in paths.items()}
+            if (row['application_id'], row['profile_id']) not in logged:
+                rows.append({**row, **callback_columns})
+        return rows
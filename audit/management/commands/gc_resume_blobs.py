@@ -0,0 +1,143 @@
+"""
+Garbage-collect the content-addressed resume store (see audit.storage).
+
+    python manage.py gc_resume_blobs --dry-run
+    python manage.py gc_resume_blobs --recount --adopt_legacy
+
+Deletes stored objects no profile refers to, once they have not been
+stored for --grace_hours (so a save in flight never loses its file), and
+files under resumes/blobs/ without a ResumeBlob row (interrupted writes).
+
+--recount recomputes every reference count from Profile.resume_pdf first,
+repairing drift from writes that bypass model signals (bulk_update, raw
+SQL). --adopt_legacy moves PDFs saved before the store existed (e.g.
+resumes/pdfs/<name>_<pair_id>.pdf) into it, so duplicates collapse into
+one object, and deletes the old files.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+from audit.models import Profile, ResumeBlob
+from audit.storage import BLOB_PREFIX, is_blob_name, select_resume_storage
+from pathlib import Path
+import datetime
+import os
+
+
+class Command(BaseCommand):
+    help = 'Delete unreferenced resume PDF objects and orphaned files from the content-addressed store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace_hours', type=float, default=24,
+                            help='Only collect objects not stored for this long (default: 24)')
+        parser.add_argument('--recount', action='store_true', help='Recompute reference counts from profiles first')
+        parser.add_argument('--adopt_legacy', action='store_true',
+                            help='Move PDFs stored outside the content-addressed store into it')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted without deleting')
+
+    def handle(self, *args, **options):
+        self.storage = select_resume_storage()
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - datetime.timedelta(hours=options['grace_hours'])
+
+        if options['adopt_legacy']:
+            self._adopt_legacy(dry_run)
+        if options['recount']:
+            self._recount(dry_run)
+
+        blobs, freed = self._collect_blobs(cutoff, dry_run)
+        orphans, orphan_bytes = self._collect_orphan_files(cutoff, dry_run)
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {blobs} unreferenced objects ({freed / 1e6:.1f} MB) '
+            f'and {orphans} orphaned files ({orphan_bytes / 1e6:.1f} MB)'
+        ))
+        totals = ResumeBlob.objects.aggregate(objects=Count('pk'), size=Sum('size'), stored=Sum('stored_size'))
+        referenced = Profile.objects.filter(resume_pdf__startswith=f'{BLOB_PREFIX}/').count()
+        self.stdout.write(
+            f"Store: {totals['objects']} objects, {(totals['stored'] or 0) / 1e6:.1f} MB on disk "
+            f"({(totals['size'] or 0) / 1e6:.1f} MB of PDFs) for {referenced} profile references"
+        )
+
+    def _recount(self, dry_run):
+        counts = dict(
+            Profile.objects.filter(resume_pdf__startswith=f'{BLOB_PREFIX}/')
+            .values_list('resume_pdf').annotate(n=Count('pk')).order_by()
+        )
+        changed = 0
+        with transaction.atomic():
+            for blob in ResumeBlob.objects.select_for_update().only('pk', 'name', 'refcount'):
+                actual = counts.get(blob.name, 0)
+                if blob.refcount != actual:
+                    changed += 1
+                    if not dry_run:
+                        ResumeBlob.objects.filter(pk=blob.pk).update(refcount=actual)
+        self.stdout.write(f'Reference counts corrected: {changed}')
+
+    def _collect_blobs(self, cutoff, dry_run):
+        deleted = freed = 0
+        candidates = ResumeBlob.objects.filter(refcount__lte=0, last_stored_at__lt=cutoff)
+        for blob in candidates.only('pk', 'name', 'stored_size').iterator():
+            if not dry_run:
+                # Re-checked in the DELETE, so a reference taken meanwhile keeps the object
+                removed, _ = ResumeBlob.objects.filter(
+                    pk=blob.pk, refcount__lte=0, last_stored_at__lt=cutoff
+                ).delete()
+                if not removed:
+                    continue
+                self.storage.delete(blob.name)
+            deleted += 1
+            freed += blob.stored_size
+        return deleted, freed
+
+    def _collect_orphan_files(self, cutoff, dry_run):
+        root = Path(self.storage.path(BLOB_PREFIX))
+        if not root.exists():
+            return 0, 0
+        known = set(ResumeBlob.objects.values_list('name', flat=True))
+        cutoff_ts = cutoff.timestamp()
+        deleted = freed = 0
+        for path in root.rglob('*'):
+            if not path.is_file():
+                continue
+            name = path.relative_to(Path(self.storage.location)).as_posix()
+            stat = path.stat()
+            if name in known or stat.st_mtime >= cutoff_ts:
+                continue
+            if not dry_run:
+                path.unlink(missing_ok=True)
+            deleted += 1
+            freed += stat.st_size
+        return deleted, freed
+
+    def _adopt_legacy(self, dry_run):
+        """Re-save PDFs stored outside the store through it, then delete the old files."""
+        legacy = Profile.objects.exclude(resume_pdf='').exclude(resume_pdf__isnull=True).exclude(
+            resume_pdf__startswith=f'{BLOB_PREFIX}/'
+        )
+        adopted = missing = 0
+        old_names = set()
+        for profile in legacy.only('pk', 'resume_pdf').iterator():
+            old_name = profile.resume_pdf.name
+            if not self.storage.exists(old_name):
+                missing += 1
+                continue
+            adopted += 1
+            if dry_run:
+                continue
+            with self.storage.open(old_name) as f:
+                profile.resume_pdf.save(os.path.basename(old_name), f, save=False)
+            # update() rather than save(): only the file changed, no audit rows need refreshing
+            Profile.objects.filter(pk=profile.pk).update(resume_pdf=profile.resume_pdf.name)
+            ResumeBlob.objects.filter(name=profile.resume_pdf.name).update(refcount=F('refcount') + 1)
+            old_names.add(old_name)
+
+        if not dry_run:
+            still_used = set(Profile.objects.filter(resume_pdf__in=old_names).values_list('resume_pdf', flat=True))
+            for name in old_names - still_used:
+                if not is_blob_name(name):
+                    self.storage.delete(name)
+        self.stdout.write(f'Legacy PDFs adopted: {adopted} (missing on disk: {missing})')
@@ -1,6 +1,17 @@
 import pandas as pd
-from django.core.management.base import BaseCommand
-from audit.models import Pair, Profile
+from openpyxl import load_workbook
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from audit.importers import DEFAULT_BATCH_SIZE, ImportStats, source_row_hash, upsert_pairs, upsert_profiles
+from audit.models import profile_attributes
+
+
+REQUIRED_COLUMNS = [
+    "pair_id",
+    "occupation",
+    "good fit occupations",
+    "professional skills and expertise",
+]
 
 
 class Command(BaseCommand):
@@ -8,60 +19,124 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("xlsx_path", type=str, help="Path to pairs.xlsx")
+        parser.add_argument(
+            "--sheet",
+            type=str,
+            default=None,
+            help="Worksheet name (default: first sheet)",
+        )
+        parser.add_argument(
+            "--chunk_size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Rows read and upserted per chunk (default: {DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report how many rows would be created/updated/unchanged without writing",
+        )
 
     def handle(self, *args, **options):
         xlsx_path = options["xlsx_path"]
+        chunk_size = options["chunk_size"]
+        dry_run = options["dry_run"]
         self.stdout.write(self.style.NOTICE(f"Reading {xlsx_path}..."))
 
-        # Load Excel
-        df = pd.read_excel(xlsx_path)
+        # Read-only mode streams rows from the sheet XML instead of loading the workbook
+        workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+        try:
+            sheet = workbook[options["sheet"]] if options["sheet"] else workbook.worksheets[0]
+            rows = sheet.iter_rows(values_only=True)
 
-        required_cols = [
-            "pair_id",
-            "first_name",
-            "last_name",
-            "occupation",
-            "good fit occupations",
-            "professional skills and expertise",
-        ]
-        for col in required_cols:
-            if col not in df.columns:
-                raise ValueError(f"Missing required column: {col}")
-
-        for _, row in df.iterrows():
-            pair_id = str(row["pair_id"]).strip()
-            occupation = str(row["occupation"]).strip()
-            good_fit = str(row["good fit occupations"]).strip()
-            first_name = str(row["first_name"]).strip()
-            last_name = str(row["last_name"]).strip()
-            expertise = str(row["professional skills and expertise"]).strip()
-
-            # --- Pair ---
-            pair, created = Pair.objects.get_or_create(
-                pair_id=pair_id,
-                defaults={
-                    "occupation": occupation,
-                    "good_fit_occupations": good_fit,
-                },
-            )
-            if not created:
-                # update if changed
-                if pair.occupation != occupation or pair.good_fit_occupations != good_fit:
-                    pair.occupation = occupation
-                    pair.good_fit_occupations = good_fit
-                    pair.save()
-
-            # --- Profile ---
-            profile, created = Profile.objects.get_or_create(
-                pair=pair,
-                first_name=first_name,
-                last_name=last_name,
-                defaults={"expertise": expertise},
-            )
-            if not created and profile.expertise != expertise:
-                profile.expertise = expertise
-                profile.save()
+            header = next(rows, None)
+            if header is None:
+                raise CommandError(f"{xlsx_path} is empty")
+            columns = self._normalise_header(header)
+            self._check_columns(columns)
+
+            stats = ImportStats()
+            with transaction.atomic():
+                chunk = []
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        self._import_chunk(chunk, columns, stats, chunk_size, dry_run)
+                        chunk = []
+                if chunk:
+                    self._import_chunk(chunk, columns, stats, chunk_size, dry_run)
+        finally:
+            workbook.close()
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(f"Dry run, nothing written: {stats.summary()}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Excel import finished: {stats.summary()}"))
+
+    def _normalise_header(self, header):
+        """
+        Lower-cased, stripped column names. Blank headers (empty or stray
+        formatted cells) become unnamed_<n> by position, so they can't
+        collide with each other; two columns with the same name are an error.
+        """
+        columns = []
+        for position, col in enumerate(header, start=1):
+            name = str(col).strip().lower() if col is not None else ""
+            columns.append(name or f"unnamed_{position}")
+        duplicates = sorted({col for col in columns if columns.count(col) > 1})
+        if duplicates:
+            raise CommandError(f"Duplicate column: {', '.join(duplicates)}")
+        return columns
 
-            self.stdout.write(f"Imported {pair_id}: {first_name} {last_name}")
+    def _check_columns(self, columns):
+        for col in REQUIRED_COLUMNS:
+            if col not in columns:
+                raise CommandError(f"Missing required column: {col}")
+        has_full_name = "full_name" in columns
+        has_split_name = "first_name" in columns and "last_name" in columns
+        if not (has_full_name or has_split_name):
+            raise CommandError("Missing required column: full_name (or first_name and last_name)")
+
+    def _import_chunk(self, chunk, columns, stats, batch_size, dry_run):
+        df = pd.DataFrame(chunk, columns=columns)
+
+        # Vectorised cleanup: every column as stripped strings, blanks for missing cells
+        df = df.astype("string").fillna("")
+        for col in df.columns:
+            df[col] = df[col].str.strip()
+
+        if "full_name" in df.columns:
+            full_name = df["full_name"]
+        else:
+            full_name = pd.Series("", index=df.index, dtype="string")
+        if "first_name" in df.columns and "last_name" in df.columns:
+            split_name = (df["first_name"] + " " + df["last_name"]).str.strip()
+            full_name = full_name.where(full_name != "", split_name)
+        df["full_name"] = full_name
+
+        df = df[(df["pair_id"] != "") & (df["full_name"] != "")]
+        if df.empty:
+            return
+        stats.rows += len(df)
+        records = df.to_dict("records")
+
+        pairs_df = df.drop_duplicates("pair_id")
+        pair_values = {
+            pair_id: {"occupation": occupation, "good_fit_occupations": good_fit}
+            for pair_id, occupation, good_fit in zip(
+                pairs_df["pair_id"], pairs_df["occupation"], pairs_df["good fit occupations"]
+            )
+        }
+        profile_values = [
+            {
+                **profile_attributes(record),
+                "pair_id": record["pair_id"],
+                "full_name": record["full_name"],
+                "expertise": record["professional skills and expertise"],
+                "source_hash": source_row_hash(record),
+            }
+            for record in records
+        ]
 
-        self.stdout.write(self.style.SUCCESS("Excel import finished"))
+        pairs = upsert_pairs(pair_values, stats, batch_size=batch_size, dry_run=dry_run)
+        upsert_profiles(profile_values, pairs, stats, batch_size=batch_size, dry_run=dry_run)
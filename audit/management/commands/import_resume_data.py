@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 import csv
-from audit.models import Pair, Profile
+from audit.importers import DEFAULT_BATCH_SIZE, ImportStats, import_pairs_and_profiles, source_row_hash
+from audit.models import profile_attributes
 from pathlib import Path
 
 class Command(BaseCommand):
@@ -8,55 +9,68 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument(
-            '--csv_path', 
-            type=str, 
+            '--csv_path',
+            type=str,
             default='resume_pairs_log.csv',
             help='Path to resume_pairs_log.csv (default: resume_pairs_log.csv)'
         )
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per bulk insert/update statement (default: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many rows would be created/updated/unchanged without writing'
+        )
 
     def handle(self, *args, **options):
         csv_path = Path(options['csv_path'])
-        
+
         if not csv_path.exists():
             self.stdout.write(
                 self.style.ERROR(f'CSV file not found: {csv_path}')
             )
             return
-        
-        # Group by pair_id first
-        pairs_data = {}
-        
+
+        stats = ImportStats()
+        pair_values = {}
+        profile_values = []
+
+        # Single pass over the CSV: first row of each pair defines the Pair
         with open(csv_path, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
-            
+
             for row in reader:
+                stats.rows += 1
                 pair_id = row['pair_id']
-                if pair_id not in pairs_data:
-                    pairs_data[pair_id] = []
-                pairs_data[pair_id].append(row)
-        
-        # Process each pair
-        for pair_id, rows in pairs_data.items():
-            pair, created = Pair.objects.get_or_create(
-                pair_id=pair_id,
-                defaults={
-                    'occupation': rows[0].get('occupation', 'Unknown'),
-                    'good_fit_occupations': rows[0].get('good_fit_occupations', '')
-                }
-            )
-            
-            for row in rows:
-                Profile.objects.update_or_create(
-                    pair=pair,
-                    full_name=row['full_name'],  # Use full_name directly from CSV
-                    defaults={
-                        'phone': row['phone'],
-                        'address': row['address'],
-                        'email': row.get('email', ''),
-                        'expertise': row['skills'],
+                if pair_id not in pair_values:
+                    pair_values[pair_id] = {
+                        'occupation': row.get('occupation') or 'Unknown',
+                        'good_fit_occupations': row.get('good_fit_occupations', ''),
                     }
-                )
-                
-                self.stdout.write(
-                    self.style.SUCCESS(f'Updated {row["full_name"]} for pair {pair_id}')
-                )
\ No newline at end of file
+
+                profile_values.append({
+                    'pair_id': pair_id,
+                    'full_name': row['full_name'],  # Use full_name directly from CSV
+                    'phone': row['phone'],
+                    'address': row['address'],
+                    'email': row.get('email', ''),
+                    'expertise': row['skills'],
+                    'template_name': row.get('template_name', ''),
+                    'resume_idx': int(row.get('resume_idx') or 1),
+                    'source_hash': source_row_hash(row),
+                    **profile_attributes(row),
+                })
+
+        import_pairs_and_profiles(
+            pair_values, profile_values, stats,
+            batch_size=options['batch_size'], dry_run=options['dry_run']
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run, nothing written for {csv_path}: {stats.summary()}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Imported {csv_path}: {stats.summary()}'))
@@ -0,0 +1,280 @@
+"""
+Rehearse a room of RAs working at once against the configured database.
+
+Each virtual RA is a thread with its own logged-in test client that loops
+through the admin workflow:
+
+    generate_pair        POST the Generate New Resume Pair form
+    check_employer       GET employer/check/ for a new employer name
+    add_employer         POST the Employer add form
+    create_application   POST the PairApplication add form (SUBMIT)
+    recheck_employer     GET employer/check/ again; must now report a duplicate
+    search_callbacks     GET callback-search/ for one of the pair's names
+    update_callbacks     POST the application change form with both callback rows
+
+Per step the report gives throughput, p50/p95/p99 latency and the number of
+"database is locked" and other errors. Without the resume generator
+(resume_randomization) installed, or with --no_generate, pairs are created
+up front instead and generate_pair is left out.
+
+    python manage.py load_test --users 8 --iterations 10 --output_path load_report.json
+
+Everything the run creates (pair_id/employer prefix "LOAD-") is deleted
+afterwards unless --keep is given.
+"""
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.management.base import BaseCommand
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from audit import services
+from audit.benchmarks import benchmark_user, report_metadata, summarize
+from audit.models import CallbackLog, Employer, Pair, PairApplication, Profile
+from pathlib import Path
+import json
+import re
+import sys
+import threading
+import time
+
+LOAD_PREFIX = 'LOAD-'
+LOAD_USER = 'loadtest'
+STEPS = ['generate_pair', 'check_employer', 'add_employer', 'create_application',
+         'recheck_employer', 'search_callbacks', 'update_callbacks']
+GENERATED_PAIR = re.compile(r'generated pair (\S+) with')
+
+
+class StepFailed(Exception):
+    """A step returned an unexpected response."""
+
+
+_request_errors = threading.local()
+
+
+def _record_request_exception(sender, request=None, **kwargs):
+    # Views run in the requesting thread. The test client's own exception
+    # capture hangs off this global signal too, and would hand one thread's
+    # exception to every client, so each thread keeps its own here instead.
+    _request_errors.exception = sys.exc_info()[1]
+
+
+class Command(BaseCommand):
+    help = 'Load-test the RA workflow (generate, employer check/add, application, callbacks) with concurrent clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=8, help='Concurrent virtual RAs (default: 8)')
+        parser.add_argument('--iterations', type=int, default=10, help='Workflow runs per RA (default: 10)')
+        parser.add_argument('--occupation', type=str, default='communications',
+                            choices=[value for value, _ in services.get_available_occupations()])
+        parser.add_argument('--no_generate', action='store_true',
+                            help='Create pairs up front instead of generating them through the admin')
+        parser.add_argument('--output_path', type=str, default=None, help='Also write the report as JSON')
+        parser.add_argument('--keep', action='store_true', help='Keep the rows the run created')
+
+    def handle(self, *args, **options):
+        users = options['users']
+        iterations = options['iterations']
+        self.occupation = options['occupation']
+        self.generate = services.RESUME_GENERATION_AVAILABLE and not options['no_generate']
+        if not self.generate:
+            self.stdout.write(self.style.WARNING('Pairs are created up front; generate_pair is not measured'))
+
+        self.run_id = timezone.now().strftime('%Y%m%d%H%M%S')
+        steps = STEPS if self.generate else STEPS[1:]
+        latencies = {step: [] for step in steps}
+        errors = {step: {'locked': 0, 'other': 0, 'first_error': ''} for step in steps}
+        self.created = {'pairs': [], 'employers': []}
+        self.lock = threading.Lock()
+
+        with benchmark_user(LOAD_USER) as user, \
+                override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            pair_ids = [] if self.generate else self._create_pairs(users * iterations)
+            barrier = threading.Barrier(users)
+
+            def worker(index):
+                client = Client(raise_request_exception=False)
+                client.force_login(user)
+                try:
+                    barrier.wait()
+                    for n in range(iterations):
+                        pair_id = None if self.generate else pair_ids[index * iterations + n]
+                        self._run_workflow(client, f'{index}-{n}', pair_id, latencies, errors)
+                finally:
+                    connection.close()
+
+            got_request_exception.connect(_record_request_exception)
+            try:
+                started = time.perf_counter()
+                threads = [threading.Thread(target=worker, args=(i,)) for i in range(users)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - started
+            finally:
+                got_request_exception.disconnect(_record_request_exception)
+                if not options['keep']:
+                    self._cleanup()
+
+        report = {
+            **report_metadata(),
+            'users': users,
+            'iterations': iterations,
+            'elapsed_s': round(elapsed, 3),
+            'steps': {},
+        }
+        self.stdout.write(f"{'step':>20} {'ok':>6} {'locked':>7} {'errors':>7} {'req/s':>8} "
+                          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for step in steps:
+            summary = summarize(latencies[step])
+            summary.update(
+                locked_errors=errors[step]['locked'],
+                other_errors=errors[step]['other'],
+                first_error=errors[step]['first_error'],
+                throughput_per_s=round(summary['count'] / elapsed, 2) if elapsed else 0.0,
+            )
+            attempted = summary['count'] + summary['locked_errors'] + summary['other_errors']
+            summary['error_rate'] = round((attempted - summary['count']) / attempted, 4) if attempted else 0.0
+            report['steps'][step] = summary
+            self.stdout.write(
+                f"{step:>20} {summary['count']:>6} {summary['locked_errors']:>7} {summary['other_errors']:>7} "
+                f"{summary['throughput_per_s']:>8.1f} {summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} "
+                f"{summary['p99_ms']:>9.1f}"
+            )
+
+        if options['output_path']:
+            Path(options['output_path']).write_text(json.dumps(report, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output_path']}"))
+
+    def _create_pairs(self, count):
+        """Stand-in pairs (two profiles each) for runs that don't exercise the generator."""
+        pairs = Pair.objects.bulk_create(
+            Pair(pair_id=f'{LOAD_PREFIX}{self.run_id}-{i}', occupation=self.occupation,
+                 good_fit_occupations='', location='NY', archetype=1)
+            for i in range(count)
+        )
+        Profile.objects.bulk_create(
+            Profile(pair=pair, full_name=f'Load Tester {pair.pair_id}-{idx}', resume_idx=idx,
+                    email=f'{pair.pair_id}-{idx}@example.com')
+            for pair in pairs for idx in (1, 2)
+        )
+        self.created['pairs'] = [pair.pk for pair in pairs]
+        return self.created['pairs']
+
+    def _cleanup(self):
+        # Applications protect their pair and employer, so they go first
+        PairApplication.objects.filter(employer__in=self.created['employers']).delete()
+        Pair.objects.filter(pk__in=self.created['pairs']).delete()
+        Employer.objects.filter(pk__in=self.created['employers']).delete()
+
+    def _run_workflow(self, client, key, pair_id, latencies, errors):
+        """One pass of the RA workflow; a failed step ends the pass, since later steps depend on it."""
+        context = {'pair_id': pair_id, 'employer_name': f'{LOAD_PREFIX}{self.run_id} Employer {key}'}
+        for step in latencies:
+            started = time.perf_counter()
+            try:
+                getattr(self, f'_step_{step}')(client, context)
+            except Exception as exc:
+                # The test client re-raises view exceptions, so lock errors surface here
+                kind = 'locked' if isinstance(exc, OperationalError) and 'locked' in str(exc).lower() else 'other'
+                with self.lock:
+                    errors[step][kind] += 1
+                    errors[step]['first_error'] = errors[step]['first_error'] or f'{type(exc).__name__}: {exc}'
+                return
+            with self.lock:
+                latencies[step].append((time.perf_counter() - started) * 1000)
+
+    def _expect(self, response, status):
+        exception = getattr(_request_errors, 'exception', None)
+        _request_errors.exception = None
+        if response.status_code == 500 and exception is not None:
+            raise exception
+        if response.status_code != status:
+            raise StepFailed(f'{response.request["PATH_INFO"]} returned {response.status_code}, expected {status}')
+        return response
+
+    def _step_generate_pair(self, client, context):
+        archetype = services.get_available_archetypes(self.occupation)[0][0]
+        response = self._expect(client.post(reverse('admin:audit_pair_changelist'), {
+            'location': 'NY', 'occupation': self.occupation, 'archetype': archetype, 'sublocation': '',
+        }), 200)
+        stored = messages.get_messages(response.wsgi_request)
+        match = next((GENERATED_PAIR.search(m.message) for m in stored if m.level == messages.SUCCESS), None)
+        if match is None:
+            raise StepFailed('Pair generation reported no pair')
+        pair = Pair.objects.get(pair_id=match.group(1))
+        with self.lock:
+            self.created['pairs'].append(pair.pk)
+        context['pair_id'] = pair.pk
+
+    def _step_check_employer(self, client, context):
+        response = self._expect(client.get(reverse('admin:employer-check'), {
+            'employer': context['employer_name'], 'occupation': self.occupation,
+        }), 200)
+        if not response.json()['ok']:
+            raise StepFailed(response.json()['error'])
+
+    def _step_add_employer(self, client, context):
+        self._expect(client.post(reverse('admin:audit_employer_add'), {
+            'display_name': context['employer_name'], 'employer_location': 'New York, NY',
+            'industry': 'Nonprofit', 'number_employees': 120, 'glassdoor_score': '4.1',
+            'diversity_score': '3.9', 'openings_number': 4, 'mission_statement': 'Load test employer',
+            '_save': 'Save',
+        }), 302)
+        employer = Employer.objects.only('pk').get(display_name=context['employer_name'])
+        with self.lock:
+            self.created['employers'].append(employer.pk)
+        context['employer_pk'] = employer.pk
+
+    def _step_create_application(self, client, context):
+        url = reverse('admin:audit_pairapplication_add') + f"?pair={context['pair_id']}"
+        self._expect(client.post(url, {
+            'pair': context['pair_id'], 'employer': context['employer_pk'],
+            'job_title': 'Communications Specialist', 'job_text': 'Load test posting',
+            'job_location': 'New York, NY', 'work_mode': 'hybrid', 'job_link': '',
+            'job_board': 'indeed', 'job_board_other': '', 'days_open': 3,
+            **self._callback_management_form(0),
+            '_save': 'SUBMIT',
+        }), 302)
+        context['application_pk'] = PairApplication.objects.only('pk').get(employer_id=context['employer_pk']).pk
+
+    def _step_recheck_employer(self, client, context):
+        # The application just created must now block a second one
+        response = self._expect(client.get(reverse('admin:employer-check'), {
+            'employer': context['employer_name'], 'occupation': self.occupation,
+        }), 200)
+        if response.json()['ok']:
+            raise StepFailed('Duplicate application not detected')
+
+    def _step_search_callbacks(self, client, context):
+        name = Profile.objects.filter(pair_id=context['pair_id']).values_list('full_name', flat=True).first()
+        self._expect(client.get(reverse('admin:audit_callback_search'), {'q': name}), 200)
+
+    def _step_update_callbacks(self, client, context):
+        logs = list(CallbackLog.objects.filter(application_id=context['application_pk'])
+                    .order_by('profile__full_name').values_list('pk', flat=True))
+        if not logs:
+            raise StepFailed('Application has no callback logs')
+        data = {**self._callback_management_form(len(logs)), '_save': 'Save'}
+        for n, log_pk in enumerate(logs):
+            data.update({
+                f'callbacks-{n}-id': log_pk,
+                f'callbacks-{n}-application': context['application_pk'],
+                f'callbacks-{n}-callback_status': 'callback' if n == 0 else 'rejection',
+                f'callbacks-{n}-callback_date': timezone.localdate().isoformat(),
+                f'callbacks-{n}-callback_medium': 'phone',
+                f'callbacks-{n}-callback_notes': 'Load test',
+            })
+        url = reverse('admin:audit_pairapplication_change', args=[context['application_pk']])
+        self._expect(client.post(url, data), 302)
+
+    def _callback_management_form(self, forms):
+        return {
+            'callbacks-TOTAL_FORMS': forms, 'callbacks-INITIAL_FORMS': forms,
+            'callbacks-MIN_NUM_FORMS': 0, 'callbacks-MAX_NUM_FORMS': 2,
+        }
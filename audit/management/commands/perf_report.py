@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand
+from audit.middleware import METRICS, snapshot_dir
+from pathlib import Path
+import json
+import time
+import numpy as np
+
+# Wall-time histogram bucket edges in milliseconds
+HISTOGRAM_EDGES = [0, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf')]
+
+
+class Command(BaseCommand):
+    help = 'Summarise the per-view latency and SQL snapshots written by PerformanceMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--snapshot_dir', type=str, default=None, help='Snapshot directory (default: PERF_SNAPSHOT_DIR)')
+        parser.add_argument('--sort', choices=['wall_p95', 'queries_max', 'sql_p95', 'requests'], default='wall_p95')
+        parser.add_argument('--limit', type=int, default=30, help='Views to show (default: 30)')
+        parser.add_argument('--histogram', action='store_true', help='Also print a wall-time histogram per view')
+        parser.add_argument('--output_path', type=str, default=None, help='Also write the report as JSON')
+        parser.add_argument('--max_age', type=float, default=24,
+                            help='Skip snapshots written more than this many hours ago, e.g. by workers '
+                                 'that have since exited (default: 24; 0 reads them all)')
+        parser.add_argument('--prune', action='store_true', help='Delete the snapshots older than --max_age')
+
+    def handle(self, *args, **options):
+        directory = Path(options['snapshot_dir']) if options['snapshot_dir'] else snapshot_dir()
+        files = sorted(directory.glob('perf-*.json'))
+        if not files:
+            self.stdout.write(self.style.WARNING(f'No snapshots found in {directory}'))
+            return
+
+        # Merge the rolling windows of every process that wrote one recently
+        cutoff = time.time() - options['max_age'] * 3600 if options['max_age'] else None
+        merged = {}
+        stale = []
+        for path in files:
+            snapshot = json.loads(path.read_text())
+            if cutoff is not None and snapshot['written_at'] < cutoff:
+                stale.append(path)
+                continue
+            columns = [snapshot['metrics'].index(metric) for metric in METRICS]
+            for view, data in snapshot['views'].items():
+                entry = merged.setdefault(view, {'requests': 0, 'samples': []})
+                entry['requests'] += data['requests']
+                entry['samples'].extend([sample[i] for i in columns] for sample in data['samples'])
+
+        if stale:
+            if options['prune']:
+                for path in stale:
+                    path.unlink(missing_ok=True)
+            self.stdout.write(
+                f"{'Deleted' if options['prune'] else 'Skipped'} {len(stale)} snapshot(s) "
+                f"older than {options['max_age']:g}h"
+            )
+        if not merged:
+            self.stdout.write(self.style.WARNING(f'No recent snapshots in {directory}'))
+            return
+
+        rows = []
+        for view, entry in merged.items():
+            samples = np.asarray(entry['samples'], dtype=np.float64).reshape(-1, len(METRICS))
+            wall, queries, sql, template = samples.T
+            rows.append({
+                'view': view,
+                'requests': entry['requests'],
+                'window': len(samples),
+                'wall_p50': float(np.percentile(wall, 50)),
+                'wall_p95': float(np.percentile(wall, 95)),
+                'wall_p99': float(np.percentile(wall, 99)),
+                'queries_mean': float(queries.mean()),
+                'queries_max': int(queries.max()),
+                'sql_p95': float(np.percentile(sql, 95)),
+                'template_p95': float(np.percentile(template, 95)),
+                'histogram': np.histogram(wall, bins=HISTOGRAM_EDGES)[0].tolist(),
+            })
+        rows.sort(key=lambda row: -row[options['sort']])
+        rows = rows[:options['limit']]
+
+        self.stdout.write(f'{len(files) - len(stale)} snapshot(s) from {directory}')
+        self.stdout.write(
+            f"{'view':<45} {'reqs':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+            f"{'q mean':>7} {'q max':>6} {'sql p95':>8} {'tpl p95':>8}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"{row['view'][:45]:<45} {row['requests']:>7} {row['wall_p50']:>8.1f} {row['wall_p95']:>8.1f} "
+                f"{row['wall_p99']:>8.1f} {row['queries_mean']:>7.1f} {row['queries_max']:>6} "
+                f"{row['sql_p95']:>8.1f} {row['template_p95']:>8.1f}"
+            )
+            if options['histogram']:
+                labels = [f'<{int(edge)}' for edge in HISTOGRAM_EDGES[1:-1]] + [f'>={int(HISTOGRAM_EDGES[-2])}']
+                self.stdout.write('    ' + '  '.join(f'{label}ms:{count}' for label, count in zip(labels, row['histogram'])))
+
+        if options['output_path']:
+            Path(options['output_path']).write_text(json.dumps(rows, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output_path']}"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from audit.analytics import refresh_callback_summary
+from audit.audit_rows import DEFAULT_BATCH_SIZE, refresh_audit_rows
+import time
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialised merged-audit table (AuditRow) and the callback summary from scratch"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Callback logs per upsert statement (default: {DEFAULT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            rows = refresh_audit_rows(batch_size=options['batch_size'], update_summary=False)
+            cells = refresh_callback_summary()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows} audit rows and {cells} summary cells in {time.perf_counter() - started:.2f}s"
+        ))
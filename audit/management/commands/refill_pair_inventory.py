@@ -0,0 +1,68 @@
+"""
+Keep the pre-generated pair inventory stocked (see audit.inventory).
+
+    python manage.py refill_pair_inventory                  # worker: check every 30 s
+    python manage.py refill_pair_inventory --once --dry-run
+
+Each pass counts the unclaimed pairs per cell and renders pairs for the
+cells below their low-water mark, back up to their depth. Run a single
+worker: two would both see the same shortfall and overfill the cells.
+"""
+
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from audit.inventory import inventory_cells, inventory_levels, refill, refill_plan
+
+
+class Command(BaseCommand):
+    help = 'Render pairs for inventory cells that have dropped below their low-water mark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+        parser.add_argument('--interval', type=float, default=30,
+                            help='Seconds between passes when running as a worker (default: 30)')
+        parser.add_argument('--concurrency', type=int, default=2,
+                            help='Pairs rendered at the same time, one browser each (default: 2)')
+        parser.add_argument('--dry-run', action='store_true', help='Report the shortfall without rendering')
+
+    def handle(self, *args, **options):
+        from audit.services import RESUME_GENERATION_AVAILABLE
+        if not RESUME_GENERATION_AVAILABLE and not options['dry_run']:
+            raise CommandError('Resume generation not available - could not import resume_randomization')
+
+        while True:
+            self._pass(options['concurrency'], options['dry_run'])
+            if options['once'] or options['dry_run']:
+                return
+            time.sleep(options['interval'])
+            # A long-running worker must not hold on to a connection the database has dropped
+            close_old_connections()
+
+    def _pass(self, concurrency, dry_run):
+        levels = inventory_levels()
+        plan = refill_plan(levels)
+        missing = sum(count for _, count in plan)
+        self.stdout.write(
+            f"Inventory: {sum(levels.values())} pairs in {len(list(inventory_cells()))} cells; "
+            f"{len(plan)} cells below low water, {missing} pairs to render"
+        )
+        if dry_run:
+            for cell, count in plan:
+                self.stdout.write(f"  {cell.location} {cell.occupation} archetype {cell.archetype} "
+                                  f"sublocation {cell.sublocation}: {levels[cell]} ready, {count} to render")
+            return
+        if not plan:
+            return
+
+        started = time.monotonic()
+        results = async_to_sync(refill)(plan, concurrency)
+        failures = [(cell, result) for cell, result in results if isinstance(result, Exception)]
+        for cell, error in failures:
+            self.stderr.write(f"  {cell.location} {cell.occupation} archetype {cell.archetype}: {error}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {len(results) - len(failures)} pairs in {time.monotonic() - started:.1f}s "
+            f"({len(failures)} failed)"
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from audit.analytics import refresh_callback_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed callback-rate summary shown on the admin dashboard"
+
+    def handle(self, *args, **options):
+        cells = refresh_callback_summary()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {cells} callback summary cells"))
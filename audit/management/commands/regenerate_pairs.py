@@ -0,0 +1,89 @@
+"""
+Regenerate pairs from their seed (see audit.regeneration).
+
+    python manage.py regenerate_pairs --all                        # verify every seeded pair
+    python manage.py regenerate_pairs NY-0042 --output_dir regen/  # also write its data, HTML and PDFs
+    python manage.py regenerate_pairs --all --evict_html           # verify, then drop stored PDFs and HTML
+
+Each pair is regenerated and compared with its stored rows and HTML
+checksums. Only pairs that reproduce exactly are written out or evicted,
+and the command fails if any pair does not reproduce. --evict_html is
+refused unless the generator version hashes its templates and data files
+too (services.GENERATOR_INPUTS_VERSIONED).
+"""
+
+import json
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from audit import services
+from audit.models import Pair
+from audit.pipeline import pdf_stem, render_pair
+from audit.regeneration import RegenerationError, evict, regenerate, verify_pair
+
+
+async def _no_progress(stage):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Regenerate seeded pairs, verify them against the stored data and optionally evict their artefacts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pair_ids', nargs='*', help='Pair IDs to regenerate')
+        parser.add_argument('--all', action='store_true', help='Regenerate every seeded pair')
+        parser.add_argument('--output_dir', type=str,
+                            help='Write each regenerated pair (JSON, HTML and PDFs) under this directory')
+        parser.add_argument('--evict', action='store_true',
+                            help='Drop the stored PDFs of pairs that reproduce; they are printed again on download')
+        parser.add_argument('--evict_html', action='store_true', help='With --evict, drop the stored HTML too')
+
+    def handle(self, *args, **options):
+        if not options['pair_ids'] and not options['all']:
+            raise CommandError('Name the pairs to regenerate, or pass --all')
+        if options['evict_html'] and not services.GENERATOR_INPUTS_VERSIONED:
+            raise CommandError('--evict_html needs a generator version covering its templates and data files; '
+                               'set RESUME_GENERATOR_DATA_DIRS')
+        pairs = Pair.objects.filter(rng_seed__isnull=False).order_by('pk')
+        if options['pair_ids']:
+            pairs = pairs.filter(pair_id__in=options['pair_ids'])
+            unseeded = set(options['pair_ids']) - set(pairs.values_list('pair_id', flat=True))
+            if unseeded:
+                self.stderr.write(f"Not found or generated without a seed: {', '.join(sorted(unseeded))}")
+        output_dir = Path(options['output_dir']) if options['output_dir'] else None
+        evicting = options['evict'] or options['evict_html']
+
+        verified = failed = dropped = 0
+        for pair in pairs.iterator(chunk_size=200):
+            try:
+                regenerated = regenerate(pair)
+                differences = verify_pair(pair, regenerated)
+            except RegenerationError as e:
+                differences = [str(e)]
+            if differences:
+                failed += 1
+                self.stderr.write(f"  {pair.pair_id}: differs in {', '.join(differences)}")
+                continue
+            verified += 1
+            if output_dir:
+                self._write(output_dir, *regenerated)
+            if evicting:
+                dropped += evict(pair, html=options['evict_html'])
+
+        summary = f'{verified} pairs reproduced exactly, {failed} did not'
+        if evicting:
+            summary += f'; evicted {dropped} PDFs (gc_resume_blobs frees the unreferenced ones)'
+        self.stdout.write(self.style.SUCCESS(summary) if not failed else summary)
+        if failed:
+            raise CommandError(f'{failed} pairs did not reproduce from their seed')
+
+    def _write(self, output_dir, pair_data, htmls):
+        folder = output_dir / pair_data['pair_id']
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / 'pair.json').write_text(json.dumps(pair_data, indent=2, sort_keys=True, default=str))
+        for resume_idx, html in zip((1, 2), htmls):
+            (folder / f'{pdf_stem(pair_data, resume_idx)}.html').write_text(html, encoding='utf-8')
+        for resume_idx, pdf in zip((1, 2), async_to_sync(render_pair)(pair_data, htmls, _no_progress)):
+            if pdf:
+                (folder / f'{pdf_stem(pair_data, resume_idx)}.pdf').write_bytes(pdf)
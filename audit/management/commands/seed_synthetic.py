@@ -0,0 +1,240 @@
+"""
+Bulk-create a synthetic study at production scale for local benchmarking.
+
+Profile attributes are drawn from the empirical distribution of each column
+of resume_pairs_log.csv (the name/race/gender block is drawn as a unit so
+name signals stay consistent); job and employer fields from
+final_audit_data.csv. Identifiers, emails and phone numbers are made unique
+per row. Every synthetic pair_id starts with "SYN-" so --clear can remove a
+previous run without touching real data.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from audit.analytics import refresh_callback_summary
+from audit.audit_rows import refresh_audit_rows
+from audit.importers import DEFAULT_BATCH_SIZE
+from audit.models import CallbackLog, Employer, Pair, PairApplication, Profile, profile_attributes
+from decimal import Decimal
+from pathlib import Path
+import datetime
+import numpy as np
+import pandas as pd
+import time
+
+SYNTHETIC_PREFIX = 'SYN-'
+
+# Columns drawn together from one source row
+NAME_COLUMNS = ['first_name', 'first_name_id', 'last_name', 'last_name_id', 'full_name', 'race_signal', 'gender_signal']
+
+CALLBACK_STATUS_WEIGHTS = {'no_info': 0.70, 'rejection': 0.20, 'callback': 0.10}
+LOCATIONS = ["GA", "NY", "MA", "IL", "CO", "FLO", "LA", "MI", "PA", "SFO", "TX", "WA", "DMV"]
+
+
+class Command(BaseCommand):
+    help = 'Bulk-create synthetic Pair, Profile, Employer, PairApplication and CallbackLog rows at study scale'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pairs', type=int, default=20000)
+        parser.add_argument('--employers', type=int, default=50000)
+        parser.add_argument('--applications', type=int, default=100000)
+        parser.add_argument('--csv_path', type=str, default='data/resume_pairs_log.csv',
+                            help='Resume CSV whose columns are sampled for profiles')
+        parser.add_argument('--audit_csv_path', type=str, default='data/final_audit_data.csv',
+                            help='Merged audit CSV whose job and employer columns are sampled')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--batch_size', type=int, default=DEFAULT_BATCH_SIZE * 4)
+        parser.add_argument('--clear', action='store_true', help='Delete rows from a previous synthetic run first')
+
+    def handle(self, *args, **options):
+        for path in (options['csv_path'], options['audit_csv_path']):
+            if not Path(path).exists():
+                raise CommandError(f'CSV file not found: {path}')
+
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.resumes = pd.read_csv(options['csv_path'], dtype=str, keep_default_na=False)
+        self.audit = pd.read_csv(options['audit_csv_path'], dtype=str, keep_default_na=False)
+
+        started = time.perf_counter()
+
+        # One transaction, so a run rejected by _create_applications leaves the previous data in place
+        with transaction.atomic():
+            if options['clear']:
+                self._clear()
+            pairs = self._create_pairs(options['pairs'])
+            self._step('pairs and profiles', started)
+            employers = self._create_employers(options['employers'])
+            self._step('employers', started)
+            applications = self._create_applications(options['applications'], pairs, employers)
+            self._step('applications', started)
+            logs = self._create_callback_logs(applications)
+            self._step('callback logs', started)
+
+        rows = refresh_audit_rows(batch_size=self.batch_size, update_summary=False)
+        refresh_callback_summary()
+        self._step(f'{rows} audit rows and summary', started)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(pairs)} pairs, {len(pairs) * 2} profiles, {len(employers)} employers, '
+            f'{len(applications)} applications and {logs} callback logs in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _step(self, label, started):
+        self.stdout.write(f'  {label}: {time.perf_counter() - started:.1f}s')
+
+    def _clear(self):
+        applications = PairApplication.objects.filter(pair__pair_id__startswith=SYNTHETIC_PREFIX)
+        CallbackLog.objects.filter(application__in=applications).delete()
+        applications.delete()
+        Pair.objects.filter(pair_id__startswith=SYNTHETIC_PREFIX).delete()
+        Employer.objects.filter(display_name__startswith=SYNTHETIC_PREFIX).delete()
+        self.stdout.write('  cleared previous synthetic rows')
+
+    def _column(self, frame, column, size):
+        """`size` draws from the empirical distribution of one CSV column."""
+        values = frame[column].to_numpy() if column in frame else np.array([''])
+        return values[self.rng.integers(0, len(values), size)]
+
+    def _create_pairs(self, count):
+        occupation_values = self._column(self.resumes, 'occupation', count)
+        fit_values = self._column(self.resumes, 'good_fit_occupations', count)
+        locations = self.rng.choice(LOCATIONS, count)
+        archetypes = self.rng.integers(1, 4, count)
+        pairs = [
+            Pair(pair_id=f'{SYNTHETIC_PREFIX}{i:07d}', occupation=occupation_values[i] or 'communications',
+                 good_fit_occupations=fit_values[i], location=locations[i], archetype=int(archetypes[i]))
+            for i in range(count)
+        ]
+        Pair.objects.bulk_create(pairs, batch_size=self.batch_size)
+        pairs = list(Pair.objects.filter(pair_id__startswith=SYNTHETIC_PREFIX).order_by('pair_id'))
+
+        profile_count = len(pairs) * 2
+        name_rows = self.rng.integers(0, len(self.resumes), profile_count)
+        columns = {
+            column: self._column(self.resumes, column, profile_count)
+            for column in self.resumes.columns if column not in NAME_COLUMNS
+        }
+        name_block = self.resumes.reindex(columns=NAME_COLUMNS).fillna('').to_numpy()[name_rows]
+
+        profiles = []
+        for n in range(profile_count):
+            pair = pairs[n // 2]
+            row = {column: values[n] for column, values in columns.items()}
+            row.update(zip(NAME_COLUMNS, name_block[n]))
+            local, _, domain = (row.get('email') or 'person@example.com').partition('@')
+            profiles.append(Profile(
+                pair=pair,
+                full_name=row['full_name'],
+                phone=f'555-{n // 10000 % 1000:03d}-{n % 10000:04d}',
+                address=row.get('address', ''),
+                email=f'{local}.{n}@{domain or "example.com"}',
+                expertise=row.get('skills', ''),
+                template_name=row.get('template_name', ''),
+                resume_idx=n % 2 + 1,
+                **profile_attributes(row),
+            ))
+        Profile.objects.bulk_create(profiles, batch_size=self.batch_size)
+        return pairs
+
+    def _create_employers(self, count):
+        industries = self._column(self.audit, 'applied_employer_industry', count)
+        locations = self._column(self.audit, 'applied_employer_location', count)
+        missions = self._column(self.audit, 'applied_employer_mission', count)
+        # Heavy-tailed headcounts, ratings on the 1.0-5.0 scale in 0.1 steps
+        employees = np.clip(self.rng.lognormal(5, 1.5, count), 1, 500000).astype(int)
+        glassdoor = np.round(np.clip(self.rng.normal(3.8, 0.5, count), 1, 5), 1)
+        diversity = np.round(np.clip(self.rng.normal(3.6, 0.6, count), 1, 5), 1)
+        openings = self.rng.poisson(8, count)
+
+        employers = [
+            Employer(
+                display_name=f'{SYNTHETIC_PREFIX}Employer {i}',
+                normalized_name=f'syn-employer {i}',
+                employer_location=locations[i],
+                industry=industries[i],
+                number_employees=int(employees[i]),
+                glassdoor_score=Decimal(str(glassdoor[i])),
+                diversity_score=Decimal(str(diversity[i])),
+                openings_number=int(openings[i]),
+                mission_statement=missions[i],
+            )
+            for i in range(count)
+        ]
+        Employer.objects.bulk_create(employers, batch_size=self.batch_size)
+        return list(Employer.objects.filter(display_name__startswith=SYNTHETIC_PREFIX).order_by('pk'))
+
+    def _create_applications(self, count, pairs, employers):
+        # Keyed by the occupation as the application stores it, so pair occupations
+        # that store the same way share their employers
+        by_occupation = {}
+        for pair in pairs:
+            by_occupation.setdefault(pair.occupation.strip().capitalize(), []).append(pair)
+        occupations = sorted(by_occupation)
+        # Applications are unique per (occupation, employer): the pairs drawn may cover
+        # fewer occupations than the CSV lists
+        if count > len(employers) * len(occupations):
+            raise CommandError(
+                f'--applications cannot exceed {len(occupations)} x --employers '
+                f'(the pairs drawn cover {len(occupations)} occupations)'
+            )
+
+        job_titles = self._column(self.audit, 'job_title', count)
+        job_texts = self._column(self.audit, 'job_text', count)
+        job_locations = self._column(self.audit, 'job_location', count)
+        work_modes = self.rng.choice(['remote', 'hybrid', 'in_person'], count)
+        job_boards = self.rng.choice(['indeed', 'glassdoor', 'ziprecruiter', 'other'], count, p=[0.5, 0.25, 0.2, 0.05])
+        submitted = self.rng.random(count) < 0.9
+        age_days = self.rng.integers(0, 180, count)
+        now = timezone.now()
+
+        applications = []
+        for i in range(count):
+            # The i-th pass over the employers uses the next occupation, keeping (occupation, employer) unique
+            employer = employers[i % len(employers)]
+            occupation = occupations[(i // len(employers)) % len(occupations)]
+            candidates = by_occupation[occupation]
+            pair = candidates[self.rng.integers(0, len(candidates))]
+            submitted_at = now - datetime.timedelta(days=int(age_days[i])) if submitted[i] else None
+            applications.append(PairApplication(
+                pair=pair,
+                employer=employer,
+                occupation=occupation,  # as the admin stores it
+                job_title=job_titles[i] or 'Specialist',
+                job_text=job_texts[i],
+                job_location=job_locations[i],
+                work_mode=work_modes[i],
+                job_board=job_boards[i],
+                days_open=int(self.rng.integers(0, 60)),
+                status='submitted' if submitted[i] else 'draft',
+                submitted_at=submitted_at,
+            ))
+        PairApplication.objects.bulk_create(applications, batch_size=self.batch_size)
+        return list(
+            PairApplication.objects.filter(pair__pair_id__startswith=SYNTHETIC_PREFIX).order_by('pk')
+        )
+
+    def _create_callback_logs(self, applications):
+        profiles = {}
+        for profile in Profile.objects.filter(pair__pair_id__startswith=SYNTHETIC_PREFIX).only('pk', 'pair_id', 'resume_idx'):
+            profiles.setdefault(profile.pair_id, []).append(profile)
+
+        statuses = list(CALLBACK_STATUS_WEIGHTS)
+        weights = list(CALLBACK_STATUS_WEIGHTS.values())
+        logs = []
+        for application in applications:
+            for profile in profiles.get(application.pair_id, []):
+                status = self.rng.choice(statuses, p=weights) if application.submitted_at else 'no_info'
+                log = CallbackLog(application=application, profile=profile, callback_status=status)
+                if status != 'no_info':
+                    log.callback_date = (application.submitted_at + datetime.timedelta(days=int(self.rng.integers(1, 45)))).date()
+                    log.callback_medium = self.rng.choice(['phone', 'personalized_email', 'standardized_email'])
+                # bulk_create skips save(), so set the response latency here
+                log.update_response_time()
+                logs.append(log)
+                if len(logs) >= self.batch_size:
+                    CallbackLog.objects.bulk_create(logs)
+                    logs = []
+        CallbackLog.objects.bulk_create(logs)
+        return CallbackLog.objects.filter(application__pair__pair_id__startswith=SYNTHETIC_PREFIX).count()
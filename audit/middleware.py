@@ -0,0 +1,336 @@
+"""
+Per-request performance instrumentation.
+
+PerformanceMiddleware times every request and, per URL name, records wall
+time, SQL query count and SQL time (via a database execute_wrapper) and
+template render time (TemplateResponses, i.e. the admin's pages). Each
+response gets a Server-Timing header so the numbers show up in the
+browser's network panel.
+
+Samples are kept in memory as a rolling window per URL name, one registry
+per process, and written to a JSON snapshot per process every
+PERF_SNAPSHOT_INTERVAL seconds and when the process exits;
+`manage.py perf_report` merges the recent snapshots. Requests over their
+query budget log a structured warning on the "audit.perf" logger.
+
+Both middlewares here run natively under ASGI as well as WSGI, so async
+views (audit.views, audit.callback_views) aren't pushed back onto a thread.
+
+Settings (all optional):
+    PERF_WINDOW              samples kept per URL name (default 1000)
+    PERF_SNAPSHOT_DIR        where snapshots are written (default BASE_DIR/perf)
+    PERF_SNAPSHOT_INTERVAL   seconds between snapshots (default 60)
+    PERF_QUERY_BUDGET        default queries allowed per request (default 50)
+    PERF_QUERY_BUDGETS       {url_name: budget} overrides
+"""
+
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .profiling import RequestProfiler
+
+logger = logging.getLogger("audit.perf")
+
+METRICS = ("wall_ms", "queries", "sql_ms", "template_ms")
+
+
+def snapshot_dir():
+    return Path(getattr(settings, "PERF_SNAPSHOT_DIR", Path(settings.BASE_DIR) / "perf"))
+
+
+class PerfRegistry:
+    """Thread-safe rolling window of request samples per URL name."""
+
+    def __init__(self, window):
+        self.window = window
+        self._samples = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, sample):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append(tuple(sample[metric] for metric in METRICS))
+            self._totals[name] = self._totals.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {"requests": self._totals[name], "samples": [list(s) for s in samples]}
+                for name, samples in self._samples.items()
+            }
+
+    def write_snapshot(self, directory):
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"perf-{os.getpid()}.json"
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"pid": os.getpid(), "written_at": time.time(), "metrics": METRICS,
+                                   "views": self.snapshot()}))
+        tmp.replace(path)
+        return path
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def process_registry():
+    """The process's PerfRegistry, shared by every middleware instance and written out at exit."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PerfRegistry(getattr(settings, "PERF_WINDOW", 1000))
+            atexit.register(flush_registry, _registry)
+        return _registry
+
+
+def flush_registry(registry):
+    """Write a final snapshot, so a worker that exits between intervals still reports."""
+    if not registry.snapshot():
+        return None
+    try:
+        return registry.write_snapshot(snapshot_dir())
+    except OSError:
+        logger.exception("Could not write performance snapshot")
+        return None
+
+
+class _RequestTimings:
+    """execute_wrapper collecting the SQL count and time of one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_start = None
+        self.template_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def _add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+class PerformanceMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.registry = process_registry()
+        self.snapshot_interval = getattr(settings, "PERF_SNAPSHOT_INTERVAL", 60)
+        self.default_budget = getattr(settings, "PERF_QUERY_BUDGET", 50)
+        self.budgets = getattr(settings, "PERF_QUERY_BUDGETS", {})
+        self._last_snapshot = time.monotonic()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = request._perf_timings = _RequestTimings()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timings):
+            response = self.get_response(request)
+        return self._finish(request, timings, time.perf_counter() - started, response)
+
+    async def __acall__(self, request):
+        timings = request._perf_timings = _RequestTimings()
+        started = time.perf_counter()
+        # Connections are per thread: the async ORM queries through the
+        # request's thread-sensitive sync thread, so the wrapper goes there
+        await sync_to_async(_add_execute_wrapper)(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_execute_wrapper)(timings)
+        return self._finish(request, timings, time.perf_counter() - started, response)
+
+    def _finish(self, request, timings, wall, response):
+        name = self._url_name(request)
+        sample = {
+            "wall_ms": wall * 1000,
+            "queries": timings.queries,
+            "sql_ms": timings.sql_time * 1000,
+            "template_ms": timings.template_time * 1000,
+        }
+        response["Server-Timing"] = (
+            f'total;dur={sample["wall_ms"]:.1f}, '
+            f'sql;dur={sample["sql_ms"]:.1f};desc="{timings.queries} queries", '
+            f'tpl;dur={sample["template_ms"]:.1f}'
+        )
+        self.registry.record(name, sample)
+        self._check_budget(request, name, sample, response)
+        self._maybe_snapshot()
+        return response
+
+    def process_template_response(self, request, response):
+        # Rendering happens right after this hook; the callback marks its end
+        timings = getattr(request, "_perf_timings", None)
+        if timings is not None:
+            timings.template_start = time.perf_counter()
+
+            def rendered(response):
+                timings.template_time += time.perf_counter() - timings.template_start
+
+            response.add_post_render_callback(rendered)
+        return response
+
+    def _url_name(self, request):
+        match = getattr(request, "resolver_match", None)
+        if match is not None and match.view_name:
+            return match.view_name
+        return "<unresolved>"
+
+    def _check_budget(self, request, name, sample, response):
+        budget = self.budgets.get(name, self.default_budget)
+        if budget is None or sample["queries"] <= budget:
+            return
+        logger.warning(json.dumps({
+            "event": "query_budget_exceeded",
+            "view": name,
+            "path": request.path,
+            "method": request.method,
+            "status": response.status_code,
+            "queries": sample["queries"],
+            "budget": budget,
+            "sql_ms": round(sample["sql_ms"], 1),
+            "wall_ms": round(sample["wall_ms"], 1),
+        }))
+
+    def _maybe_snapshot(self):
+        now = time.monotonic()
+        if now - self._last_snapshot < self.snapshot_interval:
+            return
+        self._last_snapshot = now
+        flush_registry(self.registry)
+
+
+class ProfilingMiddleware:
+    """
+    Profile staff requests on demand (see audit.profiling).
+
+    A request is profiled when it carries ?_profile=1 or "X-Profile: 1",
+    or at random at PROFILE_SAMPLE_RATE, and only for active staff users,
+    so it must come after AuthenticationMiddleware. The query parameter is
+    removed before the view runs (the admin changelist would read it as a
+    filter). One request is profiled at a time per process; others that
+    ask meanwhile run unprofiled. Profiled responses carry X-Profile-Id.
+
+    Under ASGI the profile covers the event loop thread, so it includes
+    whatever other requests' coroutines ran meanwhile, and the stack
+    sampler doesn't see ORM calls made through sync_to_async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    QUERY_PARAM = "_profile"
+    HEADER = "HTTP_X_PROFILE"
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "PROFILE_SAMPLE_RATE", 0.0)
+        self.interval = getattr(settings, "PROFILE_SAMPLE_INTERVAL", 0.005)
+        self._lock = threading.Lock()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self._trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        user = getattr(request, "user", None)
+        if not self._may_profile(user):
+            return self.get_response(request)
+
+        try:
+            started = time.perf_counter()
+            with RequestProfiler(self.interval) as profiler:
+                response = self.get_response(request)
+            self._save(profiler, request, response, user, trigger, time.perf_counter() - started)
+        finally:
+            self._lock.release()
+        return response
+
+    async def __acall__(self, request):
+        trigger = self._trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+
+        user = await request.auser()
+        if not self._may_profile(user):
+            return await self.get_response(request)
+
+        try:
+            started = time.perf_counter()
+            with RequestProfiler(self.interval) as profiler:
+                response = await self.get_response(request)
+            self._save(profiler, request, response, user, trigger, time.perf_counter() - started)
+        finally:
+            self._lock.release()
+        return response
+
+    def _trigger(self, request):
+        if self._pop_trigger(request):
+            return "requested"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    def _may_profile(self, user):
+        """Staff only, one request at a time; takes the lock when it returns True."""
+        if not (user is not None and user.is_active and user.is_staff):
+            return False
+        return self._lock.acquire(blocking=False)
+
+    def _save(self, profiler, request, response, user, trigger, wall):
+        match = getattr(request, "resolver_match", None)
+        try:
+            response["X-Profile-Id"] = profiler.save({
+                "path": request.get_full_path(),
+                "method": request.method,
+                "view": match.view_name if match is not None else "",
+                "status": response.status_code,
+                "user": user.get_username(),
+                "trigger": trigger,
+                "wall_ms": round(wall * 1000, 1),
+            })
+        except OSError:
+            logger.exception("Could not write request profile")
+
+    def _pop_trigger(self, request):
+        requested = request.META.get(self.HEADER, "") == "1"
+        if self.QUERY_PARAM in request.GET:
+            requested = requested or request.GET[self.QUERY_PARAM] == "1"
+            query = request.GET.copy()
+            del query[self.QUERY_PARAM]
+            request.GET = query
+            request.META["QUERY_STRING"] = query.urlencode()
+        return requested
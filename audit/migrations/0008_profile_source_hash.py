@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0007_pairapplication_status_pairapplication_submitted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='source_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
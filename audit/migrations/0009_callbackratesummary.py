@@ -0,0 +1,77 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:41
+
+from django.db import migrations, models
+
+# (dimension, lookup from CallbackLog) of the dashboard cells at this migration
+DIMENSIONS = [
+    ('occupation', 'application__pair__occupation'),
+    ('location', 'application__pair__location'),
+    ('archetype', 'application__pair__archetype'),
+    ('work_mode', 'application__work_mode'),
+    ('job_board', 'application__job_board'),
+    ('employer_industry', 'application__employer__industry'),
+    ('employer_location', 'application__employer__employer_location'),
+    ('employer_size', 'application__employer__number_employees'),
+]
+
+
+def employer_size_bucket(number_employees):
+    if number_employees is None:
+        return ''
+    if number_employees < 50:
+        return '1-49'
+    if number_employees < 250:
+        return '50-249'
+    if number_employees < 1000:
+        return '250-999'
+    return '1000+'
+
+
+def backfill_callback_summary(apps, schema_editor):
+    CallbackLog = apps.get_model('audit', 'CallbackLog')
+    CallbackRateSummary = apps.get_model('audit', 'CallbackRateSummary')
+    cells = {}
+    paths = [path for _key, path in DIMENSIONS]
+    for values in CallbackLog.objects.order_by().values('callback_status', *paths).iterator(chunk_size=2000):
+        status = values['callback_status']
+        counts = (1, int(status == 'callback'), int(status == 'rejection'), int(status == 'no_info'))
+        for key, path in DIMENSIONS:
+            value = values[path]
+            value = employer_size_bucket(value) if key == 'employer_size' else ('' if value is None else str(value))
+            cell = cells.setdefault((key, value), [0, 0, 0, 0])
+            for i, count in enumerate(counts):
+                cell[i] += count
+    CallbackRateSummary.objects.bulk_create(
+        [CallbackRateSummary(dimension=key, value=value, total=total, callbacks=callbacks,
+                             rejections=rejections, pending=pending)
+         for (key, value), (total, callbacks, rejections, pending) in cells.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0008_profile_source_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CallbackRateSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=50)),
+                ('value', models.CharField(blank=True, max_length=255)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('callbacks', models.PositiveIntegerField(default=0)),
+                ('rejections', models.PositiveIntegerField(default=0)),
+                ('pending', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['dimension', 'value'],
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='unique_callback_summary_cell')],
+            },
+        ),
+        migrations.RunPython(backfill_callback_summary, migrations.RunPython.noop),
+    ]
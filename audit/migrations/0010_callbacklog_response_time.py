@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:43
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_response_time(apps, schema_editor):
+    CallbackLog = apps.get_model('audit', 'CallbackLog')
+    logs = list(CallbackLog.objects.select_related('application'))
+    for log in logs:
+        submitted_at = log.application.submitted_at
+        log.response_censored = log.callback_status == 'no_info'
+        if not log.response_censored and log.callback_date and submitted_at:
+            log.days_to_response = max(0, (log.callback_date - timezone.localdate(submitted_at)).days)
+    CallbackLog.objects.bulk_update(logs, ['days_to_response', 'response_censored'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0009_callbackratesummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callbacklog',
+            name='days_to_response',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='callbacklog',
+            name='response_censored',
+            field=models.BooleanField(default=True, editable=False, help_text='No response logged yet'),
+        ),
+        migrations.RunPython(backfill_response_time, migrations.RunPython.noop),
+    ]
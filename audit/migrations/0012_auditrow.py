@@ -0,0 +1,230 @@
+# Generated by Django 5.2.5 on 2026-10-19 02:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+PROFILE_ATTRIBUTE_FIELDS = [
+    'first_name', 'first_name_id', 'last_name', 'last_name_id', 'phone_id', 'address_id',
+    'race_signal', 'gender_signal',
+    'current_employer_type', 'current_employer_id', 'current_employer_name',
+    'current_job_title', 'current_job_id', 'current_start', 'current_end', 'current_bullets',
+    'previous_employer_type', 'previous_employer_id', 'previous_employer_name',
+    'previous_job_title', 'previous_job_id', 'previous_start', 'previous_end', 'previous_bullets',
+    'college_activity_type', 'college_activity_description', 'college_name', 'college_id',
+    'college_major', 'college_major_id', 'college_gpa', 'grad_gap', 'college_start', 'college_end',
+    'summary',
+]
+
+# AuditRow field -> lookup from CallbackLog, as audit_rows.AUDIT_ROW_SOURCES stood at this migration
+AUDIT_ROW_SOURCES = {
+    'application_id': 'application_id',
+    'profile_id': 'profile_id',
+    'pair_id': 'application__pair__pair_id',
+    'pair_occupation': 'application__pair__occupation',
+    'pair_location': 'application__pair__location',
+    'pair_archetype': 'application__pair__archetype',
+    'pair_sublocation': 'application__pair__sublocation',
+    'good_fit_occupations': 'application__pair__good_fit_occupations',
+    'resume_idx': 'profile__resume_idx',
+    'template_name': 'profile__template_name',
+    'full_name': 'profile__full_name',
+    'phone': 'profile__phone',
+    'address': 'profile__address',
+    'email': 'profile__email',
+    'expertise': 'profile__expertise',
+    **{name: f'profile__{name}' for name in PROFILE_ATTRIBUTE_FIELDS},
+    'application_occupation': 'application__occupation',
+    'job_title': 'application__job_title',
+    'job_text': 'application__job_text',
+    'job_location': 'application__job_location',
+    'work_mode': 'application__work_mode',
+    'job_link': 'application__job_link',
+    'job_board': 'application__job_board',
+    'job_board_other': 'application__job_board_other',
+    'days_open': 'application__days_open',
+    'application_status': 'application__status',
+    'submitted_at': 'application__submitted_at',
+    'application_created': 'application__created_at',
+    'application_updated': 'application__updated_at',
+    'employer_id': 'application__employer_id',
+    'employer_name': 'application__employer__display_name',
+    'employer_normalized_name': 'application__employer__normalized_name',
+    'employer_location': 'application__employer__employer_location',
+    'employer_industry': 'application__employer__industry',
+    'employer_employees': 'application__employer__number_employees',
+    'employer_glassdoor_score': 'application__employer__glassdoor_score',
+    'employer_diversity_score': 'application__employer__diversity_score',
+    'employer_openings': 'application__employer__openings_number',
+    'employer_mission': 'application__employer__mission_statement',
+    'callback_status': 'callback_status',
+    'callback_date': 'callback_date',
+    'callback_medium': 'callback_medium',
+    'callback_notes': 'callback_notes',
+    'days_to_response': 'days_to_response',
+    'response_censored': 'response_censored',
+    'callback_created': 'created_at',
+    'callback_updated': 'updated_at',
+}
+
+# Dashboard cells (dimension, AuditRow column); the summary now groups over AuditRow
+SUMMARY_DIMENSIONS = [
+    ('occupation', 'pair_occupation'),
+    ('location', 'pair_location'),
+    ('archetype', 'pair_archetype'),
+    ('work_mode', 'work_mode'),
+    ('job_board', 'job_board'),
+    ('employer_industry', 'employer_industry'),
+    ('employer_location', 'employer_location'),
+    ('employer_size', 'employer_size'),
+    ('race_signal', 'race_signal'),
+    ('gender_signal', 'gender_signal'),
+    ('current_employer_type', 'current_employer_type'),
+    ('college_activity_type', 'college_activity_type'),
+]
+
+
+def employer_size_bucket(number_employees):
+    if number_employees is None:
+        return ''
+    if number_employees < 50:
+        return '1-49'
+    if number_employees < 250:
+        return '50-249'
+    if number_employees < 1000:
+        return '250-999'
+    return '1000+'
+
+
+def backfill_audit_rows(apps, schema_editor):
+    """Build the audit row of every existing callback log, then rebuild the dashboard cells from them."""
+    CallbackLog = apps.get_model('audit', 'CallbackLog')
+    AuditRow = apps.get_model('audit', 'AuditRow')
+    CallbackRateSummary = apps.get_model('audit', 'CallbackRateSummary')
+    cells = {}
+    rows = []
+    values = CallbackLog.objects.order_by('pk').values('pk', *AUDIT_ROW_SOURCES.values())
+    for log in values.iterator(chunk_size=BATCH_SIZE):
+        row = AuditRow(callback_log_id=log['pk'], **{field: log[path] for field, path in AUDIT_ROW_SOURCES.items()})
+        row.employer_size = employer_size_bucket(row.employer_employees)
+        status = row.callback_status
+        counts = (1, int(status == 'callback'), int(status == 'rejection'), int(status == 'no_info'))
+        for key, column in SUMMARY_DIMENSIONS:
+            value = getattr(row, column)
+            cell = cells.setdefault((key, '' if value is None else str(value)), [0, 0, 0, 0])
+            for i, count in enumerate(counts):
+                cell[i] += count
+        rows.append(row)
+        if len(rows) == BATCH_SIZE:
+            AuditRow.objects.bulk_create(rows)
+            rows = []
+    AuditRow.objects.bulk_create(rows)
+
+    CallbackRateSummary.objects.all().delete()
+    CallbackRateSummary.objects.bulk_create(
+        [CallbackRateSummary(dimension=key, value=value, total=total, callbacks=callbacks,
+                             rejections=rejections, pending=pending)
+         for (key, value), (total, callbacks, rejections, pending) in cells.items()],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0011_profile_resume_attributes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('application_id', models.BigIntegerField(db_index=True)),
+                ('profile_id', models.BigIntegerField(db_index=True)),
+                ('pair_id', models.CharField(db_index=True, max_length=50)),
+                ('pair_occupation', models.CharField(max_length=120)),
+                ('pair_location', models.CharField(blank=True, max_length=10)),
+                ('pair_archetype', models.IntegerField(blank=True, null=True)),
+                ('pair_sublocation', models.IntegerField(blank=True, null=True)),
+                ('good_fit_occupations', models.TextField(blank=True)),
+                ('resume_idx', models.IntegerField(default=1)),
+                ('template_name', models.CharField(blank=True, max_length=50)),
+                ('full_name', models.CharField(blank=True, db_index=True, max_length=200)),
+                ('phone', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('address', models.CharField(blank=True, max_length=255)),
+                ('email', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('expertise', models.TextField(blank=True)),
+                ('application_occupation', models.CharField(max_length=120)),
+                ('job_title', models.CharField(max_length=255)),
+                ('job_text', models.TextField()),
+                ('job_location', models.CharField(blank=True, max_length=255)),
+                ('work_mode', models.CharField(max_length=20)),
+                ('job_link', models.URLField(blank=True)),
+                ('job_board', models.CharField(blank=True, max_length=50)),
+                ('job_board_other', models.CharField(blank=True, max_length=255)),
+                ('days_open', models.PositiveIntegerField(default=0)),
+                ('application_status', models.CharField(max_length=20)),
+                ('submitted_at', models.DateTimeField(blank=True, null=True)),
+                ('application_created', models.DateTimeField()),
+                ('application_updated', models.DateTimeField()),
+                ('employer_id', models.BigIntegerField(db_index=True)),
+                ('employer_name', models.CharField(db_index=True, max_length=255)),
+                ('employer_normalized_name', models.CharField(max_length=255)),
+                ('employer_location', models.CharField(blank=True, max_length=255)),
+                ('employer_industry', models.CharField(blank=True, max_length=255)),
+                ('employer_employees', models.PositiveIntegerField(blank=True, null=True)),
+                ('employer_size', models.CharField(blank=True, max_length=20)),
+                ('employer_glassdoor_score', models.DecimalField(blank=True, decimal_places=1, max_digits=2, null=True)),
+                ('employer_diversity_score', models.DecimalField(blank=True, decimal_places=1, max_digits=2, null=True)),
+                ('employer_openings', models.PositiveIntegerField(blank=True, null=True)),
+                ('employer_mission', models.TextField(blank=True)),
+                ('callback_status', models.CharField(db_index=True, max_length=20)),
+                ('callback_date', models.DateField(blank=True, null=True)),
+                ('callback_medium', models.CharField(blank=True, max_length=20)),
+                ('callback_notes', models.TextField(blank=True)),
+                ('days_to_response', models.IntegerField(blank=True, null=True)),
+                ('response_censored', models.BooleanField(default=True)),
+                ('callback_created', models.DateTimeField()),
+                ('callback_updated', models.DateTimeField()),
+                ('first_name', models.CharField(blank=True, max_length=100)),
+                ('first_name_id', models.CharField(blank=True, max_length=50)),
+                ('last_name', models.CharField(blank=True, max_length=100)),
+                ('last_name_id', models.CharField(blank=True, max_length=50)),
+                ('phone_id', models.CharField(blank=True, max_length=50)),
+                ('address_id', models.CharField(blank=True, max_length=50)),
+                ('race_signal', models.CharField(blank=True, db_index=True, max_length=50)),
+                ('gender_signal', models.CharField(blank=True, db_index=True, max_length=50)),
+                ('current_employer_type', models.CharField(blank=True, db_index=True, max_length=50)),
+                ('current_employer_id', models.CharField(blank=True, max_length=50)),
+                ('current_employer_name', models.CharField(blank=True, max_length=255)),
+                ('current_job_title', models.CharField(blank=True, max_length=255)),
+                ('current_job_id', models.CharField(blank=True, max_length=50)),
+                ('current_start', models.CharField(blank=True, max_length=20)),
+                ('current_end', models.CharField(blank=True, max_length=20)),
+                ('current_bullets', models.TextField(blank=True)),
+                ('previous_employer_type', models.CharField(blank=True, db_index=True, max_length=50)),
+                ('previous_employer_id', models.CharField(blank=True, max_length=50)),
+                ('previous_employer_name', models.CharField(blank=True, max_length=255)),
+                ('previous_job_title', models.CharField(blank=True, max_length=255)),
+                ('previous_job_id', models.CharField(blank=True, max_length=50)),
+                ('previous_start', models.CharField(blank=True, max_length=20)),
+                ('previous_end', models.CharField(blank=True, max_length=20)),
+                ('previous_bullets', models.TextField(blank=True)),
+                ('college_activity_type', models.CharField(blank=True, db_index=True, max_length=50)),
+                ('college_activity_description', models.CharField(blank=True, max_length=255)),
+                ('college_name', models.CharField(blank=True, max_length=255)),
+                ('college_id', models.CharField(blank=True, max_length=50)),
+                ('college_major', models.CharField(blank=True, max_length=255)),
+                ('college_major_id', models.CharField(blank=True, max_length=50)),
+                ('college_gpa', models.DecimalField(blank=True, decimal_places=2, max_digits=3, null=True)),
+                ('grad_gap', models.PositiveSmallIntegerField(blank=True, help_text='Years between graduation and current job', null=True)),
+                ('college_start', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('college_end', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('summary', models.TextField(blank=True)),
+                ('callback_log', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='audit_row', to='audit.callbacklog')),
+            ],
+        ),
+        migrations.RunPython(backfill_audit_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:22
+
+import audit.storage
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0012_auditrow'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='resume_pdf',
+            field=models.FileField(blank=True, null=True, storage=audit.storage.select_resume_storage, upload_to='resumes/pdfs/'),
+        ),
+        migrations.CreateModel(
+            name='ResumeBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('stored_size', models.PositiveBigIntegerField()),
+                ('compressed', models.BooleanField(default=False)),
+                ('refcount', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_stored_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['refcount', 'last_stored_at'], name='resumeblob_gc_idx')],
+            },
+        ),
+    ]
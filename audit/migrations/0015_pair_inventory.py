@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0014_generationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pair',
+            name='in_inventory',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='pair',
+            index=models.Index(condition=models.Q(('in_inventory', True)), fields=['location', 'occupation', 'archetype', 'sublocation'], name='pair_inventory_idx'),
+        ),
+    ]
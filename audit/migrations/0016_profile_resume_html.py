@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0015_pair_inventory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='resume_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit', '0016_profile_resume_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pair',
+            name='generator_version',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='pair',
+            name='rng_seed',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='html_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
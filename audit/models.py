@@ -1,4 +1,7 @@
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+from .storage import select_resume_storage
 import re
 
 class Pair(models.Model):
@@ -11,6 +14,19 @@ class Pair(models.Model):
     archetype = models.IntegerField(blank=True, null=True)
     sublocation = models.IntegerField(blank=True, null=True)
 
+    # Pre-generated and not yet handed out (see audit.inventory)
+    in_inventory = models.BooleanField(default=False, editable=False)
+
+    # Regenerates the pair exactly with the same generator version (see audit.regeneration); null before seeding
+    rng_seed = models.BigIntegerField(blank=True, null=True, editable=False)
+    generator_version = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["location", "occupation", "archetype", "sublocation"],
+                         condition=models.Q(in_inventory=True), name="pair_inventory_idx"),
+        ]
+
     def __str__(self):
         return f"{self.pair_id} ({self.occupation})"
 
@@ -24,11 +40,102 @@ class Profile(models.Model):
     expertise = models.TextField(blank=True)  # Rename from professional skills
 
     # PDF storage and generation tracking
-    resume_pdf = models.FileField(upload_to='resumes/pdfs/', blank=True, null=True)
+    # Stored once per distinct PDF, by content hash (see audit.storage)
+    resume_pdf = models.FileField(upload_to='resumes/pdfs/', storage=select_resume_storage, blank=True, null=True)
+    # The resume as rendered from its template; the PDF is printed from it, on first download when lazy (see audit.pipeline)
+    resume_html = models.TextField(blank=True, editable=False)
+    html_sha256 = models.CharField(max_length=64, blank=True, editable=False)  # checked when the HTML is regenerated
     template_name = models.CharField(max_length=50, blank=True)
     resume_idx = models.IntegerField(default=1)  # 1 or 2 to track which resume in pair
-    
-    
+
+    # SHA-256 of the source row this profile was imported from (see audit.importers)
+    source_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    # Resume attributes as randomised by the generator (columns of resume_pairs_log.csv)
+    first_name = models.CharField(max_length=100, blank=True)
+    first_name_id = models.CharField(max_length=50, blank=True)
+    last_name = models.CharField(max_length=100, blank=True)
+    last_name_id = models.CharField(max_length=50, blank=True)
+    phone_id = models.CharField(max_length=50, blank=True)
+    address_id = models.CharField(max_length=50, blank=True)
+
+    # Treatment signals, indexed for analysis
+    race_signal = models.CharField(max_length=50, blank=True, db_index=True)
+    gender_signal = models.CharField(max_length=50, blank=True, db_index=True)
+    current_employer_type = models.CharField(max_length=50, blank=True, db_index=True)
+    previous_employer_type = models.CharField(max_length=50, blank=True, db_index=True)
+    college_activity_type = models.CharField(max_length=50, blank=True, db_index=True)
+
+    current_employer_id = models.CharField(max_length=50, blank=True)
+    current_employer_name = models.CharField(max_length=255, blank=True)
+    current_job_title = models.CharField(max_length=255, blank=True)
+    current_job_id = models.CharField(max_length=50, blank=True)
+    current_start = models.CharField(max_length=20, blank=True)
+    current_end = models.CharField(max_length=20, blank=True)
+    current_bullets = models.TextField(blank=True)
+
+    previous_employer_id = models.CharField(max_length=50, blank=True)
+    previous_employer_name = models.CharField(max_length=255, blank=True)
+    previous_job_title = models.CharField(max_length=255, blank=True)
+    previous_job_id = models.CharField(max_length=50, blank=True)
+    previous_start = models.CharField(max_length=20, blank=True)
+    previous_end = models.CharField(max_length=20, blank=True)
+    previous_bullets = models.TextField(blank=True)
+
+    college_activity_description = models.CharField(max_length=255, blank=True)
+    college_name = models.CharField(max_length=255, blank=True)
+    college_id = models.CharField(max_length=50, blank=True)
+    college_major = models.CharField(max_length=255, blank=True)
+    college_major_id = models.CharField(max_length=50, blank=True)
+    college_gpa = models.DecimalField(max_digits=3, decimal_places=2, blank=True, null=True)
+    grad_gap = models.PositiveSmallIntegerField(blank=True, null=True, help_text="Years between graduation and current job")
+    college_start = models.PositiveSmallIntegerField(blank=True, null=True)
+    college_end = models.PositiveSmallIntegerField(blank=True, null=True)
+    summary = models.TextField(blank=True)
+
+
+PROFILE_ATTRIBUTE_FIELDS = [
+    "first_name", "first_name_id", "last_name", "last_name_id", "phone_id", "address_id",
+    "race_signal", "gender_signal",
+    "current_employer_type", "current_employer_id", "current_employer_name",
+    "current_job_title", "current_job_id", "current_start", "current_end", "current_bullets",
+    "previous_employer_type", "previous_employer_id", "previous_employer_name",
+    "previous_job_title", "previous_job_id", "previous_start", "previous_end", "previous_bullets",
+    "college_activity_type", "college_activity_description", "college_name", "college_id",
+    "college_major", "college_major_id", "college_gpa", "grad_gap", "college_start", "college_end",
+    "summary",
+]
+
+
+def profile_attributes(source):
+    """
+    Map a generator resume dict or a resume_pairs_log.csv row to Profile attribute values.
+
+    Missing keys are left out; list values (bullets) are joined the way the
+    CSV log writes them and numeric columns are coerced to their field types.
+    """
+    values = {}
+    for name in PROFILE_ATTRIBUTE_FIELDS:
+        if name not in source:
+            continue
+        value = source[name]
+        if isinstance(value, (list, tuple)):
+            value = " • ".join(str(item) for item in value)
+
+        field = Profile._meta.get_field(name)
+        if field.null:
+            # Numeric columns: blank cells become NULL, unparsable ones too
+            value = None if value in (None, "") else value
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                value = None
+        else:
+            value = "" if value is None else str(value)
+        values[name] = value
+    return values
+
+
 
 def normalize_employer_name(name):
     """
@@ -156,8 +263,37 @@ class PairApplication(models.Model):
             models.UniqueConstraint(fields=["occupation", "employer"], name="unique_occupation_employer_application")
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored submission time (None if deferred), so save() can tell whether it moved
+        instance._stored_submitted_at = instance.__dict__.get("submitted_at")
+        instance._submitted_at_loaded = "submitted_at" in instance.__dict__
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        # A new application has no callback logs yet
+        moved = not self._state.adding and (
+            not getattr(self, "_submitted_at_loaded", False) or self._stored_submitted_at != self.submitted_at
+        )
+        if moved:
+            # One transaction, so the audit rows refreshed on commit are built from the re-timed
+            # logs; outside one, on_commit would run as soon as the application row was saved
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self._retime_callbacks()
+        else:
+            super().save(*args, **kwargs)
+        self._stored_submitted_at = self.__dict__.get("submitted_at")
+        self._submitted_at_loaded = "submitted_at" in self.__dict__
+
+    def _retime_callbacks(self):
+        """Keep the response latency of existing callback logs in step with submitted_at."""
+        logs = list(self.callbacks.all())
+        for log in logs:
+            log.application = self
+            log.update_response_time()
+        CallbackLog.objects.bulk_update(logs, ['days_to_response', 'response_censored'])
 
     def __str__(self):
         return f"{self.pair.pair_id} → {self.occupation} | {self.job_title} @ {self.employer} ({self.get_status_display()})"
@@ -184,12 +320,196 @@ class CallbackLog(models.Model):
     ]
     callback_medium = models.CharField(max_length=20, choices=CALLBACK_MEDIUM_CHOICES, blank=True)
     callback_notes = models.TextField(blank=True)
-    
+
+    # Response latency, maintained on save (see update_response_time)
+    days_to_response = models.IntegerField(blank=True, null=True, editable=False)
+    response_censored = models.BooleanField(default=True, editable=False, help_text="No response logged yet")
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['profile', 'application']
+
+    def update_response_time(self):
+        """
+        Set days_to_response and response_censored from the callback status and dates.
+
+        Logs without a response are censored; responses are timed from the
+        application's submission date when both dates are known.
+        """
+        submitted_at = self.application.submitted_at if self.application_id else None
+
+        self.response_censored = self.callback_status == 'no_info'
+        if not self.response_censored and self.callback_date and submitted_at:
+            self.days_to_response = max(0, (self.callback_date - timezone.localdate(submitted_at)).days)
+        else:
+            self.days_to_response = None
+
+    def save(self, *args, **kwargs):
+        self.update_response_time()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'days_to_response', 'response_censored'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
-        return f"{self.profile.full_name} - {self.application.employer.display_name} ({self.get_callback_status_display()})"
\ No newline at end of file
+        return f"{self.profile.full_name} - {self.application.employer.display_name} ({self.get_callback_status_display()})"
+
+class CallbackRateSummary(models.Model):
+    """Precomputed callback counts for one value of one breakdown dimension (see audit.analytics)."""
+    dimension = models.CharField(max_length=50)
+    value = models.CharField(max_length=255, blank=True)
+
+    total = models.PositiveIntegerField(default=0)
+    callbacks = models.PositiveIntegerField(default=0)
+    rejections = models.PositiveIntegerField(default=0)
+    pending = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["dimension", "value"]
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "value"], name="unique_callback_summary_cell")
+        ]
+
+    @property
+    def callback_rate(self):
+        return self.callbacks / self.total if self.total else 0.0
+
+    @property
+    def rejection_rate(self):
+        return self.rejections / self.total if self.total else 0.0
+
+    def __str__(self):
+        return f"{self.dimension}={self.value or '-'}: {self.callbacks}/{self.total} callbacks"
+
+
+class GenerationJob(models.Model):
+    """
+    One pair generation request, keyed by the token its form was rendered
+    with, so a repeated submit attaches to the running job (see audit.generation).
+    """
+    STATUS_CHOICES = [
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+    # In the order the pipeline completes them (the two renders may swap)
+    STAGE_CHOICES = [
+        ("randomise", "Randomise pair"),
+        ("render_1", "Render resume 1"),
+        ("render_2", "Render resume 2"),
+        ("save_pdfs", "Save PDFs"),
+        ("db_write", "Write pair to database"),
+    ]
+
+    token = models.UUIDField(unique=True)
+    location = models.CharField(max_length=10)
+    occupation = models.CharField(max_length=100)
+    archetype = models.CharField(max_length=100)  # archetype string, as selected in the form
+    sublocation = models.IntegerField(null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="running")
+    stages_done = models.JSONField(default=list)  # stage keys, in completion order
+    error = models.TextField(blank=True)
+    pair = models.ForeignKey(Pair, on_delete=models.SET_NULL, null=True, blank=True, related_name="generation_jobs")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.token} ({self.status})"
+
+
+class ResumeBlob(models.Model):
+    """One stored object of the content-addressed resume store and the number of profiles using it."""
+    name = models.CharField(max_length=255, unique=True)  # storage name, as held in Profile.resume_pdf
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.PositiveBigIntegerField()         # bytes of the PDF
+    stored_size = models.PositiveBigIntegerField()  # bytes on disk (smaller when compressed)
+    compressed = models.BooleanField(default=False)
+    refcount = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever a save resolves to this object; GC leaves recently stored objects alone
+    last_stored_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=["refcount", "last_stored_at"], name="resumeblob_gc_idx")]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+class AuditRow(models.Model):
+    """
+    Flat, denormalised copy of one CallbackLog with its profile, pair,
+    application and employer fields, maintained by audit.audit_rows.
+    """
+    callback_log = models.OneToOneField(CallbackLog, on_delete=models.CASCADE, related_name="audit_row")
+    application_id = models.BigIntegerField(db_index=True)
+    profile_id = models.BigIntegerField(db_index=True)
+
+    # Pair
+    pair_id = models.CharField(max_length=50, db_index=True)
+    pair_occupation = models.CharField(max_length=120)
+    pair_location = models.CharField(max_length=10, blank=True)
+    pair_archetype = models.IntegerField(blank=True, null=True)
+    pair_sublocation = models.IntegerField(blank=True, null=True)
+    good_fit_occupations = models.TextField(blank=True)
+
+    # Profile (resume attributes are added below from PROFILE_ATTRIBUTE_FIELDS)
+    resume_idx = models.IntegerField(default=1)
+    template_name = models.CharField(max_length=50, blank=True)
+    full_name = models.CharField(max_length=200, blank=True, db_index=True)
+    phone = models.CharField(max_length=20, blank=True, db_index=True)
+    address = models.CharField(max_length=255, blank=True)
+    email = models.CharField(max_length=100, blank=True, db_index=True)
+    expertise = models.TextField(blank=True)
+
+    # Application
+    application_occupation = models.CharField(max_length=120)
+    job_title = models.CharField(max_length=255)
+    job_text = models.TextField()
+    job_location = models.CharField(max_length=255, blank=True)
+    work_mode = models.CharField(max_length=20)
+    job_link = models.URLField(blank=True)
+    job_board = models.CharField(max_length=50, blank=True)
+    job_board_other = models.CharField(max_length=255, blank=True)
+    days_open = models.PositiveIntegerField(default=0)
+    application_status = models.CharField(max_length=20)
+    submitted_at = models.DateTimeField(blank=True, null=True)
+    application_created = models.DateTimeField()
+    application_updated = models.DateTimeField()
+
+    # Employer
+    employer_id = models.BigIntegerField(db_index=True)
+    employer_name = models.CharField(max_length=255, db_index=True)
+    employer_normalized_name = models.CharField(max_length=255)
+    employer_location = models.CharField(max_length=255, blank=True)
+    employer_industry = models.CharField(max_length=255, blank=True)
+    employer_employees = models.PositiveIntegerField(blank=True, null=True)
+    employer_size = models.CharField(max_length=20, blank=True)
+    employer_glassdoor_score = models.DecimalField(max_digits=2, decimal_places=1, blank=True, null=True)
+    employer_diversity_score = models.DecimalField(max_digits=2, decimal_places=1, blank=True, null=True)
+    employer_openings = models.PositiveIntegerField(blank=True, null=True)
+    employer_mission = models.TextField(blank=True)
+
+    # Callback
+    callback_status = models.CharField(max_length=20, db_index=True)
+    callback_date = models.DateField(blank=True, null=True)
+    callback_medium = models.CharField(max_length=20, blank=True)
+    callback_notes = models.TextField(blank=True)
+    days_to_response = models.IntegerField(blank=True, null=True)
+    response_censored = models.BooleanField(default=True)
+    callback_created = models.DateTimeField()
+    callback_updated = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.full_name} - {self.employer_name} ({self.callback_status})"
+
+
+for _name in PROFILE_ATTRIBUTE_FIELDS:
+    AuditRow.add_to_class(_name, Profile._meta.get_field(_name).clone())
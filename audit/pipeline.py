@@ -0,0 +1,334 @@
+"""
+The pair generation pipeline.
+
+Every way of generating a pair (the generation form and its jobs, the
+inventory worker, services.generate_and_store_pair) runs generate(),
+which does each step exactly once, in this order:
+
+    randomise   resume_randomization.generate_pair, seeded (see audit.regeneration)
+    render_N    both resumes rendered from that same data, concurrently in one browser
+    save_pdfs   the PDFs written to the resume store
+    db_write    the Pair and both Profiles, in one transaction
+
+so the stored profiles always describe the PDFs stored with them, and a
+failure before the last step leaves no rows behind.
+
+Each profile also keeps the HTML its PDF is printed from. With
+RESUME_LAZY_RENDER on, generation stops there: render_N and save_pdfs
+are skipped and a resume is printed the first time its PDF is
+downloaded, or in the background once a PairApplication is created for
+its pair (ensure_pdfs, prefetch_pdfs). Chromium then only runs for
+resumes that are actually sent. A resume whose eager render failed is
+printed the same way.
+
+The generator's generate_render_and_log_pair_async is not used: it
+randomises again, launches a browser with default signal handling and
+appends to its CSV log. The database holds the same record, and
+export_merged_data writes it out in the log's column layout.
+"""
+
+import asyncio
+import hashlib
+import random
+import secrets
+import threading
+
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import F, Q
+
+from . import services
+from .downloads import pdf_filename
+from .models import Pair, Profile, ResumeBlob, profile_attributes
+
+STAGES = ("randomise", "render_1", "render_2", "save_pdfs", "db_write")
+LAZY_STAGES = ("randomise", "db_write")
+
+NO_PDF = Q(resume_pdf="") | Q(resume_pdf__isnull=True)
+
+# The generator draws from the process-wide random and numpy RNGs
+_rng_lock = threading.Lock()
+
+# pyppeteer installs SIGINT/SIGTERM/SIGHUP handlers by default, which only
+# works on the main thread and would replace the ASGI server's own
+LAUNCH_OPTIONS = {
+    'headless': True,
+    'args': ['--no-sandbox'],
+    'handleSIGINT': False,
+    'handleSIGTERM': False,
+    'handleSIGHUP': False,
+}
+
+PDF_OPTIONS = {
+    'printBackground': True,
+    'format': 'Letter',
+    'margin': {'top': '0.75in', 'right': '0.75in', 'bottom': '0.75in', 'left': '0.75in'}
+}
+
+
+def lazy_render():
+    return getattr(settings, "RESUME_LAZY_RENDER", False)
+
+
+def active_stages():
+    """The stages generate() reports in the current render mode."""
+    return LAZY_STAGES if lazy_render() else STAGES
+
+
+def pdf_stem(pair_data, resume_idx):
+    """File name (without extension) of a resume's PDF, as the generator names it."""
+    return f"{pair_data[f'resume{resume_idx}']['full_name'].replace(' ', '_')}_{pair_data['pair_id']}"
+
+
+def resume_html(resume_data):
+    """One generator resume dict rendered through its template."""
+    from resume_randomization import build_template_context, _env
+
+    return _env.get_template(resume_data["template_name"]).render(**build_template_context(resume_data))
+
+
+def html_checksum(html):
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+def seeded_pair(occupation, location, archetype, sublocation, seed):
+    """
+    (pair dict, [HTML of each resume]) from the generator with its RNGs
+    seeded: the same seed gives the same bytes under the same generator version.
+    """
+    with _rng_lock:
+        saved = random.getstate(), np.random.get_state()
+        random.seed(seed)
+        np.random.seed(seed % 2**32)
+        try:
+            pair_data = services.generate_pair(occupation, location, archetype, sublocation)
+            return pair_data, [resume_html(pair_data[f"resume{resume_idx}"]) for resume_idx in (1, 2)]
+        finally:
+            random.setstate(saved[0])
+            np.random.set_state(saved[1])
+
+
+async def print_pdf(browser, html_content, name):
+    """PDF bytes of a rendered resume, printed in a new page of `browser`."""
+    from resume_randomization import TEMPLATE_DIR
+
+    # Rendered from a file beside the templates so their relative assets resolve
+    temp_html = TEMPLATE_DIR / f"temp_{name}.html"
+    await sync_to_async(temp_html.write_text, thread_sensitive=False)(html_content, encoding='utf-8')
+    page = await browser.newPage()
+    try:
+        await page.goto(f"file://{temp_html}", {'waitUntil': 'networkidle0'})
+        return await page.pdf(PDF_OPTIONS)
+    finally:
+        await page.close()
+        temp_html.unlink(missing_ok=True)
+
+
+async def render_pair(pair_data, htmls, report):
+    """[PDF bytes or None] for both resumes; a resume that fails to render is stored without a PDF."""
+    from pyppeteer import launch
+
+    async def render(browser, resume_idx):
+        try:
+            return await print_pdf(browser, htmls[resume_idx - 1], pdf_stem(pair_data, resume_idx))
+        except Exception as e:
+            print(f"Error generating PDF for {pair_data[f'resume{resume_idx}']['full_name']}: {e}")
+            return None
+        finally:
+            await report(f"render_{resume_idx}")
+
+    browser = await launch(LAUNCH_OPTIONS)
+    try:
+        return await asyncio.gather(render(browser, 1), render(browser, 2))
+    finally:
+        await browser.close()
+
+
+def store_pdfs(pair_data, pdfs):
+    """Storage names of the rendered PDFs ("" for a resume without one)."""
+    field = Profile._meta.get_field("resume_pdf")
+    return [
+        field.storage.save(field.generate_filename(None, f"{pdf_stem(pair_data, resume_idx)}.pdf"), ContentFile(pdf))
+        if pdf else ""
+        for resume_idx, pdf in zip((1, 2), pdfs)
+    ]
+
+
+def profile_fields(resume_data):
+    """Profile field values of one generator resume dict."""
+    skills = resume_data["skills"]
+    return {
+        "full_name": resume_data["full_name"],
+        "phone": resume_data["phone"],
+        "address": resume_data["address"],
+        "email": resume_data["email"],
+        "expertise": "; ".join(skills) if isinstance(skills, list) else skills,  # Map skills to expertise
+        "template_name": resume_data["template_name"],
+        **profile_attributes(resume_data),
+    }
+
+
+@transaction.atomic
+def save_pair(pair_data, location, occupation, archetype, sublocation, seed, htmls, pdf_names, inventory=False):
+    """Pair and Profile rows of a generated pair, in one transaction (async code can't hold one)."""
+    pair = Pair.objects.create(
+        pair_id=pair_data["pair_id"],
+        occupation=occupation,
+        good_fit_occupations=", ".join(pair_data["good_fit_occupations"]),
+        location=location,
+        archetype=archetype,
+        sublocation=sublocation,
+        in_inventory=inventory,
+        rng_seed=seed,
+        generator_version=services.GENERATOR_VERSION,
+    )
+    for resume_idx, html, pdf_name in zip((1, 2), htmls, pdf_names):
+        Profile.objects.create(
+            pair=pair,
+            resume_idx=resume_idx,
+            resume_pdf=pdf_name,
+            resume_html=html,
+            html_sha256=html_checksum(html),
+            **profile_fields(pair_data[f"resume{resume_idx}"])
+        )
+    return pair
+
+
+async def generate(location, occupation, archetype, sublocation=None, progress=None, inventory=False):
+    """
+    Randomise, render and store one pair on the caller's event loop; returns the Pair.
+
+    Args:
+        location (str): Location code (e.g., "GA", "NY")
+        occupation (str): Occupation type ("communications", "payroll", "project_manager")
+        archetype (int): Archetype number (1-4)
+        sublocation (int, optional): Sublocation index (1-based)
+        progress (async callable, optional): awaited with each completed stage (see active_stages)
+        inventory (bool): store the pair as pre-generated stock (see audit.inventory)
+    """
+    if not services.RESUME_GENERATION_AVAILABLE:
+        raise Exception("Resume generation not available - could not import resume_randomization")
+
+    async def report(stage):
+        if progress is not None:
+            await progress(stage)
+
+    # CPU-bound sampling, kept off the event loop; 63 bits fit a signed BIGINT
+    seed = secrets.randbits(63)
+    pair_data, htmls = await sync_to_async(seeded_pair, thread_sensitive=False)(
+        occupation, location, archetype, sublocation, seed
+    )
+    await report("randomise")
+
+    if lazy_render():
+        pdf_names = ["", ""]
+    else:
+        pdfs = await render_pair(pair_data, htmls, report)
+        # Storage writes are blocking file I/O. An object whose rows then fail
+        # to save is unreferenced and left to gc_resume_blobs
+        pdf_names = await sync_to_async(store_pdfs)(pair_data, pdfs)
+        await report("save_pdfs")
+
+    pair = await sync_to_async(save_pair)(
+        pair_data, location, occupation, archetype, sublocation, seed, htmls, pdf_names, inventory
+    )
+    await report("db_write")
+    return pair
+
+
+def missing_pdf(queryset=Profile.objects):
+    """Profiles without a stored PDF that can print one: from their HTML, or HTML regenerated from the seed."""
+    return queryset.filter(NO_PDF).filter(~Q(resume_html="") | Q(pair__rng_seed__isnull=False))
+
+
+def cache_pdf(profile, pdf):
+    """Store a lazily printed PDF as the profile's, unless a concurrent print got there first."""
+    field = Profile._meta.get_field("resume_pdf")
+    name = field.storage.save(field.generate_filename(None, pdf_filename(profile)), ContentFile(pdf))
+    with transaction.atomic():
+        # update() rather than save(): only the file changed, no audit rows need refreshing
+        if Profile.objects.filter(NO_PDF, pk=profile.pk).update(resume_pdf=name):
+            ResumeBlob.objects.filter(name=name).update(refcount=F("refcount") + 1)
+    # The loser's object is unreferenced and left to gc_resume_blobs
+    profile.refresh_from_db(fields=["resume_pdf"])
+    # What the refcount signals compare with on the next save (see signals.profile_loaded):
+    # the reference taken above must not be counted again
+    profile._stored_resume_pdf = profile.resume_pdf.name or ""
+
+
+async def print_profiles(profiles):
+    """Print and store the PDFs of `profiles` (each with its pair loaded), concurrently in one browser."""
+    from pyppeteer import launch
+
+    async def render(browser, profile):
+        try:
+            pdf = await print_pdf(browser, profile.resume_html, f"{profile.full_name.replace(' ', '_')}_{profile.pk}")
+        except Exception as e:
+            print(f"Error generating PDF for {profile.full_name}: {e}")
+            return
+        await sync_to_async(cache_pdf)(profile, pdf)
+
+    browser = await launch(LAUNCH_OPTIONS)
+    try:
+        await asyncio.gather(*(render(browser, profile) for profile in profiles))
+    finally:
+        await browser.close()
+
+
+def ensure_pdfs(profiles):
+    """
+    Print the PDFs `profiles` (each with its pair loaded) are still missing,
+    from their stored HTML or HTML regenerated from the pair's seed, so each
+    has one afterwards unless that failed. Blocks while printing.
+    """
+    missing = [profile for profile in profiles
+               if not profile.resume_pdf and (profile.resume_html or profile.pair.rng_seed is not None)]
+    if not missing or not services.RESUME_GENERATION_AVAILABLE:
+        return
+    from .regeneration import restore_html
+    restore_html([profile for profile in missing if not profile.resume_html])
+    missing = [profile for profile in missing if profile.resume_html]
+    if missing:
+        async_to_sync(print_profiles)(missing)
+
+
+def prefetch_pdfs(pair_id):
+    """Print the pair's missing PDFs in a background thread, ready for when its resumes are sent."""
+    if not services.RESUME_GENERATION_AVAILABLE or not missing_pdf(Profile.objects.filter(pair_id=pair_id)).exists():
+        return
+    threading.Thread(target=_prefetch, args=(pair_id,), daemon=True).start()
+
+
+def _prefetch(pair_id):
+    try:
+        ensure_pdfs(list(missing_pdf(Profile.objects.filter(pair_id=pair_id)).select_related("pair")))
+    finally:
+        connection.close()
+
+
+def pair_display(pair, archetype_string):
+    """The generation page's result panel for a stored pair."""
+    result = {
+        'pair_id': pair.pair_id,
+        'pair_db_id': pair.pk,
+        'occupation': pair.occupation,
+        'location': pair.location,
+        'archetype': services.get_archetype_display_name(pair.occupation, archetype_string),
+        'good_fit_occupations': pair.good_fit_occupations,
+        # Descriptive sublocation name; the template shows "Not specified" for None
+        'sublocation': next((name for num, name in services.HARDCODED_SUBLOCATIONS.get(pair.location, [])
+                             if num == pair.sublocation), f"Sublocation {pair.sublocation}")
+        if pair.sublocation else None,
+    }
+    for profile in pair.profiles.order_by('resume_idx'):
+        result[f'resume{profile.resume_idx}'] = {
+            'full_name': profile.full_name,
+            'email': profile.email,
+            'phone': profile.phone,
+            'address': profile.address,
+            'skills': profile.expertise,
+        }
+    return result
@@ -0,0 +1,29 @@
+# profile_views.py
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from .models import PairApplication
+from .profiling import list_profiles, profile_file
+
+PROFILE_DOWNLOADS = {'prof': '.prof', 'collapsed': '.collapsed'}
+
+
+@staff_member_required
+def request_profiles(request):
+    """Recent request profiles (see audit.profiling) with their top functions."""
+    return render(request, 'admin/audit/request_profiles.html', {
+        **admin.site.each_context(request),
+        'profiles': list_profiles(),
+        'title': 'Request Profiles',
+        'opts': PairApplication._meta,
+    })
+
+
+@staff_member_required
+def request_profile_download(request, profile_id, kind):
+    """Download the cProfile stats or the collapsed stacks of one profile."""
+    path = profile_file(profile_id, PROFILE_DOWNLOADS.get(kind, ''))
+    if path is None:
+        raise Http404('No such profile')
+    return FileResponse(path.open('rb'), as_attachment=True, filename=path.name)
@@ -0,0 +1,152 @@
+"""
+On-demand request profiling.
+
+ProfilingMiddleware (audit.middleware) profiles a staff request when it
+carries ?_profile=1 or an "X-Profile: 1" header, or at random at
+PROFILE_SAMPLE_RATE. Each profiled request leaves three files:
+
+    <id>.prof        cProfile stats, for pstats/snakeviz
+    <id>.collapsed   stacks sampled every PROFILE_SAMPLE_INTERVAL seconds in
+                     "frame;frame;frame count" form, for flamegraph tools
+    <id>.json        request metadata and the top functions, listed on the
+                     admin "Request Profiles" page
+
+Only the newest PROFILE_KEEP profiles are kept.
+
+Settings (all optional):
+    PROFILE_DIR              where profiles are written (default BASE_DIR/perf/profiles)
+    PROFILE_SAMPLE_RATE      fraction of staff requests profiled unasked (default 0.0)
+    PROFILE_SAMPLE_INTERVAL  stack sampling interval in seconds (default 0.005)
+    PROFILE_KEEP             profiles kept on disk (default 50)
+"""
+
+import cProfile
+import io
+import json
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+PROFILE_SUFFIXES = (".json", ".prof", ".collapsed")
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+TOP_FUNCTIONS = 15
+
+
+def profile_dir():
+    return Path(getattr(settings, "PROFILE_DIR", Path(settings.BASE_DIR) / "perf" / "profiles"))
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval and counts the collapsed stacks."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """cProfile plus a stack sampler around one request, in the calling thread."""
+
+    def __init__(self, interval):
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), interval)
+
+    def __enter__(self):
+        self.sampler.start()
+        self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.disable()
+        self.sampler.stop()
+
+    def top_functions(self, limit=TOP_FUNCTIONS):
+        """The `limit` functions with the highest cumulative time, as dicts."""
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = []
+        for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                "function": f"{name} ({Path(filename).name}:{line})" if line else name,
+                "calls": ncalls,
+                "tottime_ms": round(tottime * 1000, 2),
+                "cumtime_ms": round(cumtime * 1000, 2),
+            })
+        rows.sort(key=lambda row: row["cumtime_ms"], reverse=True)
+        return rows[:limit]
+
+    def save(self, metadata, directory=None, keep=None):
+        """Write the .prof, .collapsed and .json files, prune old profiles and return the profile id."""
+        directory = directory or profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+        self.profile.dump_stats(directory / f"{profile_id}.prof")
+        (directory / f"{profile_id}.collapsed").write_text(self.sampler.collapsed())
+        metadata = {
+            **metadata,
+            "id": profile_id,
+            "created": timezone.now().isoformat(),
+            "samples": sum(self.sampler.stacks.values()),
+            "top_functions": self.top_functions(),
+        }
+        # The .json goes last: list_profiles only shows complete profiles
+        (directory / f"{profile_id}.json").write_text(json.dumps(metadata, indent=2))
+
+        prune_profiles(directory, keep if keep is not None else getattr(settings, "PROFILE_KEEP", 50))
+        return profile_id
+
+
+def list_profiles(directory=None):
+    """Metadata of the stored profiles, newest first."""
+    directory = directory or profile_dir()
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue  # pruned or half-written meanwhile
+    return profiles
+
+
+def prune_profiles(directory, keep):
+    """Delete all but the newest `keep` profiles (ids sort by creation time)."""
+    for path in sorted(directory.glob("*.json"), reverse=True)[keep:]:
+        for suffix in PROFILE_SUFFIXES:
+            path.with_suffix(suffix).unlink(missing_ok=True)
+
+
+def profile_file(profile_id, suffix, directory=None):
+    """Path of one stored profile file, or None for unknown ids/suffixes (ids come from URLs)."""
+    if not PROFILE_ID.match(profile_id) or suffix not in PROFILE_SUFFIXES:
+        return None
+    path = (directory or profile_dir()) / f"{profile_id}{suffix}"
+    return path if path.exists() else None
@@ -0,0 +1,118 @@
+"""
+Regenerating pairs from their seed.
+
+generate() (audit.pipeline) draws a fresh Pair.rng_seed for every pair,
+seeds the generator's random and numpy RNGs with it, and records
+Pair.generator_version and the SHA-256 of each resume's HTML. The version
+hashes the generator's source, templates and data files
+(services._generator_version). Under the same version the seed
+reproduces the pair byte for byte, so
+its stored artefacts can be dropped and recreated when needed:
+
+    regenerate(pair)     the generator's pair dict and resume HTML, again
+    verify_pair(pair)    what differs between the regenerated and the stored pair
+    evict(pair)          drop the stored PDFs (and HTML) of a verified pair
+    restore_html(...)    HTML of evicted profiles, checked against its checksum
+
+A dropped PDF is printed again from the restored HTML on its next
+download (pipeline.ensure_pdfs). PDFs themselves are not compared:
+Chromium stamps every print with its creation time, so the HTML is the
+byte-exact record. `manage.py regenerate_pairs` runs all of this in bulk.
+"""
+
+from django.db import transaction
+from django.db.models import F
+
+from . import services
+from .models import Profile, ResumeBlob
+from .pipeline import html_checksum, profile_fields, seeded_pair
+
+
+class RegenerationError(Exception):
+    pass
+
+
+def regenerate(pair):
+    """(pair dict, [HTML of each resume]) regenerated from the pair's seed."""
+    if pair.rng_seed is None:
+        raise RegenerationError(f"{pair.pair_id} was generated without a seed")
+    if not services.RESUME_GENERATION_AVAILABLE:
+        raise RegenerationError("Resume generation not available - could not import resume_randomization")
+    if pair.generator_version != services.GENERATOR_VERSION:
+        raise RegenerationError(
+            f"{pair.pair_id} was generated by generator {pair.generator_version}, "
+            f"this is {services.GENERATOR_VERSION}"
+        )
+    return seeded_pair(pair.occupation, pair.location, pair.archetype, pair.sublocation, pair.rng_seed)
+
+
+def verify_pair(pair, regenerated=None):
+    """Names of the stored values the regenerated pair disagrees with ([] when it reproduces exactly)."""
+    pair_data, htmls = regenerated or regenerate(pair)
+    differences = []
+    if pair_data["pair_id"] != pair.pair_id:
+        differences.append("pair_id")
+    if ", ".join(pair_data["good_fit_occupations"]) != pair.good_fit_occupations:
+        differences.append("good_fit_occupations")
+    for profile in pair.profiles.order_by("resume_idx"):
+        key = f"resume{profile.resume_idx}"
+        differences += [f"{key}.{name}" for name, value in profile_fields(pair_data[key]).items()
+                        if getattr(profile, name) != value]
+        if html_checksum(htmls[profile.resume_idx - 1]) != profile.html_sha256:
+            differences.append(f"{key}.html")
+    return differences
+
+
+@transaction.atomic
+def evict(pair, html=False):
+    """
+    Drop the pair's stored PDFs, and its HTML too if `html`; call only
+    once verify_pair() has come back clean. Returns the PDFs dropped.
+
+    HTML is only dropped while the generator version covers every input
+    (services.GENERATOR_INPUTS_VERSIONED): otherwise an edited template or
+    data file could change the regenerated HTML without changing the version.
+    """
+    if html and not services.GENERATOR_INPUTS_VERSIONED:
+        raise RegenerationError(
+            "Refusing to evict HTML: the generator version does not cover its templates and data files "
+            "(set RESUME_GENERATOR_DATA_DIRS)"
+        )
+    dropped = 0
+    for profile in pair.profiles.select_for_update().only("pk", "resume_pdf"):
+        name = profile.resume_pdf.name if profile.resume_pdf else ""
+        fields = {"resume_pdf": ""}
+        if html:
+            fields["resume_html"] = ""
+        # update() rather than save(): no audit rows need refreshing; the
+        # objects nothing refers to any more are left to gc_resume_blobs
+        Profile.objects.filter(pk=profile.pk).update(**fields)
+        if name:
+            ResumeBlob.objects.filter(name=name).update(refcount=F("refcount") - 1)
+            dropped += 1
+    return dropped
+
+
+def restore_html(profiles):
+    """
+    Fill in resume_html (in memory) for profiles whose HTML was evicted,
+    from their pair's seed (each profile with its pair loaded). Profiles
+    that can't be restored, or whose regenerated HTML fails its checksum,
+    are left empty.
+    """
+    by_pair = {}
+    for profile in profiles:
+        by_pair.setdefault(profile.pair_id, []).append(profile)
+    for pair_profiles in by_pair.values():
+        try:
+            _, htmls = regenerate(pair_profiles[0].pair)
+        except Exception as e:
+            print(f"Could not regenerate {pair_profiles[0].pair.pair_id}: {e}")
+            continue
+        for profile in pair_profiles:
+            html = htmls[profile.resume_idx - 1]
+            if html_checksum(html) == profile.html_sha256:
+                profile.resume_html = html
+            else:
+                print(f"Regenerated HTML of {profile.full_name} ({profile.pair.pair_id}) does not match its checksum")
+
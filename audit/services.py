@@ -7,11 +7,11 @@ and store them in Django models with PDF files.
 
 import sys
 import os
+import hashlib
 import asyncio
 from pathlib import Path
-from django.core.files.base import ContentFile
+from asgiref.sync import async_to_sync
 from django.core.files.storage import default_storage
-from .models import Pair, Profile
 
 # Add the resume_randomization module to the path
 RESUME_RANDOMIZATION_PATH = Path(__file__).parent.parent.parent / "experiment-design" / "cv-generator" / "code"
@@ -25,6 +25,66 @@ except ImportError as e:
     RESUME_GENERATION_AVAILABLE = False
 
 
+def _input_files(directory, skip_prefix=None):
+    """Files under `directory` in a stable order, without caches, hidden files or names starting with `skip_prefix`."""
+    for path in sorted(Path(directory).rglob("*")):
+        relative = path.relative_to(directory)
+        if not path.is_file() or any(part.startswith(".") or part == "__pycache__" for part in relative.parts):
+            continue
+        if skip_prefix and path.name.startswith(skip_prefix):
+            continue
+        yield path
+
+
+def _generator_data_dirs(module):
+    """Directories of the data files _load_data_once reads: RESUME_GENERATOR_DATA_DIRS, else the module's DATA_DIR."""
+    from django.conf import settings
+
+    dirs = getattr(settings, "RESUME_GENERATOR_DATA_DIRS", None)
+    if dirs is None:
+        data_dir = getattr(module, "DATA_DIR", None)
+        dirs = [data_dir] if data_dir else []
+    return [Path(directory) for directory in dirs]
+
+
+def _generator_version(module=None):
+    """
+    (version, complete) of resume_randomization as recorded with each pair.
+
+    The version is its __version__ (or "src") followed by a hash of
+    everything a seeded pair depends on: the module source, its Jinja
+    templates (TEMPLATE_DIR) and the data files _load_data_once reads
+    (see _generator_data_dirs), so editing any of them changes it. A seed
+    only reproduces a pair under the same version. `complete` is False
+    when the templates or data files could not be found and hashed; the
+    HTML of such pairs must not be evicted (see regeneration.evict).
+    """
+    if module is None:
+        import resume_randomization as module
+    digest = hashlib.sha256(Path(module.__file__).read_bytes())
+    complete = True
+    template_dir = getattr(module, "TEMPLATE_DIR", None)
+    data_dirs = _generator_data_dirs(module)
+    if not template_dir or not data_dirs:
+        complete = False
+    # print_pdf writes temp_*.html beside the templates while rendering
+    inputs = [(template_dir, "temp_")] if template_dir else []
+    for directory, skip_prefix in inputs + [(directory, None) for directory in data_dirs]:
+        if not Path(directory).is_dir():
+            complete = False
+            continue
+        for path in _input_files(directory, skip_prefix):
+            digest.update(str(path.relative_to(directory)).encode("utf-8") + b"\0")
+            digest.update(path.read_bytes())
+    declared = getattr(module, "__version__", None) or "src"
+    return f"{declared}-{digest.hexdigest()[:12]}", complete
+
+
+GENERATOR_VERSION, GENERATOR_INPUTS_VERSIONED = (
+    _generator_version() if RESUME_GENERATION_AVAILABLE else ("", False)
+)
+
+
 def get_available_locations():
     """Get list of available locations - hardcoded valid identifiers."""
     # Hardcoded list of valid location identifiers that work with generate_render_and_log_pair
@@ -122,12 +182,33 @@ def get_available_occupations():
     ]
 
 
+def get_reference_data():
+    """
+    All dropdown reference data in one payload, keyed for client-side lookups.
 
+    Only changes with a deploy, so it is served from a single cached endpoint.
+    """
+    return {
+        'locations': [{'value': code, 'label': code} for code in get_available_locations()],
+        'sublocations': {
+            location: [{'value': str(idx), 'label': name} for idx, name in sublocations]
+            for location, sublocations in HARDCODED_SUBLOCATIONS.items()
+        },
+        'occupations': [{'value': value, 'label': label} for value, label in get_available_occupations()],
+        'archetypes': {
+            occupation: [{'value': value, 'label': label} for value, label in archetypes]
+            for occupation, archetypes in ARCHETYPE_MAPPINGS.items()
+        },
+    }
 
-async def generate_and_store_pair_async(location, occupation, archetype, sublocation=None):
+
+
+async def generate_and_store_pair_async(location, occupation, archetype, sublocation=None, progress=None, inventory=False):
     """
     Generate a resume pair and store it in Django models with PDF files.
 
+    Runs the shared pipeline (audit.pipeline.generate) on the caller's event loop.
+
     Args:
         location (str): Location code (e.g., "GA", "NY")
         occupation (str): Occupation type ("communications", "payroll", "project_manager")
@@ -137,88 +218,12 @@ async def generate_and_store_pair_async(location, occupation, archetype, subloca
     Returns:
         Pair: Created Pair instance with associated Profile records
     """
-    if not RESUME_GENERATION_AVAILABLE:
-        raise Exception("Resume generation not available - could not import resume_randomization")
-
-    # Generate the pair data
-    pair_data = generate_pair(occupation, location, archetype, sublocation)
-
-    # Create Pair record
-    pair = Pair.objects.create(
-        pair_id=pair_data["pair_id"],
-        occupation=occupation,
-        good_fit_occupations=", ".join(pair_data["good_fit_occupations"]),
-        location=location,
-        archetype=archetype,
-        sublocation=sublocation
-    )
-
-    # Generate and store both profiles with PDFs
-    for resume_key, resume_idx in [("resume1", 1), ("resume2", 2)]:
-        resume_data = pair_data[resume_key]
-
-        # Create Profile record
-        profile = Profile.objects.create(
-            pair=pair,
-            full_name=resume_data["full_name"],
-            phone=resume_data["phone"],
-            address=resume_data["address"],
-            email=resume_data["email"],
-            expertise=resume_data["skills"],  # Map skills to expertise
-            template_name=resume_data["template_name"],
-            resume_idx=resume_idx
-        )
-
-        # Generate PDF using enhanced resume_randomization
-        try:
-            # Build template context
-            from resume_randomization import build_template_context, _env, TEMPLATE_DIR
-            from pyppeteer import launch
-
-            ctx = build_template_context(resume_data)
-            template = _env.get_template(resume_data["template_name"])
-            html_content = template.render(**ctx)
-
-            # Generate PDF using Pyppeteer
-            browser = await launch(headless=True, args=['--no-sandbox'])
-            page = await browser.newPage()
-
-            # Create temp HTML file
-            temp_html = TEMPLATE_DIR / f"temp_{profile.full_name.replace(' ', '_')}_{pair.pair_id}.html"
-            with open(temp_html, 'w', encoding='utf-8') as f:
-                f.write(html_content)
-
-            await page.goto(f"file://{temp_html}", {'waitUntil': 'networkidle0'})
-
-            # Generate PDF content
-            pdf_content = await page.pdf({
-                'printBackground': True,
-                'format': 'Letter',
-                'margin': {'top': '0.75in', 'right': '0.75in', 'bottom': '0.75in', 'left': '0.75in'}
-            })
-
-            # Save PDF to model
-            pdf_filename = f"{profile.full_name.replace(' ', '_')}_{pair.pair_id}.pdf"
-            profile.resume_pdf.save(
-                pdf_filename,
-                ContentFile(pdf_content),
-                save=True
-            )
-
-            # Cleanup
-            temp_html.unlink()
-            await page.close()
-            await browser.close()
-
-        except Exception as e:
-            print(f"Error generating PDF for {profile.full_name}: {e}")
-            # Continue without PDF if generation fails
-
-    return pair
+    from .pipeline import generate
+    return await generate(location, occupation, archetype, sublocation, progress=progress, inventory=inventory)
 
 
 def generate_and_store_pair(location, occupation, archetype, sublocation=None):
     """
     Synchronous wrapper for generate_and_store_pair_async.
     """
-    return asyncio.run(generate_and_store_pair_async(location, occupation, archetype, sublocation))
\ No newline at end of file
+    return async_to_sync(generate_and_store_pair_async)(location, occupation, archetype, sublocation)
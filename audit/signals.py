@@ -0,0 +1,80 @@
+"""
+Signal handlers keeping derived audit data in step with the models.
+
+Connected in AuditConfig.ready().
+"""
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .analytics import summary_deltas
+from .audit_rows import schedule_refresh, schedule_summary_deltas
+from .models import AuditRow, CallbackLog, Employer, Pair, PairApplication, Profile, ResumeBlob
+
+
+@receiver(post_save, sender=CallbackLog)
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=Pair)
+@receiver(post_save, sender=PairApplication)
+@receiver(post_save, sender=Employer)
+def audit_source_saved(sender, instance, **kwargs):
+    """Refresh the audit rows (and their dashboard cells) built from this instance once the save commits."""
+    schedule_refresh(sender, instance.pk)
+
+
+@receiver(post_save, sender=PairApplication)
+def application_created(sender, instance, created, **kwargs):
+    """Print a lazily generated pair's PDFs in the background, ahead of its resumes being sent."""
+    if created:
+        from .pipeline import prefetch_pdfs
+        transaction.on_commit(lambda: prefetch_pdfs(instance.pair_id))
+
+
+@receiver(post_delete, sender=AuditRow)
+def audit_row_deleted(sender, instance, **kwargs):
+    """Take a deleted row (cascaded from its CallbackLog) out of the dashboard cells it counted towards."""
+    schedule_summary_deltas(summary_deltas(removed=[instance]))
+
+
+_DEFERRED = object()
+
+
+def _resume_pdf_name(instance):
+    """Stored PDF name of a profile ("" for none), or _DEFERRED when the field wasn't loaded."""
+    # The raw string until the descriptor first wraps it in a FieldFile; reading
+    # __dict__ avoids building a FieldFile for every profile loaded
+    value = instance.__dict__.get("resume_pdf", _DEFERRED)
+    if value is _DEFERRED:
+        return value
+    return getattr(value, "name", value) or ""
+
+
+def _adjust_refcount(name, delta):
+    if name and name is not _DEFERRED:
+        ResumeBlob.objects.filter(name=name).update(refcount=F("refcount") + delta)
+
+
+@receiver(post_init, sender=Profile)
+def profile_loaded(sender, instance, **kwargs):
+    """Remember the stored PDF name, so a save can tell whether the reference moved."""
+    instance._stored_resume_pdf = _resume_pdf_name(instance)
+
+
+@receiver(post_save, sender=Profile)
+def profile_resume_saved(sender, instance, created, **kwargs):
+    """Move a reference from the previous resume object to the new one (gc_resume_blobs --recount repairs drift)."""
+    old = "" if created else instance._stored_resume_pdf
+    new = _resume_pdf_name(instance)
+    if old is _DEFERRED or new is _DEFERRED:
+        return
+    if new != old:
+        _adjust_refcount(new, 1)
+        _adjust_refcount(old, -1)
+    instance._stored_resume_pdf = new
+
+
+@receiver(post_delete, sender=Profile)
+def profile_resume_deleted(sender, instance, **kwargs):
+    _adjust_refcount(_resume_pdf_name(instance), -1)
@@ -4,33 +4,39 @@
         
         console.log("PairApplication.js loaded!");
 
+        // Reference data (sublocations per location, ...) is fetched once per
+        // page from a cached endpoint and dropdowns are resolved locally
+        var referenceData = null;
+        function withReferenceData(callback) {
+            if (referenceData) {
+                callback(referenceData);
+                return;
+            }
+            $.getJSON('/audit/ajax/reference/')
+                .done(function(data) {
+                    referenceData = data;
+                    callback(data);
+                })
+                .fail(function(xhr, status, error) {
+                    console.error('Error loading reference data:', error);
+                });
+        }
+
         // Dynamic sublocation loading
         function loadSublocations() {
             var locationValue = $("#id_location").val();
             var sublocationField = $("#id_sublocation");
 
+            sublocationField.empty().append('<option value="">Select sublocation (optional)</option>');
             if (!locationValue) {
-                // Clear sublocation options if no location selected
-                sublocationField.empty().append('<option value="">Select sublocation (optional)</option>');
                 return;
             }
 
-            // Make AJAX request to get sublocations
-            $.get('/audit/ajax/sublocations/', {location: locationValue})
-                .done(function(data) {
-                    sublocationField.empty().append('<option value="">Select sublocation (optional)</option>');
-
-                    if (data.sublocations && data.sublocations.length > 0) {
-                        $.each(data.sublocations, function(index, sublocation) {
-                            sublocationField.append(
-                                '<option value="' + sublocation.value + '">' + sublocation.label + '</option>'
-                            );
-                        });
-                    }
-                })
-                .fail(function(xhr, status, error) {
-                    console.error('Error loading sublocations:', error);
+            withReferenceData(function(data) {
+                $.each(data.sublocations[locationValue] || [], function(index, sublocation) {
+                    sublocationField.append($('<option>').val(sublocation.value).text(sublocation.label));
                 });
+            });
         }
 
         // Bind location change event
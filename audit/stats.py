@@ -0,0 +1,243 @@
+"""
+Paired-audit statistics over the logged callbacks.
+
+Both profiles of a Pair are sent to the same PairApplication, so the unit of
+analysis is the application: one row with the outcome of the treated resume
+(current employer an SMO) and of the control resume (a for-profit employer)
+side by side. resume_idx says nothing about which is which: the generator
+assigns the treatment to either slot. Everything below works on those two
+0/1 arrays with NumPy; bootstrap replicates are spread over a process pool.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+OUTCOMES = {
+    "callback": ("callback",),
+    "response": ("callback", "rejection"),
+}
+
+STRATA = ["occupation", "location"]
+
+# The treatment is the resume's current employer type (Profile.current_employer_type)
+TREATMENT_FIELD = "current_employer_type"
+TREATED = "SMO"
+CONTROL = "For Profit"
+
+# Bootstrap index matrices are built in blocks of at most this many cells
+_BOOTSTRAP_BLOCK_CELLS = 2_000_000
+
+
+def treatment_arm(employer_type):
+    """The paired-design column for a resume's employer type: "treated", "control" or None."""
+    return {TREATED: "treated", CONTROL: "control"}.get(employer_type)
+
+
+def pair_by_treatment(df):
+    """
+    Keep the rows (application_id, resume_idx, employer_type, ...) of
+    applications with one treated and one control resume, each with its "arm".
+
+    Applications without a row for both resumes are left out silently.
+
+    Returns:
+        (DataFrame, int): the kept rows, and the number of applications with
+        both rows left out for not having exactly one treated resume
+    """
+    df = df[df.groupby("application_id")["resume_idx"].transform("nunique") == 2].copy()
+    if df.empty:
+        return df.assign(arm=pd.Series(dtype=object)), 0
+    df["arm"] = df["employer_type"].map(treatment_arm)
+    arms = pd.crosstab(df["application_id"], df["arm"]).reindex(columns=["treated", "control"], fill_value=0)
+    arms = arms.reindex(df["application_id"].unique(), fill_value=0)
+    balanced = arms.index[(arms["treated"] == 1) & (arms["control"] == 1)]
+    return df[df["application_id"].isin(balanced)], len(arms) - len(balanced)
+
+
+def load_paired_outcomes(outcome="callback", queryset=None):
+    """
+    Pivot audit rows (one per callback log) to one row per application,
+    oriented by treatment.
+
+    Applications without both logs are left out. So are applications whose
+    resumes are not one SMO and one for-profit resume (both or neither
+    treated): they say nothing about the treatment effect.
+
+    Returns:
+        (DataFrame, int): application_id, occupation, location, y_treated,
+        y_control (0/1 outcome of the SMO and the for-profit resume), and the
+        number of applications left out for not having exactly one treated resume.
+    """
+    if outcome not in OUTCOMES:
+        raise ValueError(f"Unknown outcome '{outcome}', expected one of {sorted(OUTCOMES)}")
+    if queryset is None:
+        # Imported here: spawned pool workers import this module without Django set up
+        from .models import AuditRow
+
+        queryset = AuditRow.objects.all()
+
+    columns = ["application_id", "occupation", "location", "y_treated", "y_control"]
+    rows = queryset.values_list(
+        "application_id",
+        "pair_occupation",
+        "pair_location",
+        "resume_idx",
+        TREATMENT_FIELD,
+        "callback_status",
+    )
+    df = pd.DataFrame.from_records(
+        rows, columns=["application_id", "occupation", "location", "resume_idx", "employer_type", "callback_status"]
+    )
+    df, dropped = pair_by_treatment(df)
+    if df.empty:
+        return pd.DataFrame(columns=columns), dropped
+
+    df["y"] = df["callback_status"].isin(OUTCOMES[outcome]).astype(np.int8)
+    wide = df.pivot_table(
+        index=["application_id", "occupation", "location"],
+        columns="arm",
+        values="y",
+        aggfunc="max",
+    )
+    wide = wide.reindex(columns=["treated", "control"]).astype(np.int8)
+    wide.columns = ["y_treated", "y_control"]
+    return wide.reset_index(), dropped
+
+
+def paired_difference(y_treated, y_control):
+    """Callback rates of both arms and their paired difference (treated - control)."""
+    y_treated = np.asarray(y_treated, dtype=np.float64)
+    y_control = np.asarray(y_control, dtype=np.float64)
+    n = y_treated.size
+    if n == 0:
+        return {"n": 0, "rate_treated": math.nan, "rate_control": math.nan, "diff": math.nan}
+    rate_treated = y_treated.mean()
+    rate_control = y_control.mean()
+    return {"n": n, "rate_treated": rate_treated, "rate_control": rate_control, "diff": rate_treated - rate_control}
+
+
+def mcnemar(y1, y2, exact_below=25):
+    """
+    McNemar test on the discordant pairs.
+
+    b counts applications where only the first resume (y1) got the outcome,
+    c where only the second (y2) did. Uses the exact binomial test when b + c < exact_below and
+    the continuity-corrected chi-square otherwise.
+    """
+    y1 = np.asarray(y1, dtype=bool)
+    y2 = np.asarray(y2, dtype=bool)
+    b = int(np.count_nonzero(y1 & ~y2))
+    c = int(np.count_nonzero(~y1 & y2))
+    n = b + c
+
+    if n == 0:
+        return {"b": b, "c": c, "statistic": 0.0, "p_value": 1.0, "method": "none"}
+
+    if n < exact_below:
+        k = min(b, c)
+        tail = sum(math.comb(n, i) for i in range(k + 1)) / 2 ** n
+        return {"b": b, "c": c, "statistic": float(k), "p_value": min(1.0, 2 * tail), "method": "exact"}
+
+    statistic = (abs(b - c) - 1) ** 2 / n
+    # Survival function of chi-square with one degree of freedom
+    p_value = math.erfc(math.sqrt(statistic / 2))
+    return {"b": b, "c": c, "statistic": statistic, "p_value": p_value, "method": "chi2"}
+
+
+def _bootstrap_means(values, replicates, seed_sequence):
+    """Means of `replicates` resamples of `values`, built block by block."""
+    rng = np.random.default_rng(seed_sequence)
+    n = values.size
+    block = max(1, _BOOTSTRAP_BLOCK_CELLS // n)
+    means = np.empty(replicates, dtype=np.float64)
+    for start in range(0, replicates, block):
+        stop = min(start + block, replicates)
+        idx = rng.integers(0, n, size=(stop - start, n))
+        means[start:stop] = values[idx].mean(axis=1)
+    return means
+
+
+def bootstrap_ci(values, replicates=10_000, alpha=0.05, seed=None, workers=None, pool=None):
+    """
+    Percentile bootstrap confidence interval for the mean of `values`.
+
+    Replicates are split across `workers` processes (default: CPU count),
+    each with an independent child of one SeedSequence so results only
+    depend on `seed` (an int or a SeedSequence) and `workers`. workers=1 runs in-process; pass `pool`
+    to reuse an existing ProcessPoolExecutor across calls.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.size == 0:
+        return (math.nan, math.nan)
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, replicates))
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    children = seed.spawn(workers)
+    shares = [len(chunk) for chunk in np.array_split(np.arange(replicates), workers)]
+
+    if workers == 1:
+        means = _bootstrap_means(values, replicates, children[0])
+    elif pool is not None:
+        means = np.concatenate(list(pool.map(_bootstrap_means, [values] * workers, shares, children)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as own_pool:
+            means = np.concatenate(list(own_pool.map(_bootstrap_means, [values] * workers, shares, children)))
+
+    low, high = np.quantile(means, [alpha / 2, 1 - alpha / 2])
+    return (float(low), float(high))
+
+
+def paired_summary(df, replicates=10_000, alpha=0.05, seed=None, workers=None, pool=None):
+    """Paired difference, McNemar test and bootstrap CI for one set of applications."""
+    y_treated = df["y_treated"].to_numpy()
+    y_control = df["y_control"].to_numpy()
+    summary = paired_difference(y_treated, y_control)
+    test = mcnemar(y_treated, y_control)
+    low, high = bootstrap_ci(y_treated.astype(np.float64) - y_control, replicates, alpha, seed, workers, pool)
+    summary.update(
+        discordant_treated=test["b"],
+        discordant_control=test["c"],
+        mcnemar_statistic=test["statistic"],
+        p_value=test["p_value"],
+        test=test["method"],
+        ci_low=low,
+        ci_high=high,
+    )
+    return summary
+
+
+def stratified_summary(df, by=STRATA, replicates=10_000, alpha=0.05, seed=None, workers=None):
+    """
+    paired_summary for the whole study plus every level of each stratum in `by`.
+
+    One process pool is shared by all strata. Each group bootstraps from its
+    own child of SeedSequence(seed), so the strata's intervals are
+    independent and still reproducible from `seed`.
+
+    Returns:
+        DataFrame: one row per (stratum, level), the first row being "all".
+    """
+    workers = workers or os.cpu_count() or 1
+    groups = [("all", "", df)]
+    for column in by:
+        groups.extend((column, level, group) for level, group in df.groupby(column, sort=True))
+
+    seeds = np.random.SeedSequence(seed).spawn(len(groups))
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        rows = [
+            {"stratum": stratum, "level": level,
+             **paired_summary(group, replicates, alpha, group_seed, workers, pool)}
+            for (stratum, level, group), group_seed in zip(groups, seeds)
+        ]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return pd.DataFrame(rows)
@@ -0,0 +1,117 @@
+"""
+Content-addressed storage for resume PDFs.
+
+Files are stored once per distinct content, under the SHA-256 of their
+bytes:
+
+    resumes/blobs/ab/cd/abcd1234….pdf      (or ….pdf.gz when compressed)
+
+so re-rendering or retrying a pair that produces the same PDF reuses the
+stored object instead of writing another copy. Each object has a
+ResumeBlob row holding its hash, sizes and reference count; the count is
+kept up to date by the Profile signal handlers in audit.signals, and
+`manage.py gc_resume_blobs` deletes objects nothing refers to any more.
+
+With compress=True (RESUME_STORAGE_COMPRESS) new objects are gzipped on
+disk and transparently decompressed on open. The hash is always of the
+uncompressed bytes, so compressed and plain copies of one PDF dedupe.
+"""
+
+import gzip
+import hashlib
+import os
+import uuid
+from pathlib import PurePosixPath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+from django.utils import timezone
+
+BLOB_PREFIX = "resumes/blobs"
+GZIP_SUFFIX = ".gz"
+
+
+def select_resume_storage():
+    """Storage of Profile.resume_pdf (the "resumes" entry of STORAGES), resolved lazily for migrations."""
+    return storages["resumes"]
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f"{BLOB_PREFIX}/")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def __init__(self, compress=False, **kwargs):
+        super().__init__(**kwargs)
+        self.compress = compress
+
+    def get_available_name(self, name, max_length=None):
+        # The stored name comes from the content hash in _save; the requested
+        # name only contributes its extension, so nothing needs de-duplicating here
+        return name
+
+    def blob_name(self, digest, extension, compressed):
+        name = f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+        return name + GZIP_SUFFIX if compressed else name
+
+    def _save(self, name, content):
+        from .models import ResumeBlob
+
+        digest, size = self._digest(content)
+        blob = ResumeBlob.objects.filter(sha256=digest).first()
+        if blob is not None and self.exists(blob.name):
+            # Already stored: touching last_stored_at keeps GC away while the new reference is saved
+            ResumeBlob.objects.filter(pk=blob.pk).update(last_stored_at=timezone.now())
+            return blob.name
+
+        blob_name = self.blob_name(digest, PurePosixPath(name).suffix.lower(), self.compress)
+        stored_size = self._write(blob_name, content)
+        ResumeBlob.objects.update_or_create(sha256=digest, defaults={
+            "name": blob_name,
+            "size": size,
+            "stored_size": stored_size,
+            "compressed": self.compress,
+            "last_stored_at": timezone.now(),
+        })
+        return blob_name
+
+    def _digest(self, content):
+        sha256 = hashlib.sha256()
+        size = 0
+        for chunk in content.chunks():
+            sha256.update(chunk)
+            size += len(chunk)
+        return sha256.hexdigest(), size
+
+    def _write(self, name, content):
+        """Write to a temporary file beside the target and rename it into place; returns bytes on disk."""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(tmp_path, "wb") as raw:
+                out = gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) if name.endswith(GZIP_SUFFIX) else raw
+                for chunk in content.chunks():
+                    out.write(chunk)
+                if out is not raw:
+                    out.close()
+            # Same name means same bytes, so replacing a concurrent writer's copy is harmless
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return os.path.getsize(path)
+
+    def _open(self, name, mode="rb"):
+        if name.endswith(GZIP_SUFFIX):
+            return File(gzip.open(self.path(name), mode), name)
+        return super()._open(name, mode)
+
+    def size(self, name):
+        """Size of the stored PDF itself (uncompressed), as the rest of the app expects."""
+        if name.endswith(GZIP_SUFFIX):
+            with open(self.path(name), "rb") as f:
+                # gzip trailer: uncompressed length modulo 2**32, plenty for a resume
+                f.seek(-4, os.SEEK_END)
+                return int.from_bytes(f.read(4), "little")
+        return super().size(name)
@@ -0,0 +1,190 @@
+"""
+Time-to-callback survival analysis.
+
+Each CallbackLog is one observation: the number of days from submission to
+the employer's response, or, for logs still at "no_info", a censored
+observation running up to the analysis date. A response logged without a
+callback_date is censored at the date it was logged, the last day it is
+known to have been outstanding or not, and counted as undated.
+
+The two resumes of an application are compared by treatment (the SMO
+resume against the for-profit one, see audit.stats), not by resume_idx.
+They went to the same employer, so the log-rank test is stratified by
+application rather than treating them as independent samples.
+Kaplan-Meier curves and the test are computed with NumPy over the whole
+study in a single pass.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+from django.utils import timezone
+
+from .models import AuditRow
+from .stats import OUTCOMES, TREATMENT_FIELD, pair_by_treatment
+
+ARM_LABELS = {"treated": "SMO", "control": "For profit"}
+
+
+def load_durations(event="callback", as_of=None, queryset=None):
+    """
+    One row per callback log (read from AuditRow) with its duration and event flag.
+
+    For event="callback" a rejection ends follow-up without the event, so it
+    is censored at the rejection date. Only applications with one SMO and
+    one for-profit resume are kept (see stats.pair_by_treatment).
+
+    Returns:
+        (DataFrame, int): application_id, resume_idx, arm, occupation,
+        location, duration, event, undated (a response censored for lack of
+        a callback_date); and the number of applications left out for not
+        having exactly one treated resume
+    """
+    if event not in OUTCOMES:
+        raise ValueError(f"Unknown event '{event}', expected one of {sorted(OUTCOMES)}")
+    if as_of is None:
+        as_of = timezone.localdate()
+    if queryset is None:
+        queryset = AuditRow.objects.all()
+
+    output = ["application_id", "resume_idx", "arm", "occupation", "location", "duration", "event", "undated"]
+    rows = queryset.filter(submitted_at__isnull=False).values_list(
+        "application_id",
+        "resume_idx",
+        TREATMENT_FIELD,
+        "pair_occupation",
+        "pair_location",
+        "callback_status",
+        "days_to_response",
+        "response_censored",
+        "submitted_at",
+        "callback_updated",
+    )
+    columns = [
+        "application_id", "resume_idx", "employer_type", "occupation", "location",
+        "callback_status", "days_to_response", "response_censored", "submitted_at", "callback_updated",
+    ]
+    df, dropped = pair_by_treatment(pd.DataFrame.from_records(rows, columns=columns))
+    if df.empty:
+        return pd.DataFrame(columns=output), dropped
+
+    tz = timezone.get_current_timezone()
+
+    def local_day(column):
+        return pd.to_datetime(df[column], utc=True).dt.tz_convert(tz).dt.tz_localize(None).dt.normalize()
+
+    submitted = local_day("submitted_at")
+    followup = (pd.Timestamp(as_of) - submitted).dt.days.to_numpy()
+    logged = (local_day("callback_updated") - submitted).dt.days.to_numpy()
+    censored = df["response_censored"].to_numpy(dtype=bool)
+    days = df["days_to_response"].to_numpy(dtype=np.float64, na_value=np.nan)
+    # A response without a callback date: censored at the date it was logged
+    undated = ~censored & np.isnan(days)
+
+    df["undated"] = undated
+    df["duration"] = np.where(censored, followup, np.where(undated, logged, days))
+    df["event"] = ~censored & ~undated & df["callback_status"].isin(OUTCOMES[event]).to_numpy()
+    df["duration"] = np.clip(df["duration"].to_numpy(), 0, None).astype(np.int64)
+    return df[output].reset_index(drop=True), dropped
+
+
+def kaplan_meier(durations, events):
+    """
+    Kaplan-Meier estimate.
+
+    Returns:
+        dict of arrays over the distinct event times: time, at_risk, events, survival
+    """
+    durations = np.asarray(durations, dtype=np.int64)
+    events = np.asarray(events, dtype=bool)
+    if durations.size == 0:
+        empty = np.array([], dtype=np.float64)
+        return {"time": empty, "at_risk": empty, "events": empty, "survival": empty}
+
+    times = np.unique(durations[events])
+    sorted_durations = np.sort(durations)
+    # Observations still under follow-up at each time: duration >= t
+    at_risk = sorted_durations.size - np.searchsorted(sorted_durations, times, side="left")
+    deaths = np.bincount(np.searchsorted(times, durations[events]), minlength=times.size)
+    survival = np.cumprod(1.0 - deaths / at_risk)
+    return {"time": times, "at_risk": at_risk, "events": deaths, "survival": survival}
+
+
+def survival_at(curve, days):
+    """Survival probability at each of `days` from a kaplan_meier curve."""
+    days = np.asarray(days)
+    if curve["time"].size == 0:  # no events in the group
+        return np.ones(days.shape)
+    idx = np.searchsorted(curve["time"], days, side="right") - 1
+    return np.where(idx >= 0, curve["survival"][np.clip(idx, 0, None)], 1.0)
+
+
+def logrank(durations, events, treated, strata=None):
+    """
+    Log-rank test and Peto hazard ratio of the treated against the control
+    observations, stratified by `strata` (one stratum when None): observed
+    and expected events and their variance are summed over the strata, each
+    with its own risk sets.
+
+    Returns:
+        dict: observed/expected events of the treated, chi-square statistic,
+        p_value, hazard_ratio and its 95% confidence interval
+    """
+    durations = np.asarray(durations, dtype=np.int64)
+    events = np.asarray(events, dtype=bool)
+    treated = np.asarray(treated, dtype=bool)
+    strata = np.zeros(durations.size, dtype=np.int64) if strata is None else pd.factorize(np.asarray(strata))[0]
+
+    result = {"observed_treated": 0, "expected_treated": 0.0, "statistic": 0.0, "p_value": 1.0,
+              "hazard_ratio": math.nan, "ci_low": math.nan, "ci_high": math.nan}
+    if not events.any():
+        return result
+
+    # One sorted key per (stratum, time), so every stratum's risk sets come from one searchsorted
+    span = int(durations.max()) + 1
+    keys = strata.astype(np.int64) * span + durations
+    event_keys = np.unique(keys[events])
+    stratum_ends = (event_keys // span + 1) * span
+
+    def at_risk(mask):
+        # Observations of the stratum with duration >= t
+        sorted_keys = np.sort(keys[mask])
+        return (np.searchsorted(sorted_keys, stratum_ends, side="left")
+                - np.searchsorted(sorted_keys, event_keys, side="left"))
+
+    def deaths(mask):
+        return np.bincount(np.searchsorted(event_keys, keys[mask & events]), minlength=event_keys.size)
+
+    everyone = np.ones_like(treated)
+    n1, n = at_risk(treated), at_risk(everyone)
+    d1, d = deaths(treated), deaths(everyone)
+
+    expected = (d * n1 / n).sum()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = np.where(n > 1, d * (n1 / n) * (1 - n1 / n) * (n - d) / (n - 1), 0.0).sum()
+
+    observed = int(d1.sum())
+    result.update(observed_treated=observed, expected_treated=float(expected))
+    if variance > 0:
+        statistic = (observed - expected) ** 2 / variance
+        log_hr = (observed - expected) / variance
+        half_width = 1.96 / math.sqrt(variance)
+        result.update(
+            statistic=float(statistic),
+            p_value=math.erfc(math.sqrt(statistic / 2)),
+            hazard_ratio=math.exp(log_hr),
+            ci_low=math.exp(log_hr - half_width),
+            ci_high=math.exp(log_hr + half_width),
+        )
+    return result
+
+
+def compare_profiles(df):
+    """
+    Kaplan-Meier curves of the treated and the control resumes ({"treated": ..., "control": ...})
+    plus the log-rank comparison stratified by application.
+    """
+    curves = {arm: kaplan_meier(group["duration"], group["event"]) for arm, group in df.groupby("arm")}
+    test = logrank(df["duration"], df["event"], df["arm"] == "treated", strata=df["application_id"])
+    return curves, test
@@ -1,3 +1,1364 @@
-from django.test import TestCase
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import random
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+import threading
+import time
+import unittest
+import uuid
+import zipfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .analytics import refresh_callback_summary
+from . import services
+from .audit_rows import refresh_audit_rows
+from .forms import SimplePairGenerationForm
+from .generation import run_job
+from .inventory import Cell, claim_pair, refill_plan
+from .middleware import METRICS, PerfRegistry, PerformanceMiddleware, flush_registry, process_registry
+from .models import (AuditRow, CallbackLog, CallbackRateSummary, Employer, GenerationJob, Pair, PairApplication, Profile,
+                     ResumeBlob, profile_attributes)
+from .pipeline import _prefetch, cache_pdf, generate, seeded_pair
+from .regeneration import RegenerationError, evict, regenerate, verify_pair
+from .storage import ContentAddressedStorage, select_resume_storage
+from .stats import bootstrap_ci, load_paired_outcomes, stratified_summary
+from .survival import compare_profiles, load_durations, logrank
+
+
+def seed_applications(count, start=0):
+    """`count` pairs with two profiles, an employer, an application (half submitted) and both callback logs."""
+    pairs = Pair.objects.bulk_create(
+        Pair(pair_id=f'SEED-{i}', occupation='communications', good_fit_occupations='Writer', location='NY', archetype=1)
+        for i in range(start, start + count)
+    )
+    profiles = Profile.objects.bulk_create(
+        Profile(pair=pair, full_name=f'Seed Person {pair.pair_id}-{idx}', email=f'{pair.pair_id}-{idx}@example.com',
+                resume_idx=idx, race_signal='white' if idx == 1 else 'black')
+        for pair in pairs for idx in (1, 2)
+    )
+    employers = Employer.objects.bulk_create(
+        Employer(display_name=f'Seed Employer {i}', normalized_name=f'seed employer {i}', industry='Nonprofit',
+                 number_employees=100, mission_statement='Mission')
+        for i in range(start, start + count)
+    )
+    now = timezone.now()
+    applications = PairApplication.objects.bulk_create(
+        PairApplication(pair=pair, employer=employer, occupation='Communications', job_title='Writer',
+                        job_text='Text', status='submitted' if n % 2 else 'draft',
+                        submitted_at=now if n % 2 else None)
+        for n, (pair, employer) in enumerate(zip(pairs, employers))
+    )
+    CallbackLog.objects.bulk_create(
+        CallbackLog(application=application, profile=profile, callback_status='callback' if profile.resume_idx == 1 else 'no_info')
+        for application, pair_profiles in zip(applications, zip(profiles[::2], profiles[1::2]))
+        for profile in pair_profiles
+    )
+    # on_commit sync never fires inside TestCase, so build the audit rows directly
+    refresh_audit_rows()
+    return applications
+
+
+def form_data(form):
+    """POST data submitting a form back with the values it was rendered with."""
+    return {field.html_name: field.value() for field in form if field.value() not in (None, False)}
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'SQLite locking behaviour')
+class SQLiteConcurrentWriteTests(TransactionTestCase):
+    """Parallel writers on CallbackLog and PairApplication must not hit "database is locked"."""
+
+    writers = 8
+    saves_per_writer = 10
+
+    def setUp(self):
+        self.application_ids = []
+        for index in range(self.writers):
+            pair = Pair.objects.create(pair_id=f'P{index}', occupation='Nurse', good_fit_occupations='')
+            profiles = [Profile.objects.create(pair=pair, full_name=f'Name {idx}', resume_idx=idx) for idx in (1, 2)]
+            employer = Employer.objects.create(display_name=f'Employer {index}', mission_statement='')
+            application = PairApplication.objects.create(pair=pair, employer=employer, job_title='RN', job_text='')
+            for profile in profiles:
+                CallbackLog.objects.create(application=application, profile=profile)
+            self.application_ids.append(application.pk)
+
+    def test_parallel_writers_do_not_lock(self):
+        errors = []
+        barrier = threading.Barrier(self.writers)
+
+        def writer(application_id):
+            try:
+                barrier.wait()
+                for n in range(self.saves_per_writer):
+                    with transaction.atomic():
+                        application = PairApplication.objects.get(pk=application_id)
+                        application.days_open = n
+                        application.save()
+                        for log in application.callbacks.all():
+                            log.callback_status = 'callback' if n % 2 else 'no_info'
+                            log.save()
+            except OperationalError as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(pk,)) for pk in self.application_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        last = self.saves_per_writer - 1
+        self.assertEqual(PairApplication.objects.filter(days_open=last).count(), self.writers)
+        self.assertEqual(CallbackLog.objects.count(), self.writers * 2)
+
+    def test_connections_use_wal(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0].lower(), 'wal')
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Hot paths run a fixed number of queries whatever the number of rows.
+
+    Each check runs once on the seeded data and again after seeding more
+    rows, with the same budget both times. Budgets include the session and
+    user lookups of the logged-in admin.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.applications = seed_applications(5)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertQueryBudget(self, budget, func):
+        func()  # warm per-process caches (content types, ...)
+        with self.assertNumQueries(budget):
+            func()
+        seed_applications(20, start=100)
+        with self.assertNumQueries(budget):
+            func()
+
+    def get_ok(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_pairapplication_grouped_changelist(self):
+        url = reverse('admin:audit_pairapplication_changelist')
+        self.assertQueryBudget(6, lambda: self.get_ok(url))
+
+    def test_pairapplication_filtered_changelist(self):
+        url = reverse('admin:audit_pairapplication_changelist')
+        self.assertQueryBudget(6, lambda: self.get_ok(url, status='submitted'))
+
+    def test_pairapplication_change_form(self):
+        url = reverse('admin:audit_pairapplication_change', args=[self.applications[0].pk])
+        self.assertQueryBudget(6, lambda: self.get_ok(url))
+
+    def test_pairapplication_change_form_post(self):
+        # Both callback logs change on every save; the budget includes the on-commit audit-row flush
+        url = reverse('admin:audit_pairapplication_change', args=[self.applications[0].pk])
+
+        def post_data(status):
+            response = self.client.get(url)
+            data = form_data(response.context['adminform'].form)
+            for formset in response.context['inline_admin_formsets']:
+                data.update(form_data(formset.formset.management_form))
+                for form in formset.formset.forms:
+                    data.update(form_data(form), **{form.add_prefix('callback_status'): status})
+            return data
+
+        for n, status in enumerate(['rejection', 'callback', 'rejection']):
+            if n == 2:
+                seed_applications(20, start=100)
+            data = post_data(status)
+            with self.assertNumQueries(28) if n else contextlib.nullcontext():
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 302)
+            self.assertEqual(set(self.applications[0].callbacks.values_list('callback_status', flat=True)), {status})
+
+    def test_pair_change_form(self):
+        url = reverse('admin:audit_pair_change', args=[self.applications[0].pair_id])
+        self.assertQueryBudget(4, lambda: self.get_ok(url))
+
+    def test_callback_search(self):
+        url = reverse('admin:audit_callback_search')
+        self.assertQueryBudget(3, lambda: self.get_ok(url, q='Seed Person'))
+
+    def test_check_employer(self):
+        url = reverse('admin:employer-check')
+        self.assertQueryBudget(3, lambda: self.get_ok(url, employer='Seed Employer 1', occupation='communications'))
+
+    def test_export_merged_data(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = Path(tmp) / 'export.csv'
+            self.assertQueryBudget(3, lambda: call_command('export_merged_data', output_path=str(output_path), stdout=StringIO()))
+
+
+class ExportMergedDataTests(TestCase):
+    """export_merged_data writes one row per application and profile of the pair."""
+
+    def export(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = Path(tmp) / 'export.csv'
+            call_command('export_merged_data', output_path=str(output_path), stdout=out)
+            return pd.read_csv(output_path, keep_default_na=False), out.getvalue()
+
+    def test_profiles_without_a_callback_log_keep_their_row(self):
+        application = seed_applications(1)[0]
+        application.callbacks.get(profile__resume_idx=2).delete()
+        export, out = self.export()
+        self.assertEqual(list(export['full_name']), ['Seed Person SEED-0-1', 'Seed Person SEED-0-2'])
+        self.assertEqual(list(export['callback_status']), ['callback', ''])
+        self.assertEqual(list(export['job_title']), ['Writer', 'Writer'])
+        self.assertIn('1 application/profile combinations have no callback log', out)
+
+    def test_backfilled_attributes_are_exported(self):
+        seed_applications(1)
+        path = write_resume_csv(self, [
+            {'pair_id': 'SEED-0', 'full_name': f'Seed Person SEED-0-{idx}', 'race_signal': 'asian',
+             'current_employer_type': 'SMO', 'college_gpa': gpa, 'grad_gap': gap}
+            for idx, gpa, gap in ((1, '3.5', 2), (2, 'n/a', ''))
+        ] + [{'pair_id': 'SEED-9', 'full_name': 'Nobody', 'race_signal': 'white'}])
+        out = StringIO()
+        call_command('backfill_profile_attributes', csv_path=path, stdout=out)
+        self.assertIn('Backfilled attributes on 2 profiles (1 CSV rows without a matching profile)', out.getvalue())
+
+        export, _ = self.export()
+        self.assertEqual(list(export['race_signal']), ['asian', 'asian'])
+        self.assertEqual(list(export['current_employer_type']), ['SMO', 'SMO'])
+        self.assertEqual(list(export['college_gpa']), ['3.50', ''])
+        self.assertEqual(list(export['grad_gap']), ['2.0', ''])
+
+    def test_profile_attributes_coerce_generator_values(self):
+        values = profile_attributes({
+            'race_signal': None, 'current_bullets': ['Led a team', 'Cut costs'],
+            'college_gpa': 'abc', 'college_start': '', 'college_end': '2019', 'unrelated': 'x',
+        })
+        self.assertEqual(values, {
+            'race_signal': '', 'current_bullets': 'Led a team • Cut costs',
+            'college_gpa': None, 'college_start': None, 'college_end': 2019,
+        })
+
+
+class SyntheticBenchmarkTests(TestCase):
+    """seed_synthetic fills every table consistently and benchmark_suite runs against the result."""
+
+    def test_seed_and_benchmark(self):
+        call_command('seed_synthetic', pairs=6, employers=10, applications=20, stdout=StringIO())
+        self.assertEqual(Pair.objects.count(), 6)
+        self.assertEqual(Profile.objects.count(), 12)
+        self.assertEqual(PairApplication.objects.count(), 20)
+        self.assertEqual(CallbackLog.objects.count(), 40)
+        self.assertEqual(AuditRow.objects.count(), 40)
+        self.assertTrue(CallbackRateSummary.objects.exists())
+        self.assertEqual(Profile.objects.values('email').distinct().count(), 12)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = Path(tmp) / 'report.json'
+            call_command('benchmark_suite', repeat=1, output_path=str(output_path), stdout=StringIO())
+            report = json.loads(output_path.read_text())
+
+        self.assertEqual(report['rows']['callbacklog'], 40)
+        self.assertIn('import_resume_data_dry_run', report['benchmarks'])
+        for name, result in report['benchmarks'].items():
+            self.assertEqual(result.get('status', 200), 200, name)
+        self.assertFalse(User.objects.filter(username='benchmark').exists())
+
+    def test_application_count_is_checked_against_the_pairs_drawn(self):
+        # One pair covers one occupation, whatever the CSV lists
+        with self.assertRaisesMessage(CommandError, 'cannot exceed 1 x --employers'):
+            call_command('seed_synthetic', pairs=1, employers=5, applications=6, stdout=StringIO())
+        self.assertFalse(Pair.objects.exists())
+
+
+class CallbackSummaryTests(TestCase):
+    """Dashboard cells follow audit-row changes by delta and always match a full rebuild."""
+
+    def summary(self):
+        return list(CallbackRateSummary.objects.order_by('dimension', 'value')
+                    .values_list('dimension', 'value', 'total', 'callbacks', 'rejections', 'pending'))
+
+    def assertMatchesRebuild(self):
+        incremental = self.summary()
+        refresh_callback_summary()
+        self.assertEqual(incremental, self.summary())
+
+    def test_status_changes_moves_and_deletes(self):
+        applications = seed_applications(3)
+        refresh_callback_summary()
+        log = CallbackLog.objects.filter(callback_status='no_info').first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            log.callback_status = 'rejection'
+            log.save()
+        self.assertMatchesRebuild()
+
+        # The employer's rows move from one industry cell into a new one
+        with self.captureOnCommitCallbacks(execute=True):
+            employer = Employer.objects.get(pk=applications[0].employer_id)
+            employer.industry = 'Arts'
+            employer.save()
+        self.assertMatchesRebuild()
+        self.assertTrue(CallbackRateSummary.objects.filter(dimension='employer_industry', value='Arts').exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            applications[1].delete()
+        self.assertMatchesRebuild()
+
+
+def write_resume_csv(testcase, rows):
+    """A resume_pairs_log.csv of `rows` (dicts) in a temporary directory removed after the test."""
+    tmp = tempfile.TemporaryDirectory()
+    testcase.addCleanup(tmp.cleanup)
+    path = Path(tmp.name) / 'resume_pairs_log.csv'
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def resume_log_rows(pairs=3):
+    """Rows of resume_pairs_log.csv for `pairs` pairs of two resumes."""
+    return [
+        {'pair_id': f'CSV-{n}', 'occupation': 'payroll', 'good_fit_occupations': 'Clerk', 'template_name': 'classic',
+         'resume_idx': idx, 'full_name': f'Csv Person {n}-{idx}', 'phone': f'555-01{n}{idx}',
+         'address': f'{n} Main St', 'email': f'csv{n}{idx}@example.com', 'skills': 'Excel',
+         'race_signal': 'white' if idx == 1 else 'black', 'current_employer_type': 'SMO' if idx == 1 else 'For Profit'}
+        for n in range(pairs) for idx in (1, 2)
+    ]
+
+
+class ImportResumeDataTests(TestCase):
+    """import_resume_data upserts pairs and profiles in one transaction."""
+
+    def run_import(self, path, **options):
+        out = StringIO()
+        call_command('import_resume_data', csv_path=path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import_counts_created_profiles(self):
+        out = self.run_import(write_resume_csv(self, resume_log_rows()))
+        self.assertIn('profiles: 6 created, 0 updated, 0 unchanged; pairs: 3 created, 0 updated', out)
+        self.assertEqual(Profile.objects.filter(pair__pair_id='CSV-1').count(), 2)
+        self.assertEqual(Profile.objects.get(full_name='Csv Person 1-2').race_signal, 'black')
+
+    def test_dry_run_writes_nothing(self):
+        out = self.run_import(write_resume_csv(self, resume_log_rows()), dry_run=True)
+        self.assertIn('Dry run', out)
+        self.assertIn('profiles: 6 created', out)
+        self.assertFalse(Pair.objects.exists())
+        self.assertFalse(Profile.objects.exists())
+
+    def test_failed_write_rolls_back_the_whole_import(self):
+        path = write_resume_csv(self, resume_log_rows())
+        with mock.patch('audit.importers.Profile.objects.bulk_create', side_effect=IntegrityError('bad row')):
+            with self.assertRaises(IntegrityError):
+                self.run_import(path)
+        self.assertFalse(Pair.objects.exists())
+
+    def test_reimport_skips_rows_whose_source_hash_matches(self):
+        rows = resume_log_rows()
+        self.run_import(write_resume_csv(self, rows))
+        with mock.patch('audit.importers.Profile.objects.bulk_update') as bulk_update:
+            out = self.run_import(write_resume_csv(self, rows))
+        self.assertIn('profiles: 0 created, 0 updated, 6 unchanged', out)
+        self.assertEqual(list(bulk_update.call_args.args[0]), [])
+
+        rows[0]['phone'] = '555-9999'
+        out = self.run_import(write_resume_csv(self, rows))
+        self.assertIn('profiles: 0 created, 1 updated, 5 unchanged', out)
+        self.assertEqual(Profile.objects.get(full_name='Csv Person 0-1').phone, '555-9999')
+
+    def test_bad_row_writes_nothing(self):
+        rows = resume_log_rows()
+        rows[-1]['resume_idx'] = 'two'
+        with self.assertRaises(ValueError):
+            self.run_import(write_resume_csv(self, rows))
+        self.assertFalse(Pair.objects.exists())
+
+
+class ImportPairsTests(TestCase):
+    """import_pairs reads a sheet whose header has blank cells."""
+
+    def write_sheet(self, header, *rows):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        workbook.active.append(header)
+        for row in rows:
+            workbook.active.append(row)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = Path(tmp.name) / 'pairs.xlsx'
+        workbook.save(path)
+        return str(path)
+
+    def test_blank_headers_are_named_by_position(self):
+        path = self.write_sheet(
+            ['pair_id', None, 'occupation', 'good fit occupations', '  ', 'professional skills and expertise',
+             'full_name', 'resume_idx'],
+            ['IMP-1', 'stray', 'payroll', 'Clerk', 'notes', 'Excel', 'Imported Person', 1],
+        )
+        call_command('import_pairs', path, stdout=StringIO())
+        self.assertEqual(Profile.objects.get(pair__pair_id='IMP-1').full_name, 'Imported Person')
+
+        path = self.write_sheet(['pair_id', 'occupation', 'Occupation '])
+        with self.assertRaisesMessage(CommandError, 'Duplicate column: occupation'):
+            call_command('import_pairs', path, stdout=StringIO())
+
+
+class PairApplicationAddTests(TestCase):
+    """The add form (opened from a pair with ?pair=) stores the pair, its occupation and both callback logs."""
+
+    def test_add_application_from_pair(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        pair = Pair.objects.create(pair_id='ADD-1', occupation='communications', good_fit_occupations='')
+        for idx in (1, 2):
+            Profile.objects.create(pair=pair, full_name=f'Add Person {idx}', resume_idx=idx)
+        employer = Employer.objects.create(display_name='Add Employer', mission_statement='')
+
+        url = reverse('admin:audit_pairapplication_add') + f'?pair={pair.pk}'
+        response = self.client.post(url, {
+            'employer': employer.pk, 'job_title': 'Writer', 'job_text': 'Text', 'work_mode': 'remote',
+            'job_board': 'indeed', 'days_open': 0,
+            'callbacks-TOTAL_FORMS': 0, 'callbacks-INITIAL_FORMS': 0,
+            'callbacks-MIN_NUM_FORMS': 0, 'callbacks-MAX_NUM_FORMS': 2,
+            '_save': 'SUBMIT',
+        })
+        self.assertEqual(response.status_code, 302)
+
+        application = PairApplication.objects.get()
+        self.assertEqual(application.pair, pair)
+        self.assertEqual(application.occupation, 'Communications')
+        self.assertEqual(application.status, 'submitted')
+        self.assertEqual(application.callbacks.count(), 2)
+        check = self.client.get(reverse('admin:employer-check'), {'employer': 'Add Employer', 'occupation': 'communications'})
+        self.assertFalse(check.json()['ok'])
+
+    def test_unknown_pair_is_a_form_error(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(user)
+        employer = Employer.objects.create(display_name='Add Employer', mission_statement='')
+        for pair in ('999999', 'not-a-pair', None):
+            url = reverse('admin:audit_pairapplication_add') + (f'?pair={pair}' if pair else '')
+            response = self.client.post(url, {
+                'employer': employer.pk, 'job_title': 'Writer', 'job_text': 'Text', 'work_mode': 'remote',
+                'job_board': 'indeed', 'days_open': 0,
+                'callbacks-TOTAL_FORMS': 0, 'callbacks-INITIAL_FORMS': 0,
+                'callbacks-MIN_NUM_FORMS': 0, 'callbacks-MAX_NUM_FORMS': 2,
+                '_save': 'SUBMIT',
+            })
+            self.assertEqual(response.status_code, 200, pair)
+            self.assertIn('This application has no pair', str(response.context['adminform'].form.non_field_errors()))
+        self.assertFalse(PairApplication.objects.exists())
+
+
+class PairApplicationSaveTests(TestCase):
+    """Saving an application only re-times its callback logs when submitted_at changed."""
+
+    def test_callback_logs_retimed_only_when_submitted_at_moves(self):
+        seed_applications(2)
+        application = PairApplication.objects.filter(submitted_at__isnull=False).get()
+        log = application.callbacks.get(profile__resume_idx=1)
+        log.callback_date = timezone.localdate(application.submitted_at) + timezone.timedelta(days=3)
+        log.save()
+
+        application.job_title = 'Editor'
+        with self.assertNumQueries(1):  # the UPDATE alone
+            application.save()
+
+        application.submitted_at -= timezone.timedelta(days=2)
+        application.save()
+        log.refresh_from_db()
+        self.assertEqual(log.days_to_response, 5)
+
+
+class PairApplicationSaveSyncTests(TransactionTestCase):
+    """Outside a transaction, the audit rows refreshed by an application save see its re-timed logs."""
+
+    def test_audit_rows_follow_retimed_logs(self):
+        seed_applications(2)
+        application = PairApplication.objects.filter(submitted_at__isnull=False).get()
+        log = application.callbacks.get(profile__resume_idx=1)
+        log.callback_date = timezone.localdate(application.submitted_at) + timezone.timedelta(days=3)
+        log.save()
+
+        application.submitted_at -= timezone.timedelta(days=7)
+        application.save()
+        log.refresh_from_db()
+        self.assertEqual(log.days_to_response, 10)
+        self.assertEqual(AuditRow.objects.get(callback_log=log).days_to_response, 10)
+
+
+class LoadTestHarnessTests(TransactionTestCase):
+    """load_test runs the whole RA workflow from concurrent clients and cleans up after itself."""
+
+    def test_workflow_completes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = Path(tmp) / 'load.json'
+            call_command('load_test', users=2, iterations=2, no_generate=True,
+                         output_path=str(output_path), stdout=StringIO())
+            report = json.loads(output_path.read_text())
+
+        self.assertNotIn('generate_pair', report['steps'])
+        for step, result in report['steps'].items():
+            self.assertEqual(result['count'], 4, f"{step}: {result['first_error']}")
+            self.assertEqual(result['error_rate'], 0.0, step)
+        self.assertFalse(PairApplication.objects.exists())
+        self.assertFalse(Pair.objects.exists())
+        self.assertFalse(User.objects.filter(username='loadtest').exists())
+
+
+class PerfInstrumentationTests(TestCase):
+    """Requests over their query budget are logged, and perf_report merges the recent per-process snapshots."""
+
+    def write_snapshot(self, directory, pid, views, metrics=METRICS, age=0):
+        path = Path(directory) / f'perf-{pid}.json'
+        path.write_text(json.dumps({'pid': pid, 'written_at': time.time() - age, 'metrics': list(metrics),
+                                    'views': views}))
+        return path
+
+    def test_query_budget_exceeded_is_logged(self):
+        self.client.force_login(User.objects.create_superuser('perf', 'perf@example.com', 'password'))
+        with override_settings(PERF_QUERY_BUDGET=0), self.assertLogs('audit.perf', 'WARNING') as logs:
+            self.client.get(reverse('admin:index'))
+        event = json.loads(logs.records[0].getMessage())
+        self.assertEqual((event['event'], event['view'], event['budget']), ('query_budget_exceeded', 'admin:index', 0))
+        self.assertGreater(event['queries'], 0)
+
+    def test_perf_report_merges_recent_snapshots(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.write_snapshot(tmp, 1, {'admin:index': {'requests': 3, 'samples': [[10, 1, 1, 0], [20, 2, 1, 0]]}})
+            # Another process listing its metrics in a different order
+            self.write_snapshot(tmp, 2, {'admin:index': {'requests': 2, 'samples': [[0, 1, 3, 30]]}},
+                                metrics=reversed(METRICS))
+            stale = self.write_snapshot(tmp, 3, {'old:view': {'requests': 9, 'samples': [[5, 1, 1, 0]]}},
+                                        age=2 * 24 * 3600)
+            output_path = Path(tmp) / 'report.json'
+            out = StringIO()
+            call_command('perf_report', snapshot_dir=tmp, output_path=str(output_path), stdout=out)
+            [row] = json.loads(output_path.read_text())
+            self.assertEqual((row['view'], row['requests'], row['window']), ('admin:index', 5, 3))
+            self.assertEqual((row['wall_p50'], row['queries_max']), (20.0, 3))
+            self.assertIn('Skipped 1 snapshot(s) older than 24h', out.getvalue())
+            self.assertTrue(stale.exists())
+
+            call_command('perf_report', snapshot_dir=tmp, max_age=0, output_path=str(output_path), stdout=StringIO())
+            self.assertEqual(len(json.loads(output_path.read_text())), 2)
+            call_command('perf_report', snapshot_dir=tmp, prune=True, stdout=StringIO())
+            self.assertFalse(stale.exists())
+
+    def test_registry_is_written_out_at_exit(self):
+        with tempfile.TemporaryDirectory() as tmp, override_settings(PERF_SNAPSHOT_DIR=Path(tmp)):
+            registry = PerfRegistry(10)
+            self.assertIsNone(flush_registry(registry))
+            registry.record('admin:index', {'wall_ms': 12.0, 'queries': 2, 'sql_ms': 1.0, 'template_ms': 3.0})
+            snapshot = json.loads(flush_registry(registry).read_text())
+        self.assertEqual(snapshot['views']['admin:index'], {'requests': 1, 'samples': [[12.0, 2, 1.0, 3.0]]})
+        # Every middleware instance of the process feeds, and flushes, the same registry
+        self.assertIs(PerformanceMiddleware(lambda request: None).registry, process_registry())
+
+
+class RequestProfilingTests(TestCase):
+    """?_profile=1 profiles staff requests only, and old profiles are pruned."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        seed_applications(2)
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.profile_dir = Path(tmp.name)
+        settings_override = override_settings(PROFILE_DIR=self.profile_dir, PROFILE_KEEP=2)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_staff_request_is_profiled(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:audit_pairapplication_changelist'), {'_profile': '1', 'status': 'submitted'})
+        # The trigger parameter must not reach the changelist as a filter
+        self.assertEqual(response.status_code, 200)
+        profile_id = response['X-Profile-Id']
+        for suffix in ('.prof', '.collapsed', '.json'):
+            self.assertTrue((self.profile_dir / f'{profile_id}{suffix}').exists(), suffix)
+        metadata = json.loads((self.profile_dir / f'{profile_id}.json').read_text())
+        self.assertEqual(metadata['view'], 'admin:audit_pairapplication_changelist')
+        self.assertTrue(metadata['top_functions'])
+
+        listing = self.client.get(reverse('admin:audit_request_profiles'))
+        self.assertContains(listing, profile_id)
+        download = self.client.get(reverse('admin:audit_request_profile_download', args=[profile_id, 'prof']))
+        self.assertEqual(download.status_code, 200)
+        download.close()
+
+    def test_header_trigger_and_retention(self):
+        self.client.force_login(self.user)
+        url = reverse('admin:audit_callback_search')
+        ids = [self.client.get(url, {'q': 'Seed'}, HTTP_X_PROFILE='1')['X-Profile-Id'] for _ in range(3)]
+        remaining = sorted(path.stem for path in self.profile_dir.glob('*.json'))
+        self.assertEqual(len(remaining), 2)
+        self.assertEqual(set(remaining), set(sorted(ids)[1:]))
+
+    def test_anonymous_request_is_not_profiled(self):
+        response = self.client.get(reverse('admin:audit_pairapplication_changelist'), {'_profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(list(self.profile_dir.iterdir()))
+
+
+class TemporaryResumeStorageMixin:
+    """A pair with two profiles whose PDFs go to a throwaway content-addressed store."""
+
+    PDF = b'%PDF-1.4 resume ' * 200
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.media = Path(tmp.name)
+        self.use_storage(compress=False)
+        self.pair = Pair.objects.create(pair_id='PDF-1', occupation='payroll', good_fit_occupations='')
+        self.profiles = [Profile.objects.create(pair=self.pair, full_name=f'Pdf Person {idx}', resume_idx=idx)
+                         for idx in (1, 2)]
+
+    def use_storage(self, compress):
+        # FileField resolves its storage callable once, at import, so patch the field's instance
+        storage = ContentAddressedStorage(location=str(self.media), compress=compress)
+        for patcher in (mock.patch.object(Profile._meta.get_field('resume_pdf'), 'storage', storage),
+                        mock.patch.dict(storages._storages, {'resumes': storage})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+
+class ResumeStorageTests(TemporaryResumeStorageMixin, TestCase):
+    """Identical PDFs are stored once, reference-counted and collected when unused."""
+
+    def gc(self, *args):
+        call_command('gc_resume_blobs', '--grace_hours', '0', *args, stdout=StringIO())
+
+    def test_identical_pdfs_are_stored_once(self):
+        for profile in self.profiles:
+            profile.resume_pdf.save(f'{profile.full_name}.pdf', ContentFile(self.PDF))
+        self.assertEqual(self.profiles[0].resume_pdf.name, self.profiles[1].resume_pdf.name)
+        blob = ResumeBlob.objects.get()
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(len([p for p in self.media.rglob('*') if p.is_file()]), 1)
+
+        self.profiles[0].delete()
+        self.gc()
+        self.assertEqual(ResumeBlob.objects.get().refcount, 1)
+        self.profiles[1].resume_pdf.save('other.pdf', ContentFile(b'%PDF-1.4 other'))
+        self.gc()
+        self.assertEqual(list(ResumeBlob.objects.values_list('refcount', flat=True)), [1])
+        self.assertEqual(len([p for p in self.media.rglob('*') if p.is_file()]), 1)
+
+    def test_compressed_objects_read_back_unchanged(self):
+        self.use_storage(compress=True)
+        profile = Profile.objects.get(pk=self.profiles[0].pk)  # FieldFile keeps the storage it was made with
+        profile.resume_pdf.save('resume.pdf', ContentFile(self.PDF))
+        self.assertTrue(profile.resume_pdf.name.endswith('.pdf.gz'))
+        blob = ResumeBlob.objects.get()
+        self.assertLess(blob.stored_size, blob.size)
+        self.assertEqual(select_resume_storage().size(profile.resume_pdf.name), len(self.PDF))
+        with select_resume_storage().open(profile.resume_pdf.name) as f:
+            self.assertEqual(f.read(), self.PDF)
+
+    def test_recount_and_legacy_adoption(self):
+        legacy = self.media / 'resumes' / 'pdfs'
+        legacy.mkdir(parents=True)
+        for profile in self.profiles:
+            (legacy / f'{profile.pk}.pdf').write_bytes(self.PDF)
+            Profile.objects.filter(pk=profile.pk).update(resume_pdf=f'resumes/pdfs/{profile.pk}.pdf')
+
+        self.gc('--adopt_legacy', '--recount')
+        names = set(Profile.objects.values_list('resume_pdf', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(ResumeBlob.objects.get().refcount, 2)
+        self.assertFalse(any(legacy.iterdir()))
+
+        ResumeBlob.objects.update(refcount=0)  # drift, e.g. from bulk_update
+        self.gc('--recount')
+        self.assertEqual(ResumeBlob.objects.get().refcount, 2)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class ResumeDownloadTests(TemporaryResumeStorageMixin, TestCase):
+    """Resume PDFs are served with validators and ranges, offloaded when configured, and bundled per pair."""
+
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_superuser('downloads', 'downloads@example.com', 'pw')
+        self.client.force_login(user)
+        self.async_client.force_login(user)
+        for n, profile in enumerate(self.profiles):
+            profile.resume_pdf.save('resume.pdf', ContentFile(self.PDF + str(n).encode()))
+        self.url = reverse('admin:audit_profile_pdf', args=[self.profiles[0].pk])
+
+    def test_pdf_supports_etags_and_ranges(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.PDF + b'0')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('Pdf_Person_1_PDF-1.pdf', response['Content-Disposition'])
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5-9')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 5-9/{len(self.PDF) + 1}')
+        self.assertEqual(b''.join(response.streaming_content), self.PDF[5:10])
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=99999-').status_code, 416)
+
+    def test_compressed_pdf_ranges_are_decompressed(self):
+        self.use_storage(compress=True)
+        profile = Profile.objects.get(pk=self.profiles[0].pk)
+        profile.resume_pdf.save('resume.pdf', ContentFile(self.PDF + b'z'))
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), self.PDF[-2:] + b'z')
+
+    def test_sendfile_offloads_plain_files_only(self):
+        with self.settings(RESUME_SENDFILE='nginx', RESUME_SENDFILE_PREFIX='/protected/'):
+            response = self.client.get(self.url)
+            self.assertEqual(response['X-Accel-Redirect'], '/protected/' + self.profiles[0].resume_pdf.name)
+            self.assertEqual(response.content, b'')
+
+            self.use_storage(compress=True)
+            profile = Profile.objects.get(pk=self.profiles[0].pk)
+            profile.resume_pdf.save('resume.pdf', ContentFile(self.PDF + b'z'))
+            response = self.client.get(self.url)
+            self.assertNotIn('X-Accel-Redirect', response)
+            self.assertEqual(b''.join(response.streaming_content), self.PDF + b'z')
+
+    def test_pair_bundle_streams_both_pdfs(self):
+        response = self.client.get(reverse('admin:audit_pair_pdfs', args=[self.pair.pk]))
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), ['Pdf_Person_1_PDF-1.pdf', 'Pdf_Person_2_PDF-1.pdf'])
+            self.assertEqual(archive.read('Pdf_Person_2_PDF-1.pdf'), self.PDF + b'1')
+
+    def test_bulk_action_streams_filtered_pairs_with_manifest(self):
+        other = Pair.objects.create(pair_id='PDF-2', occupation='communications', good_fit_occupations='')
+        Profile.objects.create(pair=other, full_name='Not Exported', resume_idx=1)
+        no_pdf = Pair.objects.create(pair_id='PDF-3', occupation='payroll', good_fit_occupations='')
+        Profile.objects.create(pair=no_pdf, full_name='No Pdf', resume_idx=1)
+        Profile.objects.create(pair=no_pdf, full_name='Lazy Pdf', resume_idx=2, resume_html='<p>resume</p>')
+        Profile.objects.filter(pk=self.profiles[1].pk).update(resume_pdf='resumes/gone.pdf')
+
+        # "Select all" on the changelist filtered to payroll pairs
+        response = self.client.post(reverse('admin:audit_pair_list') + '?occupation=payroll', {
+            'action': 'download_resume_pdfs', 'select_across': '1', 'index': '0',
+            '_selected_action': [self.pair.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(archive.namelist(), [
+                'manifest.csv', 'PDF-1/Pdf_Person_1_PDF-1.pdf',
+            ])
+            manifest = archive.read('manifest.csv').decode().splitlines()
+        self.assertEqual(manifest, [
+            'pair_id,resume_idx,full_name,file,status',
+            'PDF-1,1,Pdf Person 1,PDF-1/Pdf_Person_1_PDF-1.pdf,ok',
+            'PDF-1,2,Pdf Person 2,,missing',
+            'PDF-3,1,No Pdf,,missing',
+            'PDF-3,2,Lazy Pdf,,not_printed',
+        ])
+
+
+    async def test_asgi_streams_without_buffering(self):
+        # A sync iterator would be read into a list by the ASGI handler before sending
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        self.assertEqual(b''.join([chunk async for chunk in response.streaming_content]), self.PDF + b'0')
+
+        response = await self.async_client.post(reverse('admin:audit_pair_list'), {
+            'action': 'download_resume_pdfs', 'select_across': '1', 'index': '0',
+            '_selected_action': [self.pair.pk],
+        })
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertGreater(len(chunks), 3)
+        with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as archive:
+            self.assertEqual(archive.read('PDF-1/Pdf_Person_2_PDF-1.pdf'), self.PDF + b'1')
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class AsyncViewTests(TestCase):
+    """Lookup and generation views run natively under ASGI, through the async-capable middleware."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('async', 'async@example.com', 'password')
+        cls.applications = seed_applications(2)
+
+    def setUp(self):
+        self.async_client.force_login(self.user)
+
+    async def test_employer_check_and_callback_search(self):
+        application = self.applications[0]
+        employer = await Employer.objects.aget(pk=application.employer_id)
+        response = await self.async_client.get(reverse('admin:employer-check'), {
+            'employer': employer.display_name, 'occupation': application.occupation,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['ok'])
+        # Queries made through the async ORM still reach the instrumentation
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
+
+        response = await self.async_client.get(reverse('admin:audit_callback_search'), {'q': 'Seed Person'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['search_results'])
+
+    async def test_reference_data_and_generation_form(self):
+        response = await self.async_client.get(reverse('ajax_reference'))
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get(reverse('ajax_reference'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(reverse('admin:audit_pair_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Generate New Resume Pair')
+
+    async def test_staff_only(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse('admin:audit_pair_changelist'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('admin:login'), response['Location'])
+
+
+class GenerationPipelineTests(TemporaryResumeStorageMixin, TestCase):
+    """Generation randomises once and stores exactly the data it rendered, or nothing."""
+
+    def setUp(self):
+        super().setUp()
+        self.pair_data = {
+            'pair_id': 'GEN-42',
+            'good_fit_occupations': ['Payroll Clerk', 'Bookkeeper'],
+            **{f'resume{idx}': {
+                'full_name': f'Piped Person {idx}', 'phone': f'555-010{idx}', 'address': f'{idx} Main St',
+                'email': f'piped{idx}@example.com', 'skills': ['ADP', 'Excel'], 'template_name': 'classic.html',
+                'race_signal': 'white' if idx == 1 else 'black',
+            } for idx in (1, 2)},
+        }
+        self.randomise = mock.Mock(return_value=self.pair_data)
+        self.rendered = []
+
+        async def render_pair(pair_data, htmls, report):
+            self.rendered.append(htmls)
+            for idx in (2, 1):
+                await report(f'render_{idx}')
+            return [self.PDF, None]  # the second resume failed to render
+
+        for patcher in (mock.patch('audit.services.RESUME_GENERATION_AVAILABLE', True),
+                        mock.patch('audit.services.generate_pair', self.randomise, create=True),
+                        mock.patch('audit.pipeline.resume_html', lambda data: f"<h1>{data['full_name']}</h1>"),
+                        mock.patch('audit.pipeline.render_pair', render_pair)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_form_stores_the_rendered_pair(self):
+        form = SimplePairGenerationForm({'location': 'NY', 'occupation': 'payroll',
+                                         'archetype': 'payroll_systems_specialist'})
+        result = form.generate_pair_with_pdfs()
+
+        self.randomise.assert_called_once_with('payroll', 'NY', 1, None)
+        self.assertEqual(self.rendered, [['<h1>Piped Person 1</h1>', '<h1>Piped Person 2</h1>']])
+        pair = Pair.objects.get(pair_id='GEN-42')
+        self.assertEqual((result['pair_db_id'], result['archetype']), (pair.pk, 'Payroll Systems Specialist'))
+        self.assertEqual(result['resume2']['full_name'], 'Piped Person 2')
+        first, second = pair.profiles.order_by('resume_idx')
+        self.assertEqual((first.expertise, first.race_signal, second.race_signal), ('ADP; Excel', 'white', 'black'))
+        with first.resume_pdf.open() as f:
+            self.assertEqual(f.read(), self.PDF)
+        self.assertFalse(second.resume_pdf)
+        self.assertEqual(second.resume_html, '<h1>Piped Person 2</h1>')  # printed on first download instead
+
+    def test_failed_row_write_leaves_no_rows(self):
+        self.pair_data['pair_id'] = self.pair.pair_id  # already taken
+        stages = []
+
+        async def progress(stage):
+            stages.append(stage)
+
+        with self.assertRaises(IntegrityError):
+            async_to_sync(generate)('NY', 'payroll', 1, 1, progress=progress)
+        self.assertEqual(stages, ['randomise', 'render_2', 'render_1', 'save_pdfs'])
+        self.assertFalse(Profile.objects.filter(full_name__startswith='Piped').exists())
+
+
+    @override_settings(RESUME_LAZY_RENDER=True, ALLOWED_HOSTS=['testserver'])
+    def test_lazy_generation_prints_on_first_download(self):
+        stages = []
+
+        async def progress(stage):
+            stages.append(stage)
+
+        pair = async_to_sync(generate)('NY', 'payroll', 1, 1, progress=progress)
+        self.assertEqual((stages, self.rendered), (['randomise', 'db_write'], []))
+        profile = pair.profiles.get(resume_idx=1)
+        self.assertFalse(profile.resume_pdf)
+
+        printed = []
+
+        async def print_profiles(profiles):
+            for missing in profiles:
+                printed.append(missing.pk)
+                await sync_to_async(cache_pdf)(missing, self.PDF)
+
+        self.client.force_login(User.objects.create_superuser('lazy', 'lazy@example.com', 'password'))
+        url = reverse('admin:audit_profile_pdf', args=[profile.pk])
+        with mock.patch('audit.pipeline.print_profiles', print_profiles):
+            for _ in range(2):
+                response = self.client.get(url)
+                self.assertEqual(b''.join(response.streaming_content), self.PDF)
+        self.assertEqual(printed, [profile.pk])  # cached after the first download
+        profile.refresh_from_db()
+        self.assertEqual(ResumeBlob.objects.get(name=profile.resume_pdf.name).refcount, 1)
+
+    def test_cached_pdf_is_referenced_once_when_the_profile_is_saved_again(self):
+        profile = self.profiles[0]
+        cache_pdf(profile, self.PDF)
+        profile.phone = '555-0101'
+        profile.save()
+        self.assertEqual(ResumeBlob.objects.get(name=profile.resume_pdf.name).refcount, 1)
+
+    def test_new_application_prefetches_missing_pdfs(self):
+        self.profiles[0].resume_html = '<h1>Pdf Person 1</h1>'
+        self.profiles[0].save()
+        employer = Employer.objects.create(display_name='Prefetch Org')
+        with mock.patch('audit.pipeline.threading.Thread') as thread, self.captureOnCommitCallbacks(execute=True):
+            PairApplication.objects.create(pair=self.pair, employer=employer, job_title='Clerk', job_text='Text')
+        thread.assert_called_once_with(target=_prefetch, args=(self.pair.pk,), daemon=True)
+
+
+def fake_generator(occupation, location, archetype, sublocation=None):
+    """Stands in for resume_randomization.generate_pair, drawing from the global RNGs as it does."""
+    names = random.sample(['Ana Diaz', 'Bo Chen', 'Cy Okafor', 'Di Patel', 'Ed Novak'], 2)
+    return {
+        'pair_id': f'{location}-{random.randrange(10**6):06d}',
+        'good_fit_occupations': random.sample(['Clerk', 'Analyst', 'Bookkeeper', 'Auditor'], 2),
+        **{f'resume{idx}': {
+            'full_name': name, 'phone': f'555-{random.randrange(10**4):04d}', 'address': f'{random.randrange(1, 999)} Main St',
+            'email': f"{name.split()[0].lower()}@example.com", 'skills': random.sample(['ADP', 'Excel', 'SAP', 'Workday'], 2),
+            'template_name': 'classic.html', 'college_gpa': round(float(np.random.uniform(2.5, 4.0)), 2),
+        } for idx, name in enumerate(names, 1)},
+    }
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class PairRegenerationTests(TemporaryResumeStorageMixin, TestCase):
+    """A pair's seed regenerates its data and HTML byte for byte, so stored artefacts can be evicted."""
+
+    def setUp(self):
+        super().setUp()
+        self.generated = []
+
+        def generator(*args):
+            self.generated.append(fake_generator(*args))
+            return self.generated[-1]
+
+        async def render_pair(pair_data, htmls, report):
+            return [html.encode() for html in htmls]
+
+        for patcher in (mock.patch('audit.services.RESUME_GENERATION_AVAILABLE', True),
+                        mock.patch('audit.services.GENERATOR_VERSION', 'test-1'),
+                        mock.patch('audit.services.GENERATOR_INPUTS_VERSIONED', True),
+                        mock.patch('audit.services.generate_pair', generator, create=True),
+                        # Templates may draw from the RNGs too
+                        mock.patch('audit.pipeline.resume_html',
+                                   lambda data: f"<h1>{data['full_name']}</h1><p>{random.random()!r}</p>"),
+                        mock.patch('audit.pipeline.render_pair', render_pair)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.generated_pair = async_to_sync(generate)('TX', 'payroll', 2, 3)
+
+    def test_seed_reproduces_data_and_html_checksums(self):
+        pair = self.generated_pair
+        self.assertIsNotNone(pair.rng_seed)
+        self.assertEqual(pair.generator_version, 'test-1')
+
+        pair_data, htmls = regenerate(pair)
+        self.assertEqual(json.dumps(pair_data, sort_keys=True).encode(),
+                         json.dumps(self.generated[0], sort_keys=True).encode())
+        for profile in pair.profiles.order_by('resume_idx'):
+            regenerated = hashlib.sha256(htmls[profile.resume_idx - 1].encode('utf-8')).hexdigest()
+            self.assertEqual(regenerated, profile.html_sha256)
+            self.assertEqual(regenerated, hashlib.sha256(profile.resume_html.encode('utf-8')).hexdigest())
+        self.assertEqual(verify_pair(pair), [])
+
+        self.assertNotEqual(seeded_pair('TX', 'payroll', 2, 3, pair.rng_seed + 1)[0], pair_data)
+        pair.generator_version = 'test-0'
+        with self.assertRaises(RegenerationError):
+            regenerate(pair)
+
+    def test_tampered_pair_is_reported_and_kept(self):
+        Profile.objects.filter(pair=self.generated_pair, resume_idx=2).update(phone='555-0000')
+        err = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('regenerate_pairs', self.generated_pair.pair_id, '--evict', stdout=StringIO(), stderr=err)
+        self.assertIn('resume2.phone', err.getvalue())
+        self.assertFalse(self.generated_pair.profiles.filter(resume_pdf='').exists())
+
+    def test_evicted_resume_is_printed_again_from_its_seed(self):
+        original = self.generated_pair.profiles.get(resume_idx=1)
+        call_command('regenerate_pairs', '--all', '--evict_html', stdout=StringIO())
+        profile = Profile.objects.get(pk=original.pk)
+        self.assertEqual((profile.resume_pdf.name, profile.resume_html), ('', ''))
+        self.assertEqual(ResumeBlob.objects.get(name=original.resume_pdf.name).refcount, 0)
+
+        printed = []
+
+        async def print_profiles(profiles):
+            for missing in profiles:
+                printed.append(missing.resume_html)
+                await sync_to_async(cache_pdf)(missing, missing.resume_html.encode())
+
+        self.client.force_login(User.objects.create_superuser('regen', 'regen@example.com', 'password'))
+        with mock.patch('audit.pipeline.print_profiles', print_profiles):
+            response = self.client.get(reverse('admin:audit_profile_pdf', args=[profile.pk]))
+        self.assertEqual(printed, [original.resume_html])
+        self.assertEqual(b''.join(response.streaming_content), original.resume_html.encode())
+
+
+    def test_html_is_kept_unless_every_input_is_versioned(self):
+        with mock.patch('audit.services.GENERATOR_INPUTS_VERSIONED', False):
+            with self.assertRaises(CommandError):
+                call_command('regenerate_pairs', '--all', '--evict_html', stdout=StringIO())
+            with self.assertRaises(RegenerationError):
+                evict(self.generated_pair, html=True)
+        self.assertFalse(self.generated_pair.profiles.filter(resume_html='').exists())
+
+    def test_version_covers_templates_and_data_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / 'templates').mkdir()
+            (root / 'data').mkdir()
+            (root / 'generator.py').write_text('x = 1')
+            (root / 'templates' / 'a.html').write_text('<p>{{ name }}</p>')
+            (root / 'data' / 'names.csv').write_text('Ada\n')
+            module = mock.Mock(__file__=str(root / 'generator.py'), TEMPLATE_DIR=root / 'templates',
+                               DATA_DIR=root / 'data', __version__='2.0')
+
+            version, complete = services._generator_version(module)
+            self.assertTrue(complete)
+            self.assertTrue(version.startswith('2.0-'))
+            (root / 'templates' / 'temp_render.html').write_text('mid-render')  # print_pdf's scratch file
+            self.assertEqual(services._generator_version(module)[0], version)
+            (root / 'data' / 'names.csv').write_text('Grace\n')
+            changed = services._generator_version(module)[0]
+            self.assertNotEqual(changed, version)
+            (root / 'templates' / 'a.html').write_text('<b>{{ name }}</b>')
+            self.assertNotEqual(services._generator_version(module)[0], changed)
+
+            module.DATA_DIR = None
+            self.assertFalse(services._generator_version(module)[1])
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class GenerationJobTests(TestCase):
+    """A form token maps to one generation job, whose stages stream as server-sent events."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('generator', 'generator@example.com', 'password')
+        cls.pair = Pair.objects.create(pair_id='GEN-1', occupation='payroll', good_fit_occupations='', location='NY')
+        for idx in (1, 2):
+            Profile.objects.create(pair=cls.pair, full_name=f'Gen Person {idx}', resume_idx=idx)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.async_client.force_login(self.user)
+        self.token = uuid.uuid4()
+        self.form = {'location': 'NY', 'occupation': 'payroll', 'archetype': 'payroll_systems_specialist',
+                     'sublocation': '', 'token': str(self.token)}
+
+    def make_job(self, **fields):
+        return GenerationJob.objects.create(token=self.token, location='NY', occupation='payroll',
+                                            archetype='payroll_systems_specialist', **fields)
+
+    def test_repeated_submit_joins_the_first_job(self):
+        url = reverse('admin:audit_pair_generate')
+        with mock.patch('audit.generation.launch') as launch:
+            first = self.client.post(url, self.form).json()
+            second = self.client.post(url, self.form).json()
+        self.assertEqual(launch.call_count, 1)
+        self.assertEqual((first['started'], second['started']), (True, False))
+        self.assertEqual(first['events_url'], second['events_url'])
+        job = GenerationJob.objects.get()
+        self.assertEqual((job.token, job.sublocation), (self.token, 1))  # NY's only sublocation
+
+        self.assertEqual(self.client.post(url, {**self.form, 'archetype': 'bogus'}).status_code, 400)
+
+    def test_failed_job_restarts_under_its_token(self):
+        self.make_job(status='failed', error='browser crashed', stages_done=['randomise'])
+        with mock.patch('audit.generation.launch') as launch:
+            response = self.client.post(reverse('admin:audit_pair_generate'), self.form).json()
+        self.assertTrue(response['started'])
+        launch.assert_called_once()
+        job = GenerationJob.objects.get()
+        self.assertEqual((job.status, job.stages_done, job.error), ('running', [], ''))
+
+    def test_restart_takes_the_new_parameters(self):
+        self.make_job(status='failed', error='browser crashed')
+        form = {**self.form, 'location': 'TX', 'occupation': 'communications',
+                'archetype': 'brand_content_marketing', 'sublocation': '2'}
+        with mock.patch('audit.generation.launch'):
+            self.assertTrue(self.client.post(reverse('admin:audit_pair_generate'), form).json()['started'])
+        job = GenerationJob.objects.get()
+        self.assertEqual((job.location, job.occupation, job.archetype, job.sublocation),
+                         ('TX', 'communications', 'brand_content_marketing', 2))
+
+    def test_run_job_records_failure(self):
+        job = self.make_job()
+        job = async_to_sync(run_job)(job)
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('not available', job.error)
+
+    async def test_events_stream_stages_then_result(self):
+        job = await sync_to_async(self.make_job)(
+            status='done', pair=self.pair, stages_done=['randomise', 'render_2', 'render_1', 'save_pdfs', 'db_write'],
+        )
+        response = await self.async_client.get(reverse('admin:audit_pair_generation_events', args=[job.token]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        events = [block.splitlines() for block in body.strip().split('\n\n')]
+        self.assertEqual([lines[0] for lines in events], ['event: stage'] * 5 + ['event: done'])
+        self.assertIn('"label": "Render resume 2"', events[1][1])
+        result_url = json.loads(events[-1][1][len('data: '):])['result_url']
+
+        response = await self.async_client.get(result_url)
+        self.assertContains(response, 'Gen Person 2')
+
+    def test_events_stream_under_wsgi(self):
+        job = self.make_job(status='failed', error='browser crashed', stages_done=['randomise'])
+        response = self.client.get(reverse('admin:audit_pair_generation_events', args=[job.token]))
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('event: stage', body)
+        self.assertIn('event: failed\ndata: {"error": "browser crashed"}', body)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'], PAIR_INVENTORY_DEPTH=2, PAIR_INVENTORY_LOW_WATER=1,
+                   PAIR_INVENTORY_DEPTHS={})
+class PairInventoryTests(TestCase):
+    """Pre-generated pairs are claimed by the generation form; the worker tops up depleted cells."""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('stocker', 'stocker@example.com', 'password')
+        self.client.force_login(self.user)
+        self.cell = Cell('NY', 'payroll', 1, 1)  # payroll_systems_specialist in NY's only sublocation
+
+    def stock(self, cell, pair_id):
+        pair = Pair.objects.create(pair_id=pair_id, occupation=cell.occupation, good_fit_occupations='',
+                                   location=cell.location, archetype=cell.archetype,
+                                   sublocation=cell.sublocation, in_inventory=True)
+        Profile.objects.create(pair=pair, full_name=f'Stocked {pair_id}', resume_idx=1)
+        return pair
+
+    def submit(self):
+        form = {'location': 'NY', 'occupation': 'payroll', 'archetype': 'payroll_systems_specialist',
+                'sublocation': '', 'token': str(uuid.uuid4())}
+        with mock.patch('audit.generation.launch') as launch:
+            response = self.client.post(reverse('admin:audit_pair_generate'), form).json()
+        return response, launch
+
+    def test_form_claims_stocked_pair_without_rendering(self):
+        stocked = self.stock(self.cell, 'INV-1')
+        self.stock(self.cell._replace(archetype=2), 'INV-OTHER')
+
+        response, launch = self.submit()
+        self.assertFalse(response['started'])
+        launch.assert_not_called()
+        job = GenerationJob.objects.get()
+        self.assertEqual((job.status, job.pair_id), ('done', stocked.pk))
+        stocked.refresh_from_db()
+        self.assertFalse(stocked.in_inventory)
+        self.assertContains(self.client.get(reverse('admin:audit_pair_list')), 'INV-1')
+
+        # The cell is now empty, so the next submit renders
+        response, launch = self.submit()
+        self.assertTrue(response['started'])
+        launch.assert_called_once()
+        self.assertTrue(Pair.objects.get(pair_id='INV-OTHER').in_inventory)
+
+    def test_claim_is_single_use(self):
+        stocked = self.stock(self.cell, 'INV-1')
+        self.assertEqual(claim_pair(self.cell), stocked)
+        self.assertIsNone(claim_pair(self.cell))
+
+    def test_refill_plan_respects_low_water_and_overrides(self):
+        self.stock(self.cell, 'INV-1')
+        self.assertNotIn(self.cell, dict(refill_plan()))  # 1 ready is not below the low-water mark of 1
+
+        with override_settings(PAIR_INVENTORY_DEPTH=0, PAIR_INVENTORY_DEPTHS={'TX': 3, 'TX:payroll': 0}):
+            plan = refill_plan()
+        self.assertEqual({cell.location for cell, _ in plan}, {'TX'})
+        self.assertEqual({cell.occupation for cell, _ in plan}, {'communications', 'project_manager'})
+        self.assertEqual({count for _, count in plan}, {3})
+        self.assertIn(Cell('TX', 'communications', 1, None), dict(plan))  # sublocation left to the generator
+
+    def test_refill_command_dry_run(self):
+        out = StringIO()
+        with override_settings(PAIR_INVENTORY_DEPTH=0, PAIR_INVENTORY_DEPTHS={'GA:payroll': 2}):
+            call_command('refill_pair_inventory', '--dry-run', stdout=out)
+        self.assertIn('3 cells below low water, 6 pairs to render', out.getvalue())
+
+
+def assign_treatment(applications, treated_idx):
+    """Make resume `treated_idx[n]` of application n the SMO resume (None: neither, 0: both)."""
+    for application, idx in zip(applications, treated_idx):
+        profiles = Profile.objects.filter(pair_id=application.pair_id)
+        profiles.update(current_employer_type='SMO' if idx == 0 else 'For Profit')
+        if idx:
+            profiles.filter(resume_idx=idx).update(current_employer_type='SMO')
+    refresh_audit_rows()
+
+
+class PairedStatisticsTests(TestCase):
+
+    def setUp(self):
+        # Resume 1 gets the callback in every application (seed_applications)
+        self.applications = seed_applications(4)
+
+    def test_outcomes_are_oriented_by_treatment(self):
+        assign_treatment(self.applications, [1, 2, 0, None])
+        df, dropped = load_paired_outcomes('callback')
+        self.assertEqual(dropped, 2)
+        rows = df.set_index('application_id')[['y_treated', 'y_control']]
+        self.assertEqual(rows.loc[self.applications[0].pk].tolist(), [1, 0])
+        self.assertEqual(rows.loc[self.applications[1].pk].tolist(), [0, 1])
+
+        out = StringIO()
+        call_command('audit_stats', replicates=50, workers=1, seed=1, by=[], stdout=out)
+        self.assertIn('Left out 2 applications', out.getvalue())
+        self.assertIn('SMO=0.500 for-profit=0.500', out.getvalue())
+
+    def test_strata_bootstrap_from_independent_seeds(self):
+        assign_treatment(self.applications, [1, 2, 1, 2])
+        df, _ = load_paired_outcomes('callback')
+        df['occupation'] = ['a', 'a', 'b', 'b']
+        with mock.patch('audit.stats.bootstrap_ci', return_value=(0.0, 0.0)) as bootstrap:
+            stratified_summary(df, by=['occupation'], replicates=200, seed=7, workers=1)
+        seeds = [call.args[3] for call in bootstrap.call_args_list]
+        self.assertEqual(len(seeds), 3)  # all, a, b
+        self.assertEqual(len({seed.spawn_key for seed in seeds}), 3)
+        self.assertEqual({seed.entropy for seed in seeds}, {7})
+
+    def test_bootstrap_runs_in_spawned_workers(self):
+        # Spawn (the default on macOS and Windows) re-imports audit.stats in every worker
+        values = np.array([1.0, 0.0, -1.0, 1.0, 0.0, 1.0])
+        with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context('spawn')) as pool:
+            spawned = bootstrap_ci(values, replicates=400, seed=11, workers=2, pool=pool)
+        self.assertEqual(spawned, bootstrap_ci(values, replicates=400, seed=11, workers=2))
+
+
+class SurvivalTests(TestCase):
+
+    def test_logrank_is_stratified_by_application(self):
+        # The treated resume responds first in each of three applications
+        durations, treated = [1, 5, 2, 6, 3, 7], [True, False] * 3
+        test = logrank(durations, [True] * 6, treated, strata=[1, 1, 2, 2, 3, 3])
+        self.assertEqual((test['observed_treated'], test['expected_treated']), (3, 1.5))
+        self.assertAlmostEqual(test['statistic'], 3.0)
+        self.assertNotAlmostEqual(logrank(durations, [True] * 6, treated)['statistic'], 3.0)
+
+    def test_durations_by_treatment_with_undated_responses_censored(self):
+        applications = seed_applications(3)
+        submitted = timezone.now() - timezone.timedelta(days=10)
+        PairApplication.objects.update(status='submitted', submitted_at=submitted)
+        assign_treatment(applications, [2, 1, 0])
+        logs = CallbackLog.objects.filter(profile__resume_idx=1)
+        # Application 0: resume 1 (control) called back after 4 days; application 1: resume 1 (SMO) undated
+        for log in logs.filter(application=applications[0]):
+            log.callback_date = timezone.localdate(submitted) + timezone.timedelta(days=4)
+            log.save()
+        logs.filter(application=applications[1]).update(callback_status='callback', callback_date=None,
+                                                        days_to_response=None, response_censored=False)
+        refresh_audit_rows()
+
+        df, dropped = load_durations('callback')
+        self.assertEqual(dropped, 1)
+        self.assertEqual(len(df), 4)
+        rows = df.set_index(['application_id', 'arm'])
+        self.assertEqual(rows.loc[(applications[0].pk, 'control'), ['duration', 'event']].tolist(), [4, True])
+        undated = rows.loc[(applications[1].pk, 'treated')]
+        self.assertEqual((undated['event'], undated['undated'], undated['duration']), (False, True, 10))
+        curves, test = compare_profiles(df)
+        self.assertEqual(set(curves), {'treated', 'control'})
+        self.assertEqual(test['observed_treated'], 0)
+
+        out = StringIO()
+        call_command('audit_survival', stdout=out)
+        self.assertIn('1 responses without a callback date', out.getvalue())
+        self.assertIn('For profit', out.getvalue())
+
+
+class MigrationBackfillTests(TransactionTestCase):
+    """Migrations that add derived tables fill them from the study data already there."""
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([('audit', target)])
+        executor.loader.build_graph()
+        return executor.loader.project_state([('audit', target)]).apps
+
+    def tearDown(self):
+        call_command('migrate', 'audit', verbosity=0)
+
+    def seed(self, apps):
+        """Two logs (a callback and a pending one) of one application, through the historical models."""
+        Pair, Profile, Employer, PairApplication, CallbackLog = (
+            apps.get_model('audit', name) for name in ('Pair', 'Profile', 'Employer', 'PairApplication', 'CallbackLog')
+        )
+        pair = Pair.objects.create(pair_id='MIG-1', occupation='payroll', good_fit_occupations='', location='NY')
+        employer = Employer.objects.create(display_name='Old Employer', normalized_name='old employer',
+                                           number_employees=120, mission_statement='Mission')
+        application = PairApplication.objects.create(pair=pair, employer=employer, occupation='Payroll',
+                                                      job_title='Clerk', job_text='Text', work_mode='remote')
+        for idx, status in ((1, 'callback'), (2, 'no_info')):
+            profile = Profile.objects.create(pair=pair, full_name=f'Old Person {idx}', resume_idx=idx)
+            CallbackLog.objects.create(application=application, profile=profile, callback_status=status)
+
+    def test_callback_summary_is_backfilled(self):
+        self.seed(self.migrate('0008_profile_source_hash'))
+        apps = self.migrate('0009_callbackratesummary')
+        cells = {(cell.dimension, cell.value): (cell.total, cell.callbacks, cell.pending)
+                 for cell in apps.get_model('audit', 'CallbackRateSummary').objects.all()}
+        self.assertEqual(cells[('occupation', 'payroll')], (2, 1, 1))
+        self.assertEqual(cells[('employer_size', '50-249')], (2, 1, 1))
+
+    def test_audit_rows_are_backfilled(self):
+        self.seed(self.migrate('0011_profile_resume_attributes'))
+        apps = self.migrate('0012_auditrow')
+        rows = apps.get_model('audit', 'AuditRow').objects.order_by('resume_idx')
+        self.assertEqual([(row.full_name, row.employer_size, row.callback_status) for row in rows], [
+            ('Old Person 1', '50-249', 'callback'), ('Old Person 2', '50-249', 'no_info'),
+        ])
+        summary = apps.get_model('audit', 'CallbackRateSummary').objects
+        self.assertEqual(summary.get(dimension='race_signal', value='').total, 2)
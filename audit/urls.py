@@ -2,6 +2,5 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
-    path('ajax/sublocations/', views.get_sublocations, name='ajax_sublocations'),
-    path('ajax/archetypes/', views.get_archetypes, name='ajax_archetypes'),
+    path('ajax/reference/', views.reference_data, name='ajax_reference'),
 ]
@@ -3,6 +3,11 @@ ASGI config for nonprofit_app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Pair generation, check_employer, callback search and the reference-data
+endpoint are async views, and the audit middlewares are async-capable, so
+under an ASGI server (e.g. `uvicorn nonprofit_app.asgi:application`) one
+worker overlaps many slow PDF renders with fast lookups.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +17,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'nonprofit_app.settings')
+# Read by the settings: no persistent database connections by default under ASGI
+os.environ.setdefault('DJANGO_ASGI', '1')
 
 application = get_asgi_application()
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -41,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the whole middleware stack
+    'audit.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,8 +53,22 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # After authentication: only staff requests are profiled
+    'audit.middleware.ProfilingMiddleware',
 ]
 
+# Request instrumentation (see audit.middleware); inspect with `manage.py perf_report`
+PERF_SNAPSHOT_DIR = Path(os.environ.get('PERF_SNAPSHOT_DIR', BASE_DIR / 'perf'))
+PERF_SNAPSHOT_INTERVAL = int(os.environ.get('PERF_SNAPSHOT_INTERVAL', '60'))
+PERF_QUERY_BUDGET = int(os.environ.get('PERF_QUERY_BUDGET', '50'))
+PERF_QUERY_BUDGETS = {}
+
+# On-demand request profiling (see audit.profiling); browse at /admin/audit/pairapplication/profiles/
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', BASE_DIR / 'perf' / 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', '0.005'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '50'))
+
 ROOT_URLCONF = 'nonprofit_app.urls'
 
 # In settings.py, update TEMPLATES
@@ -78,12 +97,74 @@ WSGI_APPLICATION = 'nonprofit_app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default; set DB_ENGINE=postgresql (plus DB_NAME, DB_USER,
+# DB_PASSWORD, DB_HOST, DB_PORT) for deployments with concurrent RAs.
+# Postgres keeps connections open for DB_CONN_MAX_AGE seconds, or, with
+# DB_POOL=1 (needs psycopg 3 and psycopg_pool), uses a connection pool of
+# DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections instead.
+# Benchmark either backend with `manage.py benchmark_concurrent_saves`.
+# Under ASGI (nonprofit_app.asgi sets DJANGO_ASGI=1) connections default to
+# CONN_MAX_AGE=0: each request's ORM calls run in a thread of its own, and
+# connections persisted per thread would pile up rather than be reused.
+
+def env_flag(name, default=False):
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE not in ('sqlite3', 'sqlite', 'postgresql', 'postgres'):
+    raise ImproperlyConfigured(f"DB_ENGINE={DB_ENGINE!r} is not supported; use 'sqlite3' or 'postgresql'")
+
+if DB_ENGINE in ('postgresql', 'postgres'):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'nonprofit_app'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '0' if env_flag('DJANGO_ASGI') else '60')),
+            'CONN_HEALTH_CHECKS': env_flag('DB_CONN_HEALTH_CHECKS', True),
+            'OPTIONS': {},
+        }
+    }
+    if env_flag('DB_POOL'):
+        # Pooled connections are returned to the pool after each request;
+        # Django refuses persistent connections on top of a pool.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        }
+else:
+    # Every new SQLite connection switches to WAL (readers no longer block the
+    # writer), relaxes fsyncs to commit time, waits up to SQLITE_BUSY_TIMEOUT
+    # ms for the write lock and memory-maps the file. Transactions begin
+    # IMMEDIATE so a writer takes the lock up front instead of failing on a
+    # read-to-write upgrade, which the busy timeout cannot wait out.
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', '20000'))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};'
+                    f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))};"
+                ),
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': SQLITE_BUSY_TIMEOUT / 1000,
+            },
+            # A file rather than in-memory test database, so threaded tests
+            # see each other's commits and exercise the real locking
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+        }
     }
-}
 
 
 # Password validation
@@ -125,6 +206,39 @@ STATICFILES_DIRS = [
     BASE_DIR / "audit/static",
 ]
 
+# Uploaded and generated files (resume PDFs); relative to the project as before
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR))
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    # Resume PDFs, stored once per distinct content (see audit.storage)
+    'resumes': {
+        'BACKEND': 'audit.storage.ContentAddressedStorage',
+        'OPTIONS': {'compress': env_flag('RESUME_STORAGE_COMPRESS')},
+    },
+}
+
+# PDF downloads (see audit.downloads): '' streams from Django; 'nginx' or 'xsendfile'
+# hand the transfer to the web server (nginx needs an internal location aliased to MEDIA_ROOT)
+RESUME_SENDFILE = os.environ.get('RESUME_SENDFILE', '')
+RESUME_SENDFILE_PREFIX = os.environ.get('RESUME_SENDFILE_PREFIX', '/protected/')
+
+# Print resume PDFs on first download (or once an application is logged for the pair)
+# instead of at generation; profiles keep the HTML to print from (see audit.pipeline)
+RESUME_LAZY_RENDER = env_flag('RESUME_LAZY_RENDER')
+
+# Directories of the data files the resume generator loads, hashed into its version so a seed
+# only regenerates a pair from the same inputs (see audit.services); unset: the generator's DATA_DIR
+RESUME_GENERATOR_DATA_DIRS = [path for path in os.environ.get('RESUME_GENERATOR_DATA_DIRS', '').split(os.pathsep)
+                              if path] or None
+
+# Pre-generated pairs per generation-form cell, kept stocked by `manage.py refill_pair_inventory`
+# (see audit.inventory); PAIR_INVENTORY_DEPTHS overrides the depth by location or "location:occupation"
+PAIR_INVENTORY_DEPTH = int(os.environ.get('PAIR_INVENTORY_DEPTH', '2'))
+PAIR_INVENTORY_LOW_WATER = int(os.environ.get('PAIR_INVENTORY_LOW_WATER', '1'))
+PAIR_INVENTORY_DEPTHS = {}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 